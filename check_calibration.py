@@ -1,19 +1,13 @@
 
 from libs import config
+from libs.framerates import framerates, FR_FPS, FR_NUM, FR_DEN, FR_DIV
 
 # set 'XTAL freq' to compute what the calibrations should be...
 freq = 0
 
 # optimal divider computed for CPU clock at 180MHz
 xtal = 12_000_000
-optimal = [
-        [30.00, (2343 + (192/256))],        # new_div = 0x0927c000
-        [29.97, (2346 + ( 24/256))],        # new_div = 0x092a1800
-        [25.00, (2812 + (128/256))],        # new_div = 0x0afc8000
-        [24.98, (2815 + ( 80/256))],        # new_div = 0x0aff5000
-        [24.00, (2929 + (176/256))],        # new_div = 0x0b71b000
-        [23.98, (2932 + (158/256))],        # new_div = 0x0b749e00
-    ]
+optimal = [[r[FR_FPS], (r[FR_DIV] >> 8) / 256] for r in framerates]
 
 def find_ideal(fps):
     ideal = 0
@@ -44,11 +38,11 @@ def find_freq(cal, ideal):
 def find_cal(freq, fps):
     cal = 0.0
 
-    if int(fps) != fps:
-        # use true fps
-        tfps = int(fps+1) / 1.001
-    else:
-        tfps = fps
+    # use true (rational) fps
+    tfps = fps
+    for r in framerates:
+        if r[FR_FPS] == fps:
+            tfps = r[FR_NUM] / r[FR_DEN]
 
     frame_freq = tfps * 80 * 32 # bits_in_frame and multipler
     cdiv = (180_000_000 / frame_freq) * (xtal/freq)
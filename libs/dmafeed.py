@@ -0,0 +1,140 @@
+# DMA feeder for Pico-Timecode
+# (c) 2023-05-05 Simon Wood <simon@mungewell.org>
+#
+# https://github.com/mungewell/pico-timecode
+#
+# Streams pre-rendered frames into the PIO FIFOs (SM_BUFFER, SM_BLINK and
+# SM_TX_RAW) with DMA, paced by the StateMachines' DREQs. Each stream is
+# double buffered with a pair of channels chained to each other, so Python
+# only has to refill the half which finished playing - once per 'frames'.
+#
+# Does not import 'rp2', the DMA class is passed in so that the buffer
+# swapping can also be exercised on a host.
+
+from array import array
+
+from libs.timecode import halfwords
+
+# Streams, in order
+DMA_LTC     = 0
+DMA_BLINK   = 1
+DMA_RAW     = 2
+
+def sm_dreq(sm_id):
+    # DREQ for StateMachine's TX FIFO, PIO0 0-3, PIO1 8-11
+    return ((sm_id // 4) * 8) + (sm_id % 4)
+
+
+class dma_feeder(object):
+    def __init__(self, DMA, frames=32, blink_irq1=0, blink_irq2=0, blink_led=0):
+        self.DMA = DMA
+        self.frames = max(2, frames & ~1)  # even, so each half starts with Sync
+
+        self.blink_irq1 = blink_irq1
+        self.blink_irq2 = blink_irq2
+        self.blink_flash = blink_irq1 | blink_led   # made once, a large int
+
+        # words per half, for each stream
+        F = self.frames
+        self.words = [(5 * F) // 2, 2 * F, F]
+
+        self.ltc = array("I", [0] * (5 * F))
+        self.blink = array("I", [0] * (4 * F))
+        self.raw = array("I", [0] * (2 * F))
+
+        # pairs of frames are 3 words (with Sync) + 2 words, rendered
+        # through a 16bit alias - offsets are in halfwords
+        self.ltc_h = halfwords(self.ltc)
+        self.ltc_at = array("H", [2 * ((5 * (i // 2)) + (3 * (i & 1)))
+                                  for i in range(2 * F)])
+
+        # half buffers, indexed as (2 * stream) + half
+        self.halves = []
+        for s, buf in enumerate([self.ltc, self.blink, self.raw]):
+            mv = memoryview(buf)
+            self.halves.append(mv[:self.words[s]])
+            self.halves.append(mv[self.words[s]:])
+
+        # set (by IRQ) when a stream's half has played, cleared when refilled
+        self.stale = bytearray(6)       # index is (2 * stream) + half
+        self.index = bytearray(16)      # DMA channel -> stale index
+        self.underrun = False
+        self.refills = 0
+
+        self.ch = None
+        self.running = False
+
+    def render(self, half, eng):
+        # render the next 'frames' from eng.tc into 'half' of each stream
+        tc = eng.tc
+        for f in range(half * self.frames, (half + 1) * self.frames):
+            self.raw[f] = tc.to_raw()
+            tc.to_ltc_halves(self.ltc_h, self.ltc_at[f], not f & 1)
+
+            tc.next_frame()
+
+            # Does the LED flash for the next frame?
+            if eng.flashframe >= 0:
+                flash = tc.ff == eng.flashframe
+            else:
+                flash = tc.to_raw() == eng.flashtime
+
+            self.blink[2 * f] = self.blink_flash if flash else self.blink_irq1
+            self.blink[(2 * f) + 1] = self.blink_irq2
+
+    def irq(self, dma):
+        # hard IRQ, a channel has finished its half and chained to the other
+        i = self.index[dma.channel]
+        if self.stale[i ^ 1]:
+            # other half is now playing, but was never refilled
+            self.underrun = True
+        self.stale[i] = 1
+
+        # rewind, so it is ready for when it is chained to again
+        dma.read = self.halves[i]
+        dma.count = self.words[i >> 1]
+
+    def start(self, sms, sm_ids):
+        # 'sms' are SM_BUFFER, SM_BLINK and SM_TX_RAW StateMachines
+        self.underrun = False
+        self.ch = [[self.DMA(), self.DMA()] for s in range(3)]
+
+        for s in range(3):
+            for h in range(2):
+                ch = self.ch[s][h]
+                ctrl = ch.pack_ctrl(size=2, inc_read=True, inc_write=False,
+                                    treq_sel=sm_dreq(sm_ids[s]),
+                                    chain_to=self.ch[s][h ^ 1].channel,
+                                    irq_quiet=False)
+                ch.config(read=self.halves[(2 * s) + h], write=sms[s],
+                          count=self.words[s], ctrl=ctrl)
+                ch.irq(handler=self.irq, hard=True)
+
+                self.index[ch.channel] = (2 * s) + h
+                self.stale[(2 * s) + h] = 0
+
+        for s in range(3):
+            self.ch[s][0].active(1)
+        self.running = True
+
+    def service(self, eng):
+        # refill any half which all streams have finished playing,
+        # returns False if a stream has played stale data
+        for h in range(2):
+            if self.stale[h] and self.stale[2 + h] and self.stale[4 + h]:
+                self.render(h, eng)
+
+                for s in range(3):
+                    self.stale[(2 * s) + h] = 0
+                self.refills += 1
+
+        return not self.underrun
+
+    def stop(self):
+        if self.ch:
+            for pair in self.ch:
+                for ch in pair:
+                    ch.active(0)
+                    ch.close()
+        self.ch = None
+        self.running = False
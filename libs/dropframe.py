@@ -0,0 +1,52 @@
+# Drop-Frame conversions for Pico-Timecode
+# (c) 2023-05-05 Simon Wood <simon@mungewell.org>
+#
+# https://github.com/mungewell/pico-timecode
+#
+# Closed form (SMPTE ST 12-1) conversion between hh:mm:ss:ff labels and
+# a count of frames since midnight, in O(1) for any offset.
+#
+# Drop-Frame skips the first 'drop' labels of each minute, except for
+# every 10th minute; 2 for 29.97 (nominal 30), 4 for 59.94 (nominal 60).
+#
+# Only uses small ints, so can be called from the engine without
+# allocating, and also be used on a host PC.
+
+def drop_frames(nominal):
+    # labels dropped per minute, 0 where Drop-Frame is not defined
+    if nominal == 30 or nominal == 60:
+        return nominal // 15
+    return 0
+
+def frames_per_day(nominal, drop=0):
+    return 144 * ((600 * nominal) - (9 * drop))
+
+def label_to_frames(hh, mm, ss, ff, nominal, drop=0):
+    # convert label to frames since midnight
+    if drop and ss == 0 and ff < drop and mm % 10:
+        ff = drop           # label is dropped, skip forwards
+
+    tm = (hh * 60) + mm
+    return (((tm * 60) + ss) * nominal) + ff - (drop * (tm - (tm // 10)))
+
+def frames_to_raw(fc, nominal, drop=0):
+    # convert frames since midnight to packed label, as timecode.to_raw()
+    # without DF flag - hh << 24, mm << 16, ss << 8, ff
+    if drop:
+        per_10min = (600 * nominal) - (9 * drop)
+        d = fc // per_10min
+        m = fc % per_10min
+        fc += 9 * drop * d
+        if m > drop:
+            fc += drop * ((m - drop) // ((60 * nominal) - drop))
+
+    ff = fc % nominal
+    fc //= nominal
+    ss = fc % 60
+    fc //= 60
+    return ((fc // 60) << 24) + ((fc % 60) << 16) + (ss << 8) + ff
+
+def frames_to_label(fc, nominal, drop=0):
+    # as tuple (hh, mm, ss, ff)
+    raw = frames_to_raw(fc, nominal, drop)
+    return ((raw >> 24) & 0x1F, (raw >> 16) & 0x3F, (raw >> 8) & 0x3F, raw & 0x3F)
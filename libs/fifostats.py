@@ -0,0 +1,75 @@
+# FIFO headroom telemetry for Pico-Timecode
+# (c) 2023-05-05 Simon Wood <simon@mungewell.org>
+#
+# https://github.com/mungewell/pico-timecode
+#
+# Records min/max and a histogram of FIFO levels, sampled each time the
+# TX FIFOs are refilled. Storage is allocated once, so sampling from the
+# engine's thread does not allocate.
+
+from array import array
+
+# FIFOs sampled, in order
+FIFO_BUFFER = 0     # SM_BUFFER TX, LTC packets
+FIFO_BLINK  = 1     # SM_BLINK TX, LED/IRQ timing
+FIFO_TX_RAW = 2     # SM_TX_RAW TX, 'raw' value of TX frame
+FIFO_SYNC   = 3     # SM_SYNC RX, decoded LTC packets
+
+fifo_names = ["buffer_tx", "blink_tx", "tx_raw_tx", "sync_rx"]
+
+FIFO_LEVELS = 9     # 0..8 words, joined FIFOs are 8 deep
+FIFO_STRIDE = FIFO_LEVELS + 2
+
+class fifo_stats(object):
+    def __init__(self):
+        # per FIFO: min, max, then histogram of levels
+        self.counts = array("I", [0] * (4 * FIFO_STRIDE))
+        self.samples = 0
+        self.underruns = 0
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        for f in range(4):
+            self.counts[f * FIFO_STRIDE] = FIFO_LEVELS
+        self.samples = 0
+        self.underruns = 0
+
+    def _add(self, f, level):
+        i = f * FIFO_STRIDE
+        c = self.counts
+        if level < c[i]:
+            c[i] = level
+        if level > c[i + 1]:
+            c[i + 1] = level
+        c[i + 2 + level] += 1
+
+    def sample(self, buffer, blink, tx_raw, sync):
+        # levels of each FIFO, prior to refilling
+        self._add(FIFO_BUFFER, buffer)
+        self._add(FIFO_BLINK, blink)
+        self._add(FIFO_TX_RAW, tx_raw)
+        self._add(FIFO_SYNC, sync)
+        self.samples += 1
+
+    def to_dict(self):
+        d = {"samples": self.samples, "underruns": self.underruns}
+        for f in range(4):
+            i = f * FIFO_STRIDE
+            d[fifo_names[f]] = {
+                "min": self.counts[i] if self.samples else None,
+                "max": self.counts[i + 1],
+                "hist": list(self.counts[i + 2:i + 2 + FIFO_LEVELS]),
+                }
+        return d
+
+    def dump(self):
+        print("FIFO levels, %d samples, %d underruns" % (self.samples, self.underruns))
+        print("%-10s %3s %3s  %s" % ("fifo", "min", "max",
+            " ".join(["%6d" % l for l in range(FIFO_LEVELS)])))
+        for f in range(4):
+            i = f * FIFO_STRIDE
+            print("%-10s %3s %3d  %s" % (fifo_names[f],
+                self.counts[i] if self.samples else "-", self.counts[i + 1],
+                " ".join(["%6d" % n for n in self.counts[i + 2:i + 2 + FIFO_LEVELS]])))
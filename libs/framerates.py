@@ -0,0 +1,71 @@
+# Frame rate descriptors for Pico-Timecode
+# (c) 2023-05-05 Simon Wood <simon@mungewell.org>
+#
+# https://github.com/mungewell/pico-timecode
+#
+# Single table of everything which depends on the frame rate. Descriptors
+# are tuples (immutable), computed once at import; code which runs every
+# frame should carry the index (ie. 'timecode.rate') rather than comparing
+# floats.
+#
+# To add a frame rate, add a row to 'rates'.
+
+# Fields of each descriptor
+FR_FPS      = 0     # fps, as used by timecode class (ie. 29.97)
+FR_FRAMES   = 1     # integer frames per second, counted in labels
+FR_NUM      = 2     # rational rate, FR_NUM / FR_DEN
+FR_DEN      = 3
+FR_DIV      = 4     # PIO clock divider register value, CPU clock at 180MHz
+FR_SM_FREQ  = 5     # StateMachine frequency, 80 bits x 32 clocks per frame
+FR_MTC      = 6     # MTC rate code (bits 5-6 of hour), when not Drop-Frame
+FR_DF       = 7     # Drop-Frame is legal
+FR_NAME     = 8     # display string, ie. "29.97"
+FR_KEY      = 9     # config string, ie. "30" or "29.97"
+
+CPU_FREQ = 180_000_000
+
+# fps, num, den, mtc, DF legal
+rates = [
+    (30.00, 30,    1,    0b11, True),
+    (29.97, 30000, 1001, 0b11, True),
+    (25.00, 25,    1,    0b01, False),
+    (24.98, 25000, 1001, 0b01, False),
+    (24.00, 24,    1,    0b00, False),
+    (23.98, 24000, 1001, 0b00, False),
+    ]
+
+MTC_DF = 0b10       # MTC rate code for 30 Drop-Frame (ie. 29.97 DF)
+
+def _descriptor(fps, num, den, mtc, df):
+    frames = (num + den - 1) // den
+    sm_freq = frames * 80 * 32
+
+    # clock divider is 16.8 fixed point, in bits 8-31 of register
+    div = ((CPU_FREQ * 256 * den) // (num * 80 * 32)) << 8
+
+    name = "%2.2f" % fps
+    key = name
+    if den == 1:
+        key = "%d" % frames
+
+    return (fps, frames, num, den, div, sm_freq, mtc, df, name, key)
+
+framerates = tuple([_descriptor(*r) for r in rates])
+
+def framerate_index(fps):
+    # index of descriptor for 'fps' (float, int or config string), or None
+    try:
+        fps = float(fps)
+    except:
+        return None
+
+    for i in range(len(framerates)):
+        if abs(framerates[i][FR_FPS] - fps) < 0.005:
+            return i
+    return None
+
+def mtc_code(rate, df=False):
+    # MTC has a single code for Drop-Frame
+    if df and framerates[rate][FR_DF]:
+        return MTC_DF
+    return framerates[rate][FR_MTC]
@@ -0,0 +1,178 @@
+# IRQ latency profiler for Pico-Timecode
+# (c) 2023-05-05 Simon Wood <simon@mungewell.org>
+#
+# https://github.com/mungewell/pico-timecode
+#
+# Records every TX (SM_BLINK) and RX (SM_SYNC) IRQ timestamp into
+# preallocated rings, from within the hard IRQ, along with the run time
+# of 'irq_handler' and of the scheduled 'irq_callbacks'. Analysis and CSV
+# output allocate, so are only done on request from the REPL.
+#
+# Does not import 'utime', timestamps are passed in, so can also be used
+# on a host PC.
+
+from array import array
+
+TICKS_PERIOD = 1 << 30     # ticks_us() wraps, as MicroPython's TICKS_MAX + 1
+TICKS_MASK = TICKS_PERIOD - 1
+
+PROF_TX = 0
+PROF_RX = 1
+
+def ticks_delta(new, old):
+    # as utime.ticks_diff(), for values from ticks_us()
+    d = (new - old) & TICKS_MASK
+    if d >= TICKS_PERIOD // 2:
+        d -= TICKS_PERIOD
+    return d
+
+def percentile(values, p):
+    # 'values' must be sorted
+    if not values:
+        return 0
+    i = int((len(values) - 1) * p / 100 + 0.5)
+    return values[i]
+
+
+class irq_profiler(object):
+    def __init__(self, size=1024):
+        # size is rounded up to a power of 2, so index is a simple mask
+        n = 16
+        while n < size:
+            n <<= 1
+        self.size = n
+        self.mask = n - 1
+
+        self.ticks = [array("I", [0] * n), array("I", [0] * n)]
+        self.count = array("I", [0, 0])
+
+        self.cb_ticks = array("I", [0] * n)
+        self.cb_time = array("I", [0] * n)
+        self.cb_slot = bytearray(n)
+        self.cb_count = 0
+
+        self.hd_time = array("I", [0] * n)
+        self.hd_count = 0
+
+        self.enabled = False
+
+    def start(self):
+        self.count[PROF_TX] = 0
+        self.count[PROF_RX] = 0
+        self.cb_count = 0
+        self.hd_count = 0
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def irq(self, src, ticks):
+        # called from hard IRQ, must not allocate
+        n = self.count[src]
+        self.ticks[src][n & self.mask] = ticks
+        self.count[src] = (n + 1) & TICKS_MASK
+
+    def callback(self, slot, ticks, duration):
+        # called from scheduled callback, when it completes
+        n = self.cb_count & self.mask
+        self.cb_ticks[n] = ticks
+        self.cb_time[n] = duration
+        self.cb_slot[n] = slot
+        self.cb_count = (self.cb_count + 1) & TICKS_MASK
+
+    def handler(self, duration):
+        # called from hard IRQ, time spent in 'irq_handler'
+        self.hd_time[self.hd_count & self.mask] = duration
+        self.hd_count = (self.hd_count + 1) & TICKS_MASK
+
+    def _held(self, n):
+        # indices of entries still in ring, oldest first
+        held = min(n, self.size)
+        for i in range(held):
+            yield (n - held + i) & self.mask
+
+    def timestamps(self, src):
+        t = self.ticks[src]
+        return [t[i] for i in self._held(self.count[src])]
+
+    def intervals(self, src):
+        t = self.timestamps(src)
+        return [ticks_delta(t[i], t[i - 1]) for i in range(1, len(t))]
+
+    def callbacks(self):
+        return [(self.cb_slot[i], self.cb_ticks[i], self.cb_time[i]) \
+                for i in self._held(self.cb_count)]
+
+    def summary(self, nominal=0, late=250):
+        # 'nominal' IRQ interval in us, median is used if not given;
+        # IRQs more than 'late' us after the nominal interval are counted
+        s = {}
+        for src, name in [(PROF_TX, "tx"), (PROF_RX, "rx")]:
+            iv = self.intervals(src)
+            if not iv:
+                s[name] = None
+                continue
+
+            nom = nominal
+            if nom == 0:
+                nom = sorted(iv)[len(iv) // 2]
+            jitter = sorted([abs(x - nom) for x in iv])
+
+            s[name] = {
+                "irqs": len(iv) + 1,
+                "nominal": nom,
+                "mean": sum(iv) / len(iv),
+                "min": min(iv),
+                "max": max(iv),
+                "jitter_p50": percentile(jitter, 50),
+                "jitter_p90": percentile(jitter, 90),
+                "jitter_p99": percentile(jitter, 99),
+                "jitter_max": jitter[-1],
+                "late": len([x for x in iv if x > nom + late]),
+                }
+
+        d = sorted([self.hd_time[i] for i in self._held(self.hd_count)])
+        s["handler"] = None
+        if d:
+            s["handler"] = {
+                "irqs": len(d),
+                "mean": sum(d) / len(d),
+                "p50": percentile(d, 50),
+                "p99": percentile(d, 99),
+                "max": d[-1],
+                }
+
+        cb = {}
+        for slot, ticks, duration in self.callbacks():
+            if slot not in cb:
+                cb[slot] = []
+            cb[slot].append(duration)
+        s["callbacks"] = {}
+        for slot in cb:
+            d = sorted(cb[slot])
+            s["callbacks"][slot] = {
+                "calls": len(d),
+                "mean": sum(d) / len(d),
+                "p50": percentile(d, 50),
+                "p99": percentile(d, 99),
+                "max": d[-1],
+                }
+        return s
+
+    def csv(self, f=None):
+        # dump raw data, for offline analysis. To a file if given, else REPL.
+        # Written a row at a time, so a large ring is not held as text.
+        out = f.write if f else print
+        end = "\n" if f else ""
+
+        out("source,slot,ticks_us,us" + end)    # us is interval, or callback duration
+        for src, name in [(PROF_TX, "tx"), (PROF_RX, "rx")]:
+            t = self.ticks[src]
+            prev = None
+            for i in self._held(self.count[src]):
+                out("%s,,%d,%s%s" % (name, t[i],
+                    ticks_delta(t[i], prev) if prev is not None else "", end))
+                prev = t[i]
+        for i in self._held(self.cb_count):
+            out("callback,%d,%d,%d%s" % (self.cb_slot[i], self.cb_ticks[i],
+                                          self.cb_time[i], end))
@@ -0,0 +1,16 @@
+# Cross-core wake up for Pico-Timecode
+#
+# https://github.com/mungewell/pico-timecode
+#
+# An IRQ only wakes the core it is taken on (core 0, where the handlers
+# are attached) from WFE, so core 1 sleeping in 'machine.idle()' would not
+# see it until its next SysTick (1ms). 'sev()' signals an event to both
+# cores, so the handlers can wake core 1 at once.
+#
+# Needs the inline assembler, ie. an Arm build of MicroPython.
+
+import micropython
+
+@micropython.asm_thumb
+def sev():
+    data(2, 0xBF40)         # SEV
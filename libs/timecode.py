@@ -0,0 +1,609 @@
+# Timecode class for Pico-Timecode
+# (c) 2023-05-05 Simon Wood <simon@mungewell.org>
+#
+# https://github.com/mungewell/pico-timecode
+#
+# Does not depend on 'machine'/'rp2', so can also be used on a host PC
+
+import _thread
+
+from array import array
+
+try:
+    import uctypes
+except ImportError:
+    uctypes = None
+
+from libs.dropframe import drop_frames, frames_per_day, label_to_frames, frames_to_raw
+from libs.framerates import framerates, framerate_index, FR_FRAMES
+
+# https://web.archive.org/web/20240000000000*/http://www.barney-wol.net/time/timecode.html
+# lookup this text in array, index is value used in TC
+
+tzs = [ \
+    "+0000","-0100","-0200","-0300","-0400","-0500","-0600","-0700","-0800","-0900", \
+    "-0030","-0130","-0230","-0330","-0430","-0530", \
+    "-1000","-1100","-1200","+1300","+1200","+1100","+1000","+0900","+0800","+0700", \
+    "-0630","-0730","-0830","-0930","-1030","-1130", \
+    "+0600","+0500","+0400","+0300","+0200","+0100","Undef","Undef","TP-03","TP-02", \
+    "+1130","+1030","+0930","+0830","+0730","+0630", \
+    "TP-01","TP-00","+1245","Undef","Undef","Undef","Undef","Undef","+XXXX","Undef", \
+    "+0530","+0430","+0330","+0230","+0130","+0030"]
+
+# Lookup tables for LTC encoding
+# BCD pairs, as laid out in each 16bit half of packet
+ltc_bcd = array("H", [((x // 10) << 8) + (x % 10) for x in range(60)])
+
+# count of 1's in each byte value
+ltc_bits = bytes([bin(x).count("1") for x in range(256)])
+
+def halfwords(words):
+    # 16bit alias of the array('I') 'words', for to_ltc_halves() and the
+    # 'out_h' of encode_range(), so packets are stored without building large ints on MicroPython.
+    # Make it once, per buffer, outside of the per-frame loop.
+    if uctypes is None:
+        return memoryview(words).cast("B").cast("H")
+    return uctypes.struct(uctypes.addressof(words),
+            {"h": (uctypes.ARRAY | 0, uctypes.UINT16 | (2 * len(words)))}).h
+
+
+class timecode(object):
+    # State is published as a packed 'raw' word (hh/mm/ss/ff and DF, same
+    # format as to_raw()) and a userbits word (uf1 in bits 0-3, through to
+    # uf8 in bits 28-31). Writers hold the lock and bump 'seq' to odd whilst
+    # updating, readers do not lock - they retry if 'seq' changed under them.
+    # The feeder advances with advance(), which never waits on the lock.
+    # 'sets' counts labels set (or Jammed), rather than stepped through.
+
+    def __init__(self):
+        self.fps = 30.0
+        self._df = False     # Drop-Frame
+
+        # Timecode - starting value, counted as frames since midnight
+        # hh/mm/ss/ff are derived from this count
+        self.fc = 0
+        self.raw = 0
+        self.seq = 0
+        self.sets = 0
+        self._rate()
+
+        # Colour Frame flag
+        self.cf = False
+
+        # Clock flag
+        self.bgf1 = False
+
+        # User bits - format depends on BF2 and BF0
+        self.bgf0 = True     # 4 ASCII characters
+        self.bgf2 = False
+
+        self.ub = 0x4F434950 # 'PICO'
+
+        # Lock for multithreading, only needed by writers
+        self.lock = _thread.allocate_lock()
+
+    def acquire(self):
+        self.lock.acquire()
+        self.seq += 1        # odd, update in progress
+
+    def release(self):
+        self.seq = (self.seq + 1) & 0xFFFF
+        self.lock.release()
+
+    # read-only views of the frame count
+    @property
+    def hh(self):
+        return (self.raw >> 24) & 0x1F
+
+    @property
+    def mm(self):
+        return (self.raw >> 16) & 0x3F
+
+    @property
+    def ss(self):
+        return (self.raw >> 8) & 0x3F
+
+    @property
+    def ff(self):
+        return self.raw & 0x3F
+
+    @property
+    def df(self):
+        return (self.raw >> 7) & 0x01
+
+    # userbits word, also kept as 16bit halves for the encoder
+    @property
+    def ub(self):
+        return self._ub
+
+    @ub.setter
+    def ub(self, ub):
+        self._ub = ub
+        self._ub_lo = ub & 0xFFFF
+        self._ub_hi = (ub >> 16) & 0xFFFF
+
+    @df.setter
+    def df(self, df):
+        self.acquire()
+        self._df = df
+        self._rate()
+        self.release()
+
+    def _rate(self):
+        # compute constants for the current fps/df, and re-count
+        # frames so that the hh/mm/ss/ff label is preserved
+        self.rate = framerate_index(self.fps)     # descriptor, None if unknown
+        if self.rate is None:
+            self.nominal = int(self.fps + 0.1)
+        else:
+            self.nominal = framerates[self.rate][FR_FRAMES]
+        self.drop = drop_frames(self.nominal) if self._df else 0
+        self.total = frames_per_day(self.nominal, self.drop)
+
+        raw = self.raw
+        self._jump(self._get_frames((raw >> 24) & 0x1F, (raw >> 16) & 0x3F,
+                                          (raw >> 8) & 0x3F, raw & 0x3F))
+
+    def _get_frames(self, hh, mm, ss, ff):
+        # convert label to frames since midnight
+        return label_to_frames(hh, mm, ss, ff, self.nominal, self.drop)
+
+    def _set_frames(self, fc):
+        # set frames since midnight, and compute label
+        fc %= self.total
+        self.fc = fc
+        self.raw = frames_to_raw(fc, self.nominal, self.drop) + (self._df << 7)
+
+    def _jump(self, fc):
+        # as _set_frames(), for a label which is set rather than stepped to
+        self.sets = (self.sets + 1) & 0xFFFF
+        self._set_frames(fc)
+
+    def from_frames(self, fc=0):
+        self.acquire()
+        self._jump(fc)
+        self.release()
+
+    def to_frames(self):
+        return self.fc
+
+    def from_ascii(self, start="00:00:00:00", sep=True):
+        # Example "00:00:00:00"
+        #          hh mm ss ff
+        #          01234567890
+
+        # convert ASCII to 'raw' BCD array
+        time = [x - 0x30 for x in bytes(start, "utf-8")]
+
+        self.acquire()
+        if sep == True:
+            # only change DF if separators are given
+            self._df = False
+            if time[8] != 10:
+                self._df = True
+            self._rate()
+
+            self._jump(self._get_frames((time[0]*10) + time[1],
+                                            (time[3]*10) + time[4],
+                                            (time[6]*10) + time[7],
+                                            (time[9]*10) + time[10]))
+        else:
+            self._jump(self._get_frames((time[0]*10) + time[1],
+                                            (time[2]*10) + time[3],
+                                            (time[4]*10) + time[5],
+                                            (time[6]*10) + time[7]))
+        self.release()
+    
+    def to_ascii(self, sep=True):
+        raw = self.raw
+        hh = (raw >> 24) & 0x1F
+        mm = (raw >> 16) & 0x3F
+        ss = (raw >> 8) & 0x3F
+        ff = raw & 0x3F
+
+        if sep == True:
+            time = [int(hh/10), (hh % 10), 10,
+                    int(mm/10), (mm % 10), 10,
+                    int(ss/10), (ss % 10),
+                    (-2 if raw & 0x80 else 10),         # use '.' for DF
+                    int(ff/10), (ff % 10)]
+        else:
+            time = [int(hh/10), (hh % 10),
+                    int(mm/10), (mm % 10),
+                    int(ss/10), (ss % 10),
+                    int(ff/10), (ff % 10)]
+
+        new = ""
+        for x in time:
+            new += chr(x + 0x30)
+        return(new)
+
+    def from_raw(self, raw=0):
+        self.acquire()
+        df = (raw & 0x00000080) >> 7
+        if df != self._df:
+            self._df = df
+            self._rate()
+
+        self._jump(self._get_frames((raw & 0x1F000000) >> 24,
+                                        (raw & 0x003F0000) >> 16,
+                                        (raw & 0x00003F00) >> 8,
+                                        (raw & 0x0000003F)))
+        self.release()
+
+    def to_raw(self):
+        # single word, so always a consistent snapshot
+        return self.raw
+
+    def set_fps_df(self, fps=25.0, df=False):
+        # should probably validate FPS/DF combo
+
+        self.acquire()
+        self.fps = fps
+        self._df = df
+        self._rate()
+        self.release()
+
+        return True
+
+    def next_frame(self, repeats=1):
+        self.acquire()
+        self._set_frames(self.fc + repeats)
+        self.release()
+
+    def advance(self, seq, repeats=1):
+        # next_frame() for the feeder, which must not wait on other writers.
+        # Only advances if nothing was written since 'seq' was read, so the
+        # frame rendered from that state stands. Returns False if it was, or
+        # a writer holds the lock - the caller renders again from 'seq'.
+        # Negative 'repeats' steps back, to re-render frames.
+        if self.seq != seq or not self.lock.acquire(0):
+            return False
+        if self.seq != seq:
+            self.lock.release()
+            return False
+
+        self.seq += 1
+        self._set_frames(self.fc + repeats)
+        self.release()
+        return True
+
+    def prev_frame(self, repeats=1):
+        self.acquire()
+        self._set_frames(self.fc - repeats)
+        self.release()
+
+    # parity check, count 1's in 32-bit word
+    def lp(self, b):
+        return(ltc_bits[b & 0xFF] + ltc_bits[(b >> 8) & 0xFF] +
+               ltc_bits[(b >> 16) & 0xFF] + ltc_bits[(b >> 24) & 0xFF])
+
+    def to_ltc_words(self, w, send_sync=False):
+        # As to_ltc_halves(), into array of words 'w'. The alias is made on
+        # each call, the per-frame paths keep one and use to_ltc_halves().
+        return self.to_ltc_halves(halfwords(w), 0, send_sync)
+
+    def to_ltc_halves(self, h, i=0, send_sync=False, seq=None):
+        # Table driven encoder, writes packet into (pre-allocated) 16bit
+        # alias 'h' of the output words, from index 'i' (a word boundary),
+        # as 2 words, or as 3 words with the Sync word(s) framing it.
+        # The feeder passes the 'seq' it read before rendering, then state
+        # is read once rather than waiting out a writer - advance(seq) says
+        # whether the packet stands.
+        #
+        # Packet is assembled as 16bit halves, with the same layout for
+        # each of the BCD pairs ff/ss/mm/hh - units in bits 0-3, tens from 8.
+        while True:
+            s = self.seq
+            raw = self.raw
+            lo = self._ub_lo
+            hi = self._ub_hi
+            cf = self.cf
+            bgf0 = self.bgf0
+            bgf1 = self.bgf1
+            bgf2 = self.bgf2
+            if seq is not None or (not s & 1 and s == self.seq):
+                break
+
+        return self._ltc_write(h, i, raw, lo, hi, cf, bgf0, bgf1, bgf2, send_sync)
+
+    def _ltc_write(self, h, i, raw, lo, hi, cf, bgf0, bgf1, bgf2, send_sync):
+        # encode packet for label 'raw' and userbits halves 'lo'/'hi', into
+        # 16bit alias 'h' from index 'i' - only small ints are used
+        if self.fps == 25.0:
+            f27 = bgf0
+            f43 = bgf2
+            f59 = False
+        else:
+            f27 = False
+            f43 = bgf0
+            f59 = bgf2
+
+        h0 = ltc_bcd[raw & 0x1F] + (raw & 0x80) * 8 + (cf << 11) + \
+                ((lo & 0x000F) << 4) + ((lo & 0x00F0) << 8)
+        h1 = ltc_bcd[(raw >> 8) & 0x3F] + (f27 << 11) + \
+                ((lo & 0x0F00) >> 4) + (lo & 0xF000)
+        h2 = ltc_bcd[(raw >> 16) & 0x3F] + (f43 << 11) + \
+                ((hi & 0x000F) << 4) + ((hi & 0x00F0) << 8)
+        h3 = ltc_bcd[raw >> 24] + (bgf1 << 10) + (f59 << 11) + \
+                ((hi & 0x0F00) >> 4) + (hi & 0xF000)
+
+        # polarity correction, Sync word contributes 13 1's
+        x = h0 ^ h1 ^ h2 ^ h3
+        if (13 + ltc_bits[x & 0xFF] + ltc_bits[x >> 8]) & 1:
+            if self.fps == 25.0:
+                h3 += 0x0800            # f59
+            else:
+                h1 += 0x0800            # f27
+
+        if send_sync:
+            # We want to send 'whole' 32bit words to FIFO, so add 2x Sync
+            h[i] = 0xBFFC
+            h[i + 1] = h0
+            h[i + 2] = h1
+            h[i + 3] = h2
+            h[i + 4] = h3
+            h[i + 5] = 0xBFFC
+            return 3
+        else:
+            h[i] = h0
+            h[i + 1] = h1
+            h[i + 2] = h2
+            h[i + 3] = h3
+            return 2
+
+    def encode_range(self, start, count, out, send_sync=False, out_h=None):
+        # Encode 'count' consecutive frames from frame count 'start' (None
+        # for the current frame) into array('I') 'out', without changing the
+        # current timecode. 2 words per frame (as read by decode_many()), or
+        # when 'send_sync' as the FIFO stream - alternate packets framed by
+        # Sync, 5 words per pair.
+        # Flags and userbits are read once, for the whole range.
+        #
+        # 'out_h' is halfwords(out), for callers which encode into the same
+        # buffer repeatedly - otherwise it is made here, once per call.
+        #
+        # Returns the number of words written.
+        if not isinstance(out, array) or getattr(out, "itemsize", 4) != 4:
+            raise TypeError("encode_range() 'out' must be array('I')")
+        need = (5 * (count >> 1)) + (3 * (count & 1)) if send_sync else 2 * count
+        if len(out) < need:
+            raise ValueError("encode_range() 'out' holds %d words, needs %d" % (len(out), need))
+        if out_h is None:
+            out_h = halfwords(out)
+
+        while True:
+            seq = self.seq
+            fc = self.fc
+            df = self.raw & 0x80
+            lo = self._ub_lo
+            hi = self._ub_hi
+            cf = self.cf
+            bgf0 = self.bgf0
+            bgf1 = self.bgf1
+            bgf2 = self.bgf2
+            if not seq & 1 and seq == self.seq:
+                break
+
+        if start is None:
+            start = fc
+
+        i = 0
+        for n in range(count):
+            raw = frames_to_raw((start + n) % self.total, self.nominal, self.drop) + df
+            i += self._ltc_write(out_h, 2 * i, raw, lo, hi, cf, bgf0, bgf1, bgf2,
+                                 send_sync and not n & 1)
+        return i
+
+    def decode_many(self, words, out=None, ub_out=None):
+        # Decode packets, 2 words each (as encode_range() without Sync),
+        # into array of 'raw' labels - 0xFFFFFFFF where the label is not
+        # valid at the current fps. Userbits are also written to 'ub_out'
+        # if given. The current timecode is not changed.
+        n = len(words) // 2
+        if out is None:
+            out = array("I", [0] * n)
+
+        for f in range(n):
+            p0 = words[2 * f]
+            p1 = words[(2 * f) + 1]
+            raw = self._label(p0 & 0xFFFF, p0 >> 16, p1 & 0xFFFF, p1 >> 16)
+            out[f] = raw if raw >= 0 else 0xFFFFFFFF
+
+            if ub_out is not None:
+                ub_out[f] = ((p0 >> 4) & 0x0000000F) + ((p0 >> 8) & 0x000000F0) + \
+                            ((p0 >> 12) & 0x00000F00) + ((p0 >> 16) & 0x0000F000) + \
+                            ((p1 << 12) & 0x000F0000) + ((p1 << 8) & 0x00F00000) + \
+                            ((p1 << 4) & 0x0F000000) + (p1 & 0xF0000000)
+        return out
+
+    def _label(self, h0, h1, h2, h3):
+        # 'raw' label (with DF flag) from 16bit halves of packet,
+        # or -1 if it can not be counted at the current fps
+        ff = (((h0 >> 8) & 0x3) * 10) + (h0 & 0xF)
+        ss = (((h1 >> 8) & 0x7) * 10) + (h1 & 0xF)
+        mm = (((h2 >> 8) & 0x7) * 10) + (h2 & 0xF)
+        hh = (((h3 >> 8) & 0x3) * 10) + (h3 & 0xF)
+
+        if ff < self.nominal and ss < 60 and mm < 60 and hh < 24:
+            return (hh << 24) + (mm << 16) + (ss << 8) + ((h0 >> 3) & 0x80) + ff
+        return -1
+
+    def to_ltc_packet(self, send_sync=False, release=True):
+        w = array("I", [0, 0, 0])
+        n = self.to_ltc_words(w, send_sync)
+
+        if not release:
+            # caller expects to hold the lock, and will release()
+            self.acquire()
+
+        return [w[i] for i in range(n)]
+
+    def from_ltc_packet(self, p, acquire=True):
+        if len(p) != 2:
+            if not acquire:
+                # assume previously aquired
+                self.release()
+            return False
+
+        # reject if parity is not 1, note we are not including Sync word
+        '''
+        c = self.lp(p[0])
+        c+= self.lp(p[1])
+        if not c & 1:
+            return False
+        '''
+
+        if acquire:
+            self.acquire()
+        return self._from_ltc(p[0] & 0xFFFF, p[0] >> 16, p[1] & 0xFFFF, p[1] >> 16)
+
+    def from_ltc_bytes(self, b, acquire=True):
+        # As from_ltc_packet(), but from the 8 bytes (little endian) of the
+        # two packet words - ie. an array the RX FIFO was read into. Only
+        # small ints are used, so does not allocate on MicroPython.
+        if acquire:
+            self.acquire()
+        return self._from_ltc(b[0] + (b[1] << 8), b[2] + (b[3] << 8),
+                              b[4] + (b[5] << 8), b[6] + (b[7] << 8))
+
+    def _from_ltc(self, h0, h1, h2, h3):
+        # decode from 16bit halves of packet, lock is held and is released
+        df = (h0 >> 10) & 0x01
+        if df != self._df:
+            self._df = df
+            self._rate()
+
+        # only accept labels which can be counted
+        raw = self._label(h0, h1, h2, h3)
+        valid = raw >= 0
+        if valid:
+            self._jump(self._get_frames(raw >> 24, (raw >> 16) & 0x3F,
+                                              (raw >> 8) & 0x3F, raw & 0x3F))
+
+        if self.fps == 25.0:
+            self.bgf0 = (h1 >> 11) & 0x01   # f27
+            self.bgf2 = (h2 >> 11) & 0x01   # f43
+        else:
+            self.bgf0 = (h2 >> 11) & 0x01   # f43
+            self.bgf2 = (h3 >> 11) & 0x01   # f59
+
+        self.bgf1 = (h3 >> 10) & 0x01
+
+        # userbits as 16bit halves, only rebuild (large int) word if changed
+        lo = ((h0 >> 4) & 0x000F) + ((h0 >> 8) & 0x00F0) + \
+             ((h1 << 4) & 0x0F00) + (h1 & 0xF000)
+        hi = ((h2 >> 4) & 0x000F) + ((h2 >> 8) & 0x00F0) + \
+             ((h3 << 4) & 0x0F00) + (h3 & 0xF000)
+        if lo != self._ub_lo or hi != self._ub_hi:
+            self._ub = (hi << 16) + lo
+            self._ub_lo = lo
+            self._ub_hi = hi
+
+        self.release()
+        return valid
+
+    def user_to_raw(self):
+        return self.ub
+
+    def user_from_raw(self, ub=0):
+        self.acquire()
+        self.ub = ub
+        self.release()
+
+    def user_to_ascii(self):
+        new = ""
+        if self.bgf1==True:
+            # TC is referenced to real time
+            new += "*"
+
+        if self.bgf0==True and self.bgf2==True:
+            return("Page/Line NA")
+
+        ub = self.ub
+        uf = [(ub >> (4 * i)) & 0x0F for i in range(8)]     # uf1..uf8
+        if self.bgf0==False and self.bgf2==False:
+            # Userbits are BCD/Hex
+            dehex = [0x30,0x31,0x32,0x33,0x34,0x35,0x36,0x37, \
+                    0x38,0x39,0x41,0x42,0x43,0x44,0x45,0x46]
+            user = [dehex[uf[7]], dehex[uf[6]], \
+                    dehex[uf[5]], dehex[uf[4]], \
+                    dehex[uf[3]], dehex[uf[2]], \
+                    dehex[uf[1]], dehex[uf[0]]]
+        elif self.bgf0==False and self.bgf2==True:
+            # Userbits are Date/Timezone
+            user = [0x59, 0x30+uf[5], 0x30+uf[4], 0x2D, \
+                    0x4D, 0x30+uf[3], 0x30+uf[2], 0x2D, \
+                    0x44, 0x30+uf[1], 0x30+uf[0]]
+        else:
+            # Userbits are ASCII
+            user = [ub & 0xFF, (ub >> 8) & 0xFF,
+                    (ub >> 16) & 0xFF, (ub >> 24) & 0xFF]
+
+        for x in user:
+            new += chr(x)
+
+        if self.bgf0==False and self.bgf2==True:
+            i = ub >> 24
+            if i < len(tzs):
+                new += tzs[i]
+            else:
+                new += tzs[0]
+
+        return(new)
+
+    def user_from_ascii(self, asc="PICO"):
+        user = [x for x in bytes(asc+"    ", "utf-8")]
+
+        self.acquire()
+        self.bgf0 = True
+        self.bgf2 = False
+        self.ub = user[0] + (user[1] << 8) + (user[2] << 16) + (user[3] << 24)
+        self.release()
+
+        return True
+
+    def user_from_bcd_hex(self, bcd="00000000"):
+        user = []
+        for x in bytes(bcd + "00000000", "utf-8"):
+            if (x >= 0x30) and (x < 0x3A):
+                user.append(x - 0x30)
+            if (x >= 0x41) and (x < 0x47):
+                user.append(x - 0x37)
+            if (x >= 0x61) and (x < 0x67):
+                user.append(x - 0x57)
+
+        ub = 0
+        for i in range(8):
+            ub = (ub << 4) + (user[i] & 0x0F)       # uf8 first
+
+        self.acquire()
+        self.bgf0 = False
+        self.bgf2 = False
+        self.ub = ub
+        self.release()
+
+        return True
+
+    def user_from_date(self, date="Y74-M01-D01+0000"):
+        # Example "Y00-M00-D00+0000"
+        #          Yyy Mmm Dddzzzzz
+        #          0123456789012345
+        user = [x-0x30 for x in bytes(date, "utf-8")]
+
+        tz = 0
+        for i in range(len(tzs)):
+            if date[11:] == tzs[i]:
+                tz = i
+                break
+
+        self.acquire()
+        self.bgf0 = False
+        self.bgf2 = True
+        self.ub = user[10] + (user[9] << 4) + \
+                  (user[6] << 8) + (user[5] << 12) + \
+                  (user[2] << 16) + (user[1] << 20) + \
+                  (tz << 24)                          # DD, MM, YY, TZ
+        self.release()
+
+        return True
@@ -53,6 +53,7 @@ from libs import config
 from libs.neotimer import *
 from libs.ht16k33segment import HT16K33Segment
 from libs.ht16k33segment14 import HT16K33Segment14
+from libs.framerates import framerates, framerate_index, FR_FPS, FR_NAME, FR_SM_FREQ
 
 import pico_timecode as pt
 
@@ -90,7 +91,7 @@ def start_state_machines(mode=pt.RUN):
 
     # apply any calibration
     try:
-        fps = slate_available_fps_df[slate_current_fps_df][0:5]
+        fps = framerates[slate_available_fps_df[slate_current_fps_df][0]][FR_NAME]
         pt.eng.calval = float(config.calibration[fps])
         #print("calibration", fps, pt.eng.calval)
     except:
@@ -100,7 +101,7 @@ def start_state_machines(mode=pt.RUN):
     pt.eng.sm = []
     pt.eng.mode = mode
 
-    sm_freq = int(pt.eng.tc.fps + 0.1) * 80 * 32
+    sm_freq = framerates[pt.eng.tc.rate][FR_SM_FREQ]
 
     if mode > pt.RUN:
         pt.eng.sm.append(rp2.StateMachine(pt.SM_START, pt.start_from_sync, freq=sm_freq,
@@ -151,8 +152,7 @@ def start_state_machines(mode=pt.RUN):
     pt.eng.config_clocks(pt.eng.tc.fps)
 
     # set up IRQ handler
-    for m in pt.eng.sm:
-        m.irq(handler=pt.irq_handler, hard=True)
+    pt.irq_attach(pt.eng)
 
     pt.stop = False
     _thread.start_new_thread(pt.pico_timecode_thread, (pt.eng, lambda: pt.stop))
@@ -178,38 +178,36 @@ class HT16K33Segment14_dbl(HT16K33Segment14):
 
 slate_current_fps_df = 0
 
+# frame rate descriptor (see libs/framerates.py), DF
 slate_available_fps_df = [
-        "30.00",
-        "30.00-df",
-        "29.97",
-        "29.97-df",
-        "25.00",
-        "24.00",
-        "23.98",
+        (framerate_index(30),    False),
+        (framerate_index(30),    True),
+        (framerate_index(29.97), False),
+        (framerate_index(29.97), True),
+        (framerate_index(25),    False),
+        (framerate_index(24),    False),
+        (framerate_index(23.98), False),
         ]
 
 def slate_set_fps_df(fps=0, df=False, index=0):
     global disp, slate_current_fps_df
 
-    while True:
-        if not fps:
-            asc = slate_available_fps_df[index]
-            fps = float(asc[0:5])
-            if len(asc) > 5:
-                df = True
+    if fps:
+        fps_df = (framerate_index(fps), df == True)
+        if fps_df in slate_available_fps_df:
+            index = slate_available_fps_df.index(fps_df)
         else:
-            asc = "{:.2f}".format(fps) + ("-df" if df == True else "")
-
-        if asc in slate_available_fps_df:
-            break
+            index = 0   # 30.00
+    elif index >= len(slate_available_fps_df):
+        index = 0
 
-        fps = 30.00
-        df = False
+    fps = framerates[slate_available_fps_df[index][0]][FR_FPS]
+    df = slate_available_fps_df[index][1]
 
     pt.eng.tc.set_fps_df(fps, df)
     disp.set_fps_df(fps, df)
 
-    slate_current_fps_df = slate_available_fps_df.index(asc)
+    slate_current_fps_df = index
 
 
 def slate_show_fps_df(fps_df):
@@ -218,7 +216,7 @@ def slate_show_fps_df(fps_df):
     if fps_df >= len(slate_available_fps_df):
         fps_df = 0
 
-    asc = slate_available_fps_df[fps_df]
+    asc = framerates[slate_available_fps_df[fps_df][0]][FR_NAME]
 
     for i in range(4):
         slate_SF.set_character(asc[i+(1 if i>1 else 0)], \
@@ -636,7 +634,7 @@ def slate_display_thread(init_mode=pt.RUN):
                         slate_SF.draw()
 
                 # also print to console
-                phase = ((4294967295 - pt.rx_ticks + 188) % 640) - 320
+                phase = pt.rx_phase()
                 if phase < -32:
                     # RX is ahead/earlier than TX
                     phases = ((" "*10) + ":" + ("+"*int(abs(phase/32))) + (" "*10)) [:21]
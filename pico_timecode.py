@@ -6,11 +6,19 @@
 import _thread
 import rp2
 
-from machine import Timer, Pin, mem32, disable_irq, enable_irq, freq, lightsleep
+from machine import Timer, Pin, mem32, disable_irq, enable_irq, freq, lightsleep, idle
 from micropython import schedule, alloc_emergency_exception_buf, mem_info
-from utime import sleep, ticks_us
+from utime import sleep, ticks_us, ticks_diff
 from gc import collect, mem_free
 from os import uname
+from array import array
+from uctypes import addressof, bytearray_at
+
+from libs.timecode import timecode, tzs, halfwords
+from libs.framerates import framerates, framerate_index, mtc_code, FR_DIV, FR_SM_FREQ
+from libs.dmafeed import dma_feeder
+from libs.fifostats import fifo_stats
+from libs.irqprof import irq_profiler, PROF_TX, PROF_RX
 
 # remember to do install lib to device
 # 'mpremote mip install usb-device-midi'
@@ -24,6 +32,12 @@ except ImportError:
 _hasUsbDevice = False
 '''
 
+# IRQs wake core 1 with SEV, without the inline assembler it only
+# notices them on its next SysTick (1ms)
+try:
+    from libs.sev import sev
+except (ImportError, SyntaxError):
+    sev = None
 
 alloc_emergency_exception_buf(100)
 
@@ -34,7 +48,7 @@ eng = None
 stop = False
 
 tx_raw = 0
-rx_ticks = 0
+rx_ticks = array("I", [0])      # SM_START count at RX sync, see rx_phase()
 rx_ticks_us = 0
 tx_ticks_us = 0
 
@@ -60,7 +74,24 @@ SM_TX_RAW   = 4
 SM_SYNC     = 5
 SM_DECODE   = 6
 
+# Blink words put each frame (after the first, see 'pico_timecode_thread()'),
+# these are large ints on MicroPython so are made once
+BLINK_LED = 0b01010101010101010101 << 6         # ~16ms flash
+
+if _hasUsbDevice:
+    # 4x IRQs per frame
+    BLINK_IRQ1 = (0b10100010101010001010101000 << 6) + 19
+    BLINK_IRQ2 =  0b10101010101010101010_101010001010
+else:
+    # 1x IRQs per frame
+    BLINK_IRQ1 = (0b10101010101010101010101000 << 6) + 19
+    BLINK_IRQ2 =  0b10101010101010101010_101010101010
+
+BLINK_FLASH = BLINK_IRQ1 | BLINK_LED
+
 irq_callbacks = [None]*8
+irq_table = {}
+irq_events = 0          # count of TX/RX IRQs, wakes engine's thread
 
 timer1 = Timer()
 timer2 = Timer()
@@ -335,39 +366,81 @@ def tx_fifo_purge():
 #-------------------------------------------------------
 # handler for IRQs
 
-def irq_handler(m):
-    global eng, stop
-    global tx_raw, rx_ticks_us, tx_ticks_us
-    global core_dis
-    global quarters, _hasUsbDevice
+def irq_blink(ticks):
+    global tx_raw, tx_ticks_us
+    global quarters, irq_events
 
-    core_dis[mem32[0xd0000000]] = disable_irq()
-    ticks = ticks_us()
+    irq_events = (irq_events + 1) & 0xFFFF
+    if sev:
+        sev()
 
-    if m==eng.sm[SM_BLINK]:
-        if quarters==0 and eng.sm[SM_TX_RAW].rx_fifo():
-            # only read RX FIFO every 4th interrupt
-            tx_raw = eng.sm[SM_TX_RAW].get()
+    if quarters==0 and eng.sm[SM_TX_RAW].rx_fifo():
+        # only read RX FIFO every 4th interrupt
+        tx_raw = eng.sm[SM_TX_RAW].get()
 
-        if _hasUsbDevice:
-            quarters += 1
-            if quarters==4:
-                quarters = 0
+    if _hasUsbDevice:
+        quarters += 1
+        if quarters==4:
+            quarters = 0
+
+    tx_ticks_us = ticks
+    if eng.prof and eng.prof.enabled:
+        eng.prof.irq(PROF_TX, ticks)
+
+def irq_sync(ticks):
+    global rx_ticks_us, irq_events
+
+    irq_events = (irq_events + 1) & 0xFFFF
+    if sev:
+        sev()
+
+    rx_ticks_us = ticks
+    if eng.prof and eng.prof.enabled:
+        eng.prof.irq(PROF_RX, ticks)
+
+def irq_buffer(ticks):
+    global stop
 
-        tx_ticks_us = ticks
+    # Buffer Underflow
+    stop = 1
+    eng.mode = HALTED
+    eng.fifo.underruns += 1
 
-    if m==eng.sm[SM_SYNC]:
-        rx_ticks_us = ticks
+# handlers, indexed by StateMachine
+irq_handlers = [None, irq_blink, irq_buffer, None, None, irq_sync, None, None]
 
-    if m==eng.sm[SM_BUFFER]:
-        # Buffer Underflow
-        stop = 1
-        eng.mode = HALTED
+def irq_attach(eng):
+    # Build dispatch table once, mapping each StateMachine to its handler and
+    # callback slot, so that the hard IRQ does constant work.
+    global irq_table
 
-    # check/schedule any registered callbacks
+    table = {}
     for i in range(len(eng.sm)):
-        if irq_callbacks[i] and m==eng.sm[i]:
-            schedule(irq_callbacks[i], i)
+        table[eng.sm[i]] = (irq_handlers[i], i)
+    irq_table = table
+
+    for m in eng.sm:
+        m.irq(handler=irq_handler, hard=True)
+
+def irq_handler(m):
+    global core_dis
+
+    core_dis[mem32[0xd0000000]] = disable_irq()
+    ticks = ticks_us()
+
+    entry = irq_table.get(m)
+    if entry:
+        handler, i = entry
+        if handler:
+            handler(ticks)
+
+        # schedule any registered callback
+        if irq_callbacks[i]:
+            if eng.prof and eng.prof.enabled:
+                schedule(profiled_callback, i)
+                eng.prof.handler(ticks_diff(ticks_us(), ticks))
+            else:
+                schedule(irq_callbacks[i], i)
             '''
             # prevent "Uncaught exception in IRQ callback handler"
             # which I believe is due to code overloading the CPU,
@@ -377,9 +450,22 @@ def irq_handler(m):
             except:
                 pass
             '''
+        elif eng.prof and eng.prof.enabled:
+            eng.prof.handler(ticks_diff(ticks_us(), ticks))
 
     enable_irq(core_dis[mem32[0xd0000000]])
 
+def rx_phase():
+    # RX vs TX phase (-320..320), from SM_START's count at RX sync
+    return ((4294967295 - rx_ticks[0] + 188) % 640) - 320
+
+def profiled_callback(i):
+    # time the registered callback, when profiling IRQs
+    cb = irq_callbacks[i]
+    if cb:
+        start = ticks_us()
+        cb(i)
+        eng.prof.callback(i, start, ticks_diff(ticks_us(), start))
 
 def timer_sched(timer):
     schedule(timer_re_init, timer)
@@ -445,424 +531,6 @@ def timer_re_init(timer):
 
 #---------------------------------------------
 
-# https://web.archive.org/web/20240000000000*/http://www.barney-wol.net/time/timecode.html
-# lookup this text in array, index is value used in TC
-
-tzs = [ \
-    "+0000","-0100","-0200","-0300","-0400","-0500","-0600","-0700","-0800","-0900", \
-    "-0030","-0130","-0230","-0330","-0430","-0530", \
-    "-1000","-1100","-1200","+1300","+1200","+1100","+1000","+0900","+0800","+0700", \
-    "-0630","-0730","-0830","-0930","-1030","-1130", \
-    "+0600","+0500","+0400","+0300","+0200","+0100","Undef","Undef","TP-03","TP-02", \
-    "+1130","+1030","+0930","+0830","+0730","+0630", \
-    "TP-01","TP-00","+1245","Undef","Undef","Undef","Undef","Undef","+XXXX","Undef", \
-    "+0530","+0430","+0330","+0230","+0130","+0030"]
-
-
-class timecode(object):
-    def __init__(self):
-        self.fps = 30.0
-        self.df = False      # Drop-Frame
-
-        # Timecode - starting value
-        self.hh = 0
-        self.mm = 0
-        self.ss = 0
-        self.ff = 0
-
-        # Colour Frame flag
-        self.cf = False
-
-        # Clock flag
-        self.bgf1 = False
-
-        # User bits - format depends on BF2 and BF0
-        self.bgf0 = True     # 4 ASCII characters
-        self.bgf2 = False
-
-        self.uf1 = 0x0       # 'PICO'
-        self.uf2 = 0x5
-        self.uf3 = 0x9
-        self.uf4 = 0x4
-        self.uf5 = 0x3
-        self.uf6 = 0x4
-        self.uf7 = 0xF
-        self.uf8 = 0x4
-
-        # Lock for multithreading
-        self.lock = _thread.allocate_lock()
-
-    def acquire(self):
-        self.lock.acquire()
-
-    def release(self):
-        self.lock.release()
-
-    def validate_for_drop_frame(self, reverse=False):
-        self.acquire()
-        if not reverse and self.df and self.ss == 0 and \
-                (self.ff == 0 or self.ff == 1):
-            if self.mm % 10 != 0:
-                self.ff += (2 - self.ff)
-        if reverse and self.df and self.ss == 0 and \
-                (self.ff == 0 or self.ff == 1):
-            if self.mm % 10 != 0:
-                if self.hh == 0:
-                    self.hh = 23
-                else:
-                    self.hh -= 1
-                self.mm = 59                    # only happens on mm==0
-                self.ss = 59
-                self.ff = int(self.fps + 0.1) - 1
-        self.release()
-
-    def from_ascii(self, start="00:00:00:00", sep=True):
-        # Example "00:00:00:00"
-        #          hh mm ss ff
-        #          01234567890
-
-        # convert ASCII to 'raw' BCD array
-        time = [x - 0x30 for x in bytes(start, "utf-8")]
-
-        self.acquire()
-        if sep == True:
-            # only change DF if separators are given
-            self.df = False
-
-            self.hh = (time[0]*10) + time[1]
-            self.mm = (time[3]*10) + time[4]
-            self.ss = (time[6]*10) + time[7]
-            self.ff = (time[9]*10) + time[10]
-
-            if time[8] != 10:
-                self.df = True
-        else:
-            self.hh = (time[0]*10) + time[1]
-            self.mm = (time[2]*10) + time[3]
-            self.ss = (time[4]*10) + time[5]
-            self.ff = (time[6]*10) + time[7]
-        self.release()
-
-        if self.df:
-            self.validate_for_drop_frame()
-    
-    def to_ascii(self, sep=True):
-        self.acquire()
-        if sep == True:
-            time = [int(self.hh/10), (self.hh % 10), 10,
-                    int(self.mm/10), (self.mm % 10), 10,
-                    int(self.ss/10), (self.ss % 10),
-                    (-2 if self.df == True else 10),    # use '.' for DF
-                    int(self.ff/10), (self.ff % 10)]
-        else:
-            time = [int(self.hh/10), (self.hh % 10),
-                    int(self.mm/10), (self.mm % 10),
-                    int(self.ss/10), (self.ss % 10),
-                    int(self.ff/10), (self.ff % 10)]
-        self.release()
-
-        new = ""
-        for x in time:
-            new += chr(x + 0x30)
-        return(new)
-
-    def from_raw(self, raw=0):
-        self.acquire()
-        self.df = (raw & 0x00000080) >> 7
-        self.hh = (raw & 0x1F000000) >> 24
-        self.mm = (raw & 0x003F0000) >> 16
-        self.ss = (raw & 0x00003F00) >> 8
-        self.ff = (raw & 0x0000001F)
-        self.release()
-
-    def to_raw(self):
-        self.acquire()
-        raw = (self.df << 7) + (self.hh << 24) + (self.mm << 16) + (self.ss << 8) + self.ff
-        self.release()
-
-        return raw
-
-    def set_fps_df(self, fps=25.0, df=False):
-        # should probably validate FPS/DF combo
-
-        self.acquire()
-        self.fps = fps
-        self.df = df
-        self.release()
-
-        if self.df:
-            self.validate_for_drop_frame()
-
-        return True
-
-    def next_frame(self, repeats=1):
-        while repeats:
-            repeats -= 1
-
-            self.acquire()
-            self.ff += 1
-            if self.ff >= int(self.fps + 0.1):
-                self.ff = 0
-                self.ss += 1
-                if self.ss >= 60:
-                    self.ss = 0
-                    self.mm += 1
-                    if self.mm >= 60:
-                        self.mm = 0
-                        self.hh += 1
-                        if self.hh >= 24:
-                            self.hh = 0
-            self.release()
-
-            if self.df:
-                self.validate_for_drop_frame()
-
-    def prev_frame(self, repeats=1):
-        while repeats:
-            repeats -= 1
-
-            self.acquire()
-            self.ff -= 1
-            if self.ff < 0:
-                self.ff = int(self.fps + 0.1) - 1
-                self.ss -= 1
-                if self.ss < 0:
-                    self.ss = 59
-                    self.mm -= 1
-                    if self.mm < 0:
-                        self.mm = 59
-                        self.hh -= 1
-                        if self.hh < 0:
-                            self.hh = 23
-            self.release()
-
-            if self.df:
-                self.validate_for_drop_frame(True)
-
-    # parity check, count 1's in 32-bit word
-    def lp(self, b):
-        c = 0
-        for i in range(32):
-            c += (b >> i) & 1
-
-        return(c)
-
-    def to_ltc_packet(self, send_sync=False, release=True):
-        f27 = False
-        f43 = False
-        f59 = False
-
-        self.acquire()
-        if self.fps == 25.0:
-            f27 = self.bgf0
-            f43 = self.bgf2
-        else:
-            f43 = self.bgf0
-            f59 = self.bgf2
-
-        p = []
-        p.append((self.uf2 << 12) + (self.cf  << 11) + (self.df << 10) +
-                ((int(self.ff/10) & 0x3) << 8) +
-                (self.uf1 << 4) + (self.ff % 10) +
-                (self.uf4 << 28) + (f27 << 27) +
-                ((int(self.ss/10) & 0x7) << 24) +
-                (self.uf3 << 20) + ((self.ss % 10) << 16))
-
-        p.append((self.uf6 << 12) + (f43 << 11) +
-                ((int(self.mm/10) & 0x7) << 8) +
-                (self.uf5 << 4) + (self.mm % 10) +
-                (self.uf8 << 28) + (f59 << 27) + (self.bgf1 << 26) +
-                ((int(self.hh/10) & 0x3) << 24) +
-                (self.uf7 << 20) + ((self.hh % 10) << 16))
-
-        # polarity correction
-        count = 13
-        for i in p:
-            count += self.lp(i)
-
-        if count & 1:
-            if self.fps == 25.0:
-                p[1] += (True << 27)    # f59
-            else:
-                p[0] += (True << 27)    # f27
-
-        if release:
-            self.release()
-
-        if send_sync:
-            # We want to send 'whole' 32bit words to FIFO, so add 2x Sync
-            s = []
-            s.append(((p[0] & 0x0000FFFF) << 16) + 0xBFFC)
-            s.append(((p[1] & 0x0000FFFF) << 16) + ((p[0] & 0xFFFF0000) >> 16))
-            s.append((0xBFFC << 16)              + ((p[1] & 0xFFFF0000) >> 16))
-
-            return s
-        else:
-            return p
-
-    def from_ltc_packet(self, p, acquire=True):
-        if len(p) != 2:
-            if not acquire:
-                # assume previously aquired
-                self.release()
-            return False
-
-        # reject if parity is not 1, note we are not including Sync word
-        '''
-        c = self.lp(p[0])
-        c+= self.lp(p[1])
-        if not c & 1:
-            return False
-        '''
-
-        if acquire:
-            self.acquire()
-        self.df = ((p[0] >> 10) & 0x01)
-        self.ff = (((p[0] >>  8) & 0x3) * 10) + (p[0] & 0xF)
-        self.ss = (((p[0] >> 24) & 0x7) * 10) + ((p[0] >> 16) & 0xF)
-        self.mm = (((p[1] >>  8) & 0x7) * 10) + (p[1] & 0xF)
-        self.hh = (((p[1] >> 24) & 0x3) * 10) + ((p[1] >> 16) & 0xF)
-
-        if self.fps == 25.0:
-            self.bgf0 = (p[0] >> 27) & 0x01 # f27
-            self.bgf2 = (p[1] >> 11) & 0x01 # f43
-        else:
-            self.bgf0 = (p[1] >> 11) & 0x01 # f43
-            self.bgf2 = (p[1] >> 27) & 0x01 # f59
-
-        self.bgf1 = (p[1] >> 26) & 0x01
-
-        self.uf1 = ((p[0] >>  4) & 0x0F)
-        self.uf2 = ((p[0] >> 12) & 0x0F)
-        self.uf3 = ((p[0] >> 20) & 0x0F)
-        self.uf4 = ((p[0] >> 28) & 0x0F)
-
-        self.uf5 = ((p[1] >>  4) & 0x0F)
-        self.uf6 = ((p[1] >> 12) & 0x0F)
-        self.uf7 = ((p[1] >> 20) & 0x0F)
-        self.uf8 = ((p[1] >> 28) & 0x0F)
-
-        self.release()
-        if self.ff >= int(self.fps):
-            return False
-        return True
-
-    def user_to_ascii(self):
-        new = ""
-        if self.bgf1==True:
-            # TC is referenced to real time
-            new += "*"
-
-        if self.bgf0==True and self.bgf2==True:
-            return("Page/Line NA")
-
-        self.acquire()
-        if self.bgf0==False and self.bgf2==False:
-            # Userbits are BCD/Hex
-            dehex = [0x30,0x31,0x32,0x33,0x34,0x35,0x36,0x37, \
-                    0x38,0x39,0x41,0x42,0x43,0x44,0x45,0x46]
-            user = [dehex[self.uf8], dehex[self.uf7], \
-                    dehex[self.uf6], dehex[self.uf5], \
-                    dehex[self.uf4], dehex[self.uf3], \
-                    dehex[self.uf2], dehex[self.uf1]]
-        elif self.bgf0==False and self.bgf2==True:
-            # Userbits are Date/Timezone
-            user = [0x59, 0x30+self.uf6, 0x30+self.uf5, 0x2D, \
-                    0x4D, 0x30+self.uf4, 0x30+self.uf3, 0x2D, \
-                    0x44, 0x30+self.uf2, 0x30+self.uf1]
-        else:
-            # Userbits are ASCII
-            user = [(self.uf2 << 4) + self.uf1,
-                    (self.uf4 << 4) + self.uf3,
-                    (self.uf6 << 4) + self.uf5,
-                    (self.uf8 << 4) + self.uf7]
-
-        for x in user:
-            new += chr(x)
-
-        if self.bgf0==False and self.bgf2==True:
-            i = (self.uf8 << 4) + self.uf7
-            if i < len(tzs):
-                new += tzs[i]
-            else:
-                new += tzs[0]
-
-        self.release()
-        return(new)
-
-    def user_from_ascii(self, asc="PICO"):
-        user = [x for x in bytes(asc+"    ", "utf-8")]
-
-        self.acquire()
-        self.bgf0 = True
-        self.bgf2 = False
-        self.uf1 = (user[0] >> 0) & 0x0F
-        self.uf2 = (user[0] >> 4) & 0x0F
-        self.uf3 = (user[1] >> 0) & 0x0F
-        self.uf4 = (user[1] >> 4) & 0x0F
-        self.uf5 = (user[2] >> 0) & 0x0F
-        self.uf6 = (user[2] >> 4) & 0x0F
-        self.uf7 = (user[3] >> 0) & 0x0F
-        self.uf8 = (user[3] >> 4) & 0x0F
-        self.release()
-
-        return True
-
-    def user_from_bcd_hex(self, bcd="00000000"):
-        user = []
-        for x in bytes(bcd + "00000000", "utf-8"):
-            if (x >= 0x30) and (x < 0x3A):
-                user.append(x - 0x30)
-            if (x >= 0x41) and (x < 0x47):
-                user.append(x - 0x37)
-            if (x >= 0x61) and (x < 0x67):
-                user.append(x - 0x57)
-
-        self.acquire()
-        self.bgf0 = False
-        self.bgf2 = False
-        self.uf1 = (user[7] & 0x0F)
-        self.uf2 = (user[6] & 0x0F)
-        self.uf3 = (user[5] & 0x0F)
-        self.uf4 = (user[4] & 0x0F)
-        self.uf5 = (user[3] & 0x0F)
-        self.uf6 = (user[2] & 0x0F)
-        self.uf7 = (user[1] & 0x0F)
-        self.uf8 = (user[0] & 0x0F)
-        self.release()
-
-        return True
-
-    def user_from_date(self, date="Y74-M01-D01+0000"):
-        # Example "Y00-M00-D00+0000"
-        #          Yyy Mmm Dddzzzzz
-        #          0123456789012345
-        user = [x-0x30 for x in bytes(date, "utf-8")]
-
-        self.acquire()
-        self.bgf0 = False
-        self.bgf2 = True
-        self.uf1 = user[10] # DD
-        self.uf2 = user[9]
-        self.uf3 = user[6]  # MM
-        self.uf4 = user[5]
-        self.uf5 = user[2]  # YY
-        self.uf6 = user[1]
-
-        self.uf7 = 0
-        self.uf8 = 0
-        for i in range(len(tzs)):
-            if date[11:] == tzs[i]:
-                self.uf7 = i & 0x0F
-                self.uf8 = (i>>4) & 0xFF
-                break
-        self.release()
-
-        return True
-
-
-#---------------------------------------------
-
 class engine(object):
     def __init__(self):
         self.mode = RUN
@@ -880,6 +548,14 @@ class engine(object):
         self.period = 10000 # 10s, can be update by client
         self.timers = False
 
+        self.lookahead = 8  # frames rendered ahead of FIFOs, can be updated by client
+        self.dma = False    # DMA fed FIFOs in 'RUN' mode, can be updated by client
+        self.dma_frames = 32 # frames per DMA half buffer, can be updated by client
+        self.fifo = fifo_stats()
+        self.event_driven = True # sleep until IRQs, rather than polling, can be updated by client
+        self.duty = array("I", [0, 0])  # us awake, us elapsed
+        self.prof = None    # IRQ profiler, see 'profile()'
+
         # state of running (ie whether being used for output)
         self.stopped = True
         self.powersave = False
@@ -919,20 +595,10 @@ class engine(object):
             calval = self.calval
 
         # optimal divider computed for CPU clock at 180MHz
-        if fps == 30.00:
-            new_div = 0x0927c000
-        elif fps == 29.97:
-            new_div = 0x092a1800
-        elif fps == 25.00:
-            new_div = 0x0afc8000
-        elif fps == 24.98:
-            new_div = 0x0aff5000
-        elif fps == 24.00:
-            new_div = 0x0b71b000
-        elif fps == 23.98:
-            new_div = 0x0b749e00
-        else:
+        rate = framerate_index(fps)
+        if rate is None:
             return
+        new_div = framerates[rate][FR_DIV]
 
         # apply divider offset, from calibration value
         new_div -= int(calval) << 8
@@ -998,9 +664,42 @@ class engine(object):
 
         return self.calval
 
+    def stats(self, reset=False):
+        # FIFO headroom, sampled by engine thread on each refill
+        d = self.fifo.to_dict()
+        if reset:
+            self.fifo.reset()
+        return d
+
+    def print_stats(self):
+        self.fifo.dump()
+
+    def duty_cycle(self, reset=False):
+        # proportion of time engine's thread is awake, and awake us per frame
+        awake = self.duty[0]
+        elapsed = self.duty[1]
+        if reset:
+            self.duty[0] = 0
+            self.duty[1] = 0
+
+        if elapsed == 0:
+            return (0, 0)
+        return (awake / elapsed, 1000000 * awake / (elapsed * self.tc.fps))
+
+    def profile(self, enable=True, size=512):
+        # record IRQ timestamps and callback durations, ring of 'size'
+        # entries is only allocated when first enabled
+        if enable:
+            if not self.prof or self.prof.size < size:
+                self.prof = irq_profiler(size)
+            self.prof.start()
+        elif self.prof:
+            self.prof.stop()
+        return self.prof
+
     def set_flashtime(self, ft):
         self.dlock.acquire()
-        self.flashtime = (ft.df << 7) + (ft.hh << 24) + (ft.mm << 16) + (ft.ss << 8) + ft.ff
+        self.flashtime = ft.to_raw()
         self.dlock.release()
 
 #-------------------------------------------------------
@@ -1010,6 +709,9 @@ def pico_timecode_thread(eng, stop):
     global quarters
 
     eng.set_stopped(False)
+    eng.fifo.reset()
+    eng.duty[0] = 0
+    eng.duty[1] = 0
     quarters = 0
     
     # Pre-load 'SYNC' word into RX decoder - only needed once
@@ -1019,6 +721,28 @@ def pico_timecode_thread(eng, stop):
 
     send_sync = True        # send 1st packet with sync header
 
+    # Ring of frames rendered ahead of the FIFOs, 6 words per frame:
+    # LTC packet (2 or 3 words), 'raw' TX value, 2 Blink/LED words.
+    # Views are made once, so FIFOs are refilled without allocations.
+    ahead = max(2, eng.lookahead)
+    ring = array("I", [0] * (6 * ahead))
+    ring_sync = bytearray(ahead)
+
+    mv = memoryview(ring)
+    ring_ltc_sync = [mv[(6 * k):(6 * k) + 3] for k in range(ahead)]
+    ring_ltc = [mv[(6 * k):(6 * k) + 2] for k in range(ahead)]
+    ring_blink = [mv[(6 * k) + 4:(6 * k) + 6] for k in range(ahead)]
+    ring_h = halfwords(ring)
+
+    head = 0                # next frame to put into FIFOs
+    count = 0               # frames rendered, but not yet in FIFOs
+
+    # changes which require rendered frames to be invalidated
+    tc_seq = eng.tc.seq
+    tc_sets = eng.tc.sets
+    flashframe = eng.flashframe
+    flashtime = eng.flashtime
+
     # Set up Blink/LED timing
     # 1st LED on for 10 (~16ms) of 20 sub-divisions
     # plus 4 sub-divions of 'extra sync'
@@ -1032,25 +756,15 @@ def pico_timecode_thread(eng, stop):
     # '10101001111111110111111101->'
     # '10101010101010101000101010100010'
 
-    BLINK_LED = 0b01010101010101010101 << 6         # ~16ms flash
-
     if _hasUsbDevice:
         # 4x IRQs per frame, long first frame
         eng.sm[SM_BLINK].put((0b101010001010101000_11111111 << 6) + 23)
         eng.sm[SM_BLINK].put( 0b101010101010_10101000101010100010)
-
-        # normally...
-        BLINK_IRQ1 = (0b10100010101010001010101000 << 6) + 19
-        BLINK_IRQ2 =  0b10101010101010101010_101010001010
     else:
         # 1x IRQs per frame, long first frame
         eng.sm[SM_BLINK].put((0b101010101010101000_11111111 << 6) + 23)
         eng.sm[SM_BLINK].put( 0b101010101010_10101010101010101010)
 
-        # normally...
-        BLINK_IRQ1 = (0b10101010101010101010101000 << 6) + 19
-        BLINK_IRQ2 =  0b10101010101010101010_101010101010
-
     # Ensure Timecodes are using same fps/df settings
     eng.tc.acquire()
     fps = eng.tc.fps
@@ -1059,8 +773,20 @@ def pico_timecode_thread(eng, stop):
 
     eng.rc.set_fps_df(fps, df)
 
-    scratch = timecode()
-    scratch.set_fps_df(fps, df)
+    # RX FIFO is read into words, which are decoded from their bytes
+    rx_words = array("I", [0, 0])
+    rx_bytes = bytearray_at(addressof(rx_words), 8)
+    expected = -1           # frame count expected next, when Jamming
+
+    # Optionally stream frames into FIFOs with DMA, only when free running
+    # as Jam/Monitor need to adjust TX on a per-frame basis. Changes to the
+    # userbits or flash settings take effect when the next half is rendered.
+    feeder = None
+    refills = 0
+    if eng.dma and eng.mode == RUN:
+        feeder = dma_feeder(rp2.DMA, eng.dma_frames, BLINK_IRQ1, BLINK_IRQ2, BLINK_LED)
+        feeder.render(0, eng)
+        feeder.render(1, eng)
 
     # Start StateMachines (except 'SM_START')
     startup_complete = False
@@ -1107,38 +833,43 @@ def pico_timecode_thread(eng, stop):
         CLOCKS_SLEEP_EN1 = None
 
 
+    # Frame period, to limit waiting for IRQs
+    period = int(1000000 / fps)
+    woken = ticks_us()
+
     # Main Loop, service FIFOs and increasing counter
     while not stop():
+        busy = False
+
         # Empty RX FIFOs as they fill
         # wait for both to be available
         while eng.sm[SM_SYNC].rx_fifo() >= 2:
+            busy = True
             if eng.sm[SM_START].rx_fifo():
-                rx_ticks = eng.sm[SM_START].get()
+                eng.sm[SM_START].get(rx_ticks)
 
-            p = []
+            # decode without allocating, as a GC could cause TX underflow
             eng.rc.acquire()
-            p.append(eng.sm[SM_SYNC].get())
-            p.append(eng.sm[SM_SYNC].get())
-            eng.rc.from_ltc_packet(p, False)
+            eng.sm[SM_SYNC].get(rx_words)
+            valid = eng.rc.from_ltc_bytes(rx_bytes, False)
 
             if eng.mode > MONITOR:
                 # should perform some basic validation:
-                s = scratch.to_raw()
-                r = eng.rc.to_raw()
-                fail = False
+                fc = eng.rc.fc
+                fail = not valid
 
                 # check DF flags match
-                if ((r & 0x00000080) >> 7) != df:
+                if eng.rc.df != df:
                     fail = True
 
                 # check packets are counting correctly
-                if s!=0:
-                    if s!=r:
-                        fail = True
+                if expected >= 0 and fc != expected:
+                    fail = True
 
-                if r!=0:
-                    scratch.from_raw(r)
-                    scratch.next_frame()
+                if eng.rc.raw != 0:
+                    expected = fc + 1
+                    if expected == eng.rc.total:
+                        expected = 0
                 else:
                     fail = True
 
@@ -1149,40 +880,76 @@ def pico_timecode_thread(eng, stop):
 
                 if eng.mode == MONITOR:
                     # Jam to 'next' RX timecode
-                    s = eng.rc.to_raw()
-                    eng.tc.from_raw(s)
-                    eng.tc.next_frame(2)
+                    eng.tc.from_frames(eng.rc.fc + 2)
 
                     # clone Userbit Clock flag
                     eng.tc.bgf1 = eng.rc.bgf1
 
+        # Timecode/userbits written since frames were rendered (including
+        # by Jam), or flash changed. A label which was set is the next to go
+        # into the FIFOs, so rendered frames are dropped; otherwise they are
+        # re-rendered from the first frame not yet in the FIFOs.
+        seq = eng.tc.seq
+        if (seq != tc_seq or flashframe != eng.flashframe or \
+                flashtime != eng.flashtime) and not seq & 1:
+            flashframe = eng.flashframe
+            flashtime = eng.flashtime
+
+            if eng.tc.sets != tc_sets or not count:
+                tc_sets = eng.tc.sets
+                tc_seq = seq
+                if count & 1:
+                    send_sync = not send_sync
+                count = 0
+            elif eng.tc.advance(seq, -count):
+                # otherwise written again, so retried on next pass
+                tc_seq = (seq + 2) & 0xFFFF
+                if count & 1:
+                    send_sync = not send_sync
+                count = 0
+
+        # DMA is filling the FIFOs, refill the halves which have played
+        if feeder:
+            if not feeder.running:
+                feeder.start((eng.sm[SM_BUFFER], eng.sm[SM_BLINK], eng.sm[SM_TX_RAW]),
+                             (SM_BUFFER, SM_BLINK, SM_TX_RAW))
+
+                # enable 'Start' machine last, so it can synchronise others...
+                eng.sm[SM_START].active(1)
+                startup_complete = True
+                busy = True
+            elif not feeder.service(eng):
+                # stale frames were sent, treat as Buffer Underflow
+                eng.fifo.underruns += 1
+                eng.mode = HALTED
+                break
+
+            if refills != feeder.refills:
+                eng.fifo.sample(eng.sm[SM_BUFFER].tx_fifo(), eng.sm[SM_BLINK].tx_fifo(),
+                                eng.sm[SM_TX_RAW].tx_fifo(), eng.sm[SM_SYNC].rx_fifo())
+                refills = feeder.refills
+                busy = True
+
         # Wait for TX FIFO to be empty enough to accept next packet
-        while eng.mode <= MONITOR and eng.sm[SM_BUFFER].tx_fifo() < (6 - send_sync):
-            eng.sm[SM_TX_RAW].put(eng.tc.to_raw())      # 1 word into FIFO
-
-            for w in eng.tc.to_ltc_packet(send_sync, False):
-                eng.sm[SM_BUFFER].put(w)                # 2 or 3 words into FIFO
-            eng.tc.release()
-            send_sync = not send_sync
-
-            # Calculate next frame value
-            eng.tc.next_frame()
-
-            # Does the LED flash for the next frame?
-            if eng.flashframe >= 0:
-                if eng.tc.ff == eng.flashframe:
-                    eng.sm[SM_BLINK].put(BLINK_IRQ1 | BLINK_LED)
-                    eng.sm[SM_BLINK].put(BLINK_IRQ2)    # 2 words into FIFO
-                else:
-                    eng.sm[SM_BLINK].put(BLINK_IRQ1)
-                    eng.sm[SM_BLINK].put(BLINK_IRQ2)
+        while eng.mode <= MONITOR and count and \
+                eng.sm[SM_BUFFER].tx_fifo() < (6 - ring_sync[head]):
+            busy = True
+            eng.fifo.sample(eng.sm[SM_BUFFER].tx_fifo(), eng.sm[SM_BLINK].tx_fifo(),
+                            eng.sm[SM_TX_RAW].tx_fifo(), eng.sm[SM_SYNC].rx_fifo())
+
+            eng.sm[SM_TX_RAW].put(ring[(6 * head) + 3])  # 1 word into FIFO
+
+            if ring_sync[head]:
+                eng.sm[SM_BUFFER].put(ring_ltc_sync[head])  # 3 words into FIFO
             else:
-                if eng.tc.to_raw() == eng.flashtime:
-                    eng.sm[SM_BLINK].put(BLINK_IRQ1 | BLINK_LED)
-                    eng.sm[SM_BLINK].put(BLINK_IRQ2)
-                else:
-                    eng.sm[SM_BLINK].put(BLINK_IRQ1)
-                    eng.sm[SM_BLINK].put(BLINK_IRQ2)
+                eng.sm[SM_BUFFER].put(ring_ltc[head])       # 2 words into FIFO
+
+            eng.sm[SM_BLINK].put(ring_blink[head])      # 2 words into FIFO
+
+            head += 1
+            if head == ahead:
+                head = 0
+            count -= 1
 
             # Complete start-up sequence
             if not startup_complete:
@@ -1190,8 +957,68 @@ def pico_timecode_thread(eng, stop):
                 eng.sm[SM_START].active(1)
                 startup_complete = True
 
-
-        if eng.powersave and eng.sm[SM_BUFFER].tx_fifo() > 5:
+        # Render next frame into ring, one per pass so FIFOs are refilled
+        # promptly. Not whilst a write is waiting to be handled (above).
+        if eng.mode <= MONITOR and count < ahead and not feeder and \
+                eng.tc.seq == tc_seq:
+            busy = True
+            k = head + count
+            if k >= ahead:
+                k -= ahead
+
+            ring[(6 * k) + 3] = eng.tc.to_raw()
+            eng.tc.to_ltc_halves(ring_h, 12 * k, send_sync, tc_seq)
+
+            # Calculate next frame value, unless written since it was read
+            # (or being written) - then the frame is rendered again. Only
+            # the feeder's own write may have bumped 'seq'.
+            if eng.tc.advance(tc_seq):
+                ring_sync[k] = send_sync
+                send_sync = not send_sync
+                tc_seq = (tc_seq + 2) & 0xFFFF
+
+                # Does the LED flash for the next frame?
+                blink = ring_blink[k]
+                if eng.flashframe >= 0:
+                    if eng.tc.ff == eng.flashframe:
+                        blink[0] = BLINK_FLASH
+                    else:
+                        blink[0] = BLINK_IRQ1
+                else:
+                    if eng.tc.to_raw() == eng.flashtime:
+                        blink[0] = BLINK_FLASH
+                    else:
+                        blink[0] = BLINK_IRQ1
+                blink[1] = BLINK_IRQ2
+
+                count += 1
+
+        # Nothing to do until next TX/RX IRQ, so let core sleep (WFE)
+        # rather than spinning on the FIFO levels. The handlers run on core 0
+        # and wake us with SEV, else 'idle()' returns on SysTick - polling
+        # 'irq_events' every 1ms. It returns on SysTick either way.
+        if not busy and eng.event_driven and not eng.powersave:
+            now = ticks_us()
+            events = irq_events
+            asleep = 0
+            while irq_events == events and not stop():
+                slept = ticks_us()
+                if ticks_diff(slept, now) >= period:
+                    break
+                idle()
+                asleep += ticks_diff(ticks_us(), slept)
+
+            # account time awake vs. asleep, including the SysTick wake ups
+            # above, scaled to avoid large ints
+            awake = ticks_diff(now, woken)
+            woken = ticks_us()
+            eng.duty[0] += awake + ticks_diff(woken, now) - asleep
+            eng.duty[1] += awake + ticks_diff(woken, now)
+            if eng.duty[1] > 0x10000000:
+                eng.duty[0] >>= 1
+                eng.duty[1] >>= 1
+
+        if eng.powersave and eng.sm[SM_BUFFER].tx_fifo() > 5 and not feeder:
             # requires special build microPython with ability to control CLKs
             # lightsleep for longer than a frame is possible, with FIFOs, but
             # may cause IRQs to merged and thus corrupt reporting.
@@ -1207,6 +1034,9 @@ def pico_timecode_thread(eng, stop):
                 eng.set_powersave(False)
             '''
 
+    if feeder:
+        feeder.stop()
+
     # Stop all StateMachines, disable IRQs and empty RX FIFOs
     for m in eng.sm:
         m.active(0)
@@ -1328,15 +1158,7 @@ if _hasUsbDevice:
 
         def send_long_mtc(self, raw):
             # determine FPS encoding
-            fps = eng.tc.fps
-            if fps == 30.00:
-                self.mtc_fps = 0b11
-            elif fps == 29.97:
-                self.mtc_fps = 0b10
-            elif fps == 25.00:
-                self.mtc_fps = 0b01
-            else:   # 24.00
-                self.mtc_fps = 0b00
+            self.mtc_fps = mtc_code(eng.tc.rate, eng.tc.df)
 
             p = bytearray(b"\xF0\x7F\x7F\x01\x01")
             p.append(((raw & 0x1F000000) >> 24) +
@@ -1419,7 +1241,7 @@ def ascii_display_thread(init_mode = RUN):
 
         # Allocate appropriate StateMachines, and their pins
         eng.sm = []
-        sm_freq = int(eng.tc.fps + 0.1) * 80 * 32
+        sm_freq = framerates[eng.tc.rate][FR_SM_FREQ]
 
         # Note: we always want the 'sync' SM to be first in the list.
         if eng.mode > MONITOR:
@@ -1489,8 +1311,7 @@ def ascii_display_thread(init_mode = RUN):
         eng.config_clocks(eng.tc.fps)
 
         # set up IRQ handler
-        for m in eng.sm:
-            m.irq(handler=irq_handler, hard=True)
+        irq_attach(eng)
 
         if _hasUsbDevice:
             # set up MTC engine
@@ -1528,7 +1349,7 @@ def ascii_display_thread(init_mode = RUN):
                 # Async - display RX whenever we notice value has changed
                 asc = eng.rc.to_ascii()
                 if disp_asc != asc:
-                    phase = ((4294967295 - rx_ticks + 188) % 640) - 320
+                    phase = rx_phase()
                     if phase < -32:
                         # RX is ahead/earlier than TX
                         phases = ((" "*10) + ":" + ("+"*int(abs(phase/32))) + (" "*10)) [:21]
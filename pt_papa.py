@@ -65,6 +65,7 @@ from libs.pid import *
 from libs.umenu import *
 from libs.neotimer import *
 from libs.lowpower import *
+from libs.framerates import framerates, FR_SM_FREQ
 
 # Requires modified lib
 # https://github.com/mungewell/pico-oled-1.3-driver/tree/pico_timecode
@@ -97,7 +98,7 @@ displayfps = None
 calibration = None
 
 def add_more_state_machines():
-    sm_freq = int(pt.eng.tc.fps * 80 * 32)
+    sm_freq = framerates[pt.eng.tc.rate][FR_SM_FREQ]
 
     # TX State Machines
     if pt._hasUsbDevice:
@@ -133,8 +134,7 @@ def add_more_state_machines():
     pt.eng.config_clocks(pt.eng.tc.fps)
 
     # set up IRQ handler
-    for m in pt.eng.sm:
-        m.irq(handler=pt.irq_handler, hard=True)
+    pt.irq_attach(pt.eng)
 
 def apply_calibration():
     global displayfps, calibration
@@ -394,7 +394,7 @@ def callback_stop_start():
 
         pt.eng.sm = []
         pt.eng.sm.append(rp2.StateMachine(pt.SM_START, pt.auto_start, \
-                            freq=int(pt.eng.tc.fps * 80 * 32), \
+                            freq=framerates[pt.eng.tc.rate][FR_SM_FREQ], \
                             jmp_pin=Pin(21)))        # RX Decoding
         add_more_state_machines()
 
@@ -441,7 +441,7 @@ def callback_jam():
     # Reconfigure PIOs
     pt.eng.sm = []
     pt.eng.sm.append(rp2.StateMachine(pt.SM_START, pt.start_from_sync, 
-                           freq=int(pt.eng.tc.fps * 80 * 32),
+                           freq=framerates[pt.eng.tc.rate][FR_SM_FREQ],
                            in_base=Pin(21),
                            jmp_pin=Pin(21)))        # Sync from RX LTC
     add_more_state_machines()
@@ -779,7 +779,7 @@ def OLED_display_thread(mode=pt.RUN):
 
     # Allocate appropriate StateMachines, and their pins
     pt.eng.sm = []
-    sm_freq=int(pt.eng.tc.fps * 80 * 32)
+    sm_freq = framerates[pt.eng.tc.rate][FR_SM_FREQ]
     if pt.eng.mode > pt.MONITOR:
         pt.eng.sm.append(rp2.StateMachine(pt.SM_START, pt.start_from_sync, freq=sm_freq,
                            in_base=Pin(21),
@@ -1016,7 +1016,7 @@ def OLED_display_thread(mode=pt.RUN):
                     # and should increase 'duty' to slow down it's bit-clock
                     now = utime.time()
                     if pt.eng.mode == pt.MONITOR:
-                        d = (((4294967295 - pt.rx_ticks + 188) % 640) - 320) / 640
+                        d = pt.rx_phase() / 640
                         phase.store(d, now)
 
                         # Pause for a bit, more if we're trying to calibrate
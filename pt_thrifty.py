@@ -46,6 +46,7 @@ from libs.neotimer import *
 from libs.statemachine import *
 from libs.ht16k33segment import HT16K33Segment
 from libs.ht16k33segment14 import HT16K33Segment14
+from libs.framerates import framerates, framerate_index, FR_FPS, FR_NAME, FR_KEY, FR_SM_FREQ
 
 import pico_timecode as pt
 
@@ -73,14 +74,15 @@ thrifty_period = 10
 thrifty_synced = 0
 thrifty_pcb_rev = 2
 
+# frame rate descriptor (see libs/framerates.py), DF, colour
 thrifty_available_fps_df = [
-        [30,     False,  (255, 0,   0  ), 0b11, "30.00"],      # Red
-        [30,     True,   (255, 0,   255), 0b10, "30.00"],      # Purple
-        [29.97,  False,  (255, 255, 0  ), 0b11, "29.97"],      # Yellow
-        [29.97,  True,   (255, 128, 0  ), 0b10, "29.97"],      # Orange
-        [25,     False,  (0,   255, 0  ), 0b01, "25.00"],      # Green
-        [24,     False,  (0,   0,   255), 0b00, "24.00"],      # Blue
-        [23.98,  False,  (0,   128, 128), 0b00, "23.98"],      # Cyan
+        [framerate_index(30),    False,  (255, 0,   0  )],      # Red
+        [framerate_index(30),    True,   (255, 0,   255)],      # Purple
+        [framerate_index(29.97), False,  (255, 255, 0  )],      # Yellow
+        [framerate_index(29.97), True,   (255, 128, 0  )],      # Orange
+        [framerate_index(25),    False,  (0,   255, 0  )],      # Green
+        [framerate_index(24),    False,  (0,   0,   255)],      # Blue
+        [framerate_index(23.98), False,  (0,   128, 128)],      # Cyan
         ]
 
 # ----------------------
@@ -142,12 +144,12 @@ def start_state_machines(mode=pt.RUN):
         pass
 
     setting = None
-    check = str(thrifty_available_fps_df[thrifty_current_fps][0])
+    rate = framerates[thrifty_available_fps_df[thrifty_current_fps][0]]
+    check = rate[FR_KEY]
 
-    if int(thrifty_available_fps_df[thrifty_current_fps][0]) == \
-            thrifty_available_fps_df[thrifty_current_fps][0]:
+    if check.find('.') < 0:
         # Note: '30.0' may also be written '30' or '30.00'
-        root = check.split('.')[0]
+        root = check
         try:
             setting = config.calibration[root]
         except:
@@ -185,13 +187,13 @@ def start_state_machines(mode=pt.RUN):
     except:
         pt.eng.tc.from_ascii("00:00:00:00")
 
-    pt.eng.tc.set_fps_df(thrifty_available_fps_df[thrifty_current_fps][0],
+    pt.eng.tc.set_fps_df(framerates[thrifty_available_fps_df[thrifty_current_fps][0]][FR_FPS],
                          thrifty_available_fps_df[thrifty_current_fps][1])
 
     pt.eng.sm = []
     pt.eng.mode = mode
 
-    sm_freq = int(pt.eng.tc.fps + 0.1) * 80 * 32
+    sm_freq = framerates[pt.eng.tc.rate][FR_SM_FREQ]
 
     if pt.eng.mode > pt.MONITOR:
         pt.eng.sm.append(rp2.StateMachine(pt.SM_START, pt.start_from_sync, freq=sm_freq,
@@ -236,8 +238,7 @@ def start_state_machines(mode=pt.RUN):
     pt.eng.config_clocks(pt.eng.tc.fps)
 
     # set up IRQ handler
-    for m in pt.eng.sm:
-        m.irq(handler=pt.irq_handler, hard=True)
+    pt.irq_attach(pt.eng)
 
     if pt._hasUsbDevice:
         # set up MTC engine
@@ -433,7 +434,7 @@ def menu_jam_logic():
         # Update config with current fps/df selection
         try:
             setting = config.setting['framerate']
-            setting[0] = str(thrifty_available_fps_df[thrifty_current_fps][0])
+            setting[0] = framerates[thrifty_available_fps_df[thrifty_current_fps][0]][FR_KEY]
             config.set('setting', 'framerate', setting)
 
             setting = config.setting['dropframe']
@@ -643,7 +644,7 @@ def slate_show_fps_df(index, blink=False):
                 slate_HM.power_on()
             slate_SF.power_on()
 
-    asc = str(thrifty_available_fps_df[index][4])
+    asc = framerates[thrifty_available_fps_df[index][0]][FR_NAME]
 
     for i in range(4):
         slate_SF.set_character(asc[i+(1 if i>1 else 0)], \
@@ -809,7 +810,7 @@ def thrifty_display_thread(mode=pt.RUN):
         setting = config.setting['framerate']
         for i in range(len(thrifty_available_fps_df)):
             # find first matching fps
-            if setting[0] == str(thrifty_available_fps_df[i][0]):
+            if setting[0] == framerates[thrifty_available_fps_df[i][0]][FR_KEY]:
                 thrifty_current_fps = i
                 break
 
@@ -1031,7 +1032,7 @@ def thrifty_display_thread(mode=pt.RUN):
                     monTimer.start()
                     pid = None
                 elif monTimer.repeat_execution():
-                    phase = ((4294967295 - pt.rx_ticks + 188) % 640) - 320
+                    phase = pt.rx_phase()
                     if phase < -32:
                         # RX is ahead/earlier than TX
                         phases = ((" "*10) + ":" + ("+"*int(abs(phase/32))) + (" "*10)) [:21]
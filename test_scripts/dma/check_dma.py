@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#
+# Check the DMA double buffering in 'libs/dmafeed.py' against host
+# stand-ins for rp2.DMA/StateMachine. The StateMachines consume words at
+# the rate they would on the Pico, whilst the refill is serviced every
+# few frames; streams must match the frame-by-frame encoder, and a late
+# refill must be reported as an underrun.
+
+from argparse import ArgumentParser
+from array import array
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.timecode import timecode
+from libs.dmafeed import dma_feeder
+
+from fake_rp2 import DMA, StateMachine
+
+BLINK_LED  = 0b01010101010101010101 << 6
+BLINK_IRQ1 = (0b10101010101010101010101000 << 6) + 19
+BLINK_IRQ2 =  0b10101010101010101010_101010101010
+
+class engine(object):
+    def __init__(self, fps, df):
+        self.tc = timecode()
+        self.tc.set_fps_df(fps, df)
+        self.tc.from_ascii("00:59:58:00", False)
+        self.flashframe = 0
+        self.flashtime = 0
+
+def run(fps, df, frames, interval, late):
+    DMA.reset()
+    eng = engine(fps, df)
+    ref = timecode()
+    ref.set_fps_df(fps, df)
+    ref.from_raw(eng.tc.to_raw())
+
+    sm_buffer = StateMachine(2, 8)
+    sm_blink = StateMachine(1, 8)
+    sm_raw = StateMachine(4, 9)         # TX + RX FIFOs, plus X
+
+    feeder = dma_feeder(DMA, frames, BLINK_IRQ1, BLINK_IRQ2, BLINK_LED)
+    feeder.render(0, eng)
+    feeder.render(1, eng)
+    feeder.start([sm_buffer, sm_blink, sm_raw], [2, 1, 4])
+    DMA.run()
+
+    w = array("I", [0, 0, 0])
+    bits = 0
+    for n in range(12 * frames):
+        # encoder consumes 80 bits per frame
+        bits += 80
+        while bits >= 32:
+            word = sm_buffer.pull()
+            if word is None:
+                print("PIO underflow at frame", n)
+                return False
+            bits -= 32
+
+        sm_blink.pull()
+        sm_blink.pull()
+        raw = sm_raw.pull()
+
+        if raw != ref.to_raw():
+            if feeder.underrun:
+                # stale data, which must have been reported
+                return "underrun"
+            print("MISMATCH at frame %d: 0x%8.8x != 0x%8.8x" % (n, raw, ref.to_raw()))
+            return False
+        ref.next_frame()
+
+        DMA.run()
+
+        # Python thread services the refill every few frames, unless it is late
+        if n % interval == 0 and not (late and late[0] <= n < late[1]):
+            if not feeder.service(eng):
+                return "underrun"
+
+    feeder.stop()
+    return "ok"
+
+def check_streams(fps, df, frames):
+    # compare whole buffers against the frame-by-frame encoder
+    eng = engine(fps, df)
+    ref = timecode()
+    ref.set_fps_df(fps, df)
+    ref.from_raw(eng.tc.to_raw())
+
+    feeder = dma_feeder(DMA, frames, BLINK_IRQ1, BLINK_IRQ2, BLINK_LED)
+    feeder.render(0, eng)
+    feeder.render(1, eng)
+
+    ltc = []
+    w = array("I", [0, 0, 0])
+    for f in range(2 * feeder.frames):
+        n = ref.to_ltc_words(w, not f & 1)
+        ltc += list(w[:n])
+        ref.next_frame()
+
+    return ltc == list(feeder.ltc)
+
+def main():
+    parser = ArgumentParser(prog="check_dma")
+
+    parser.add_argument("-f", "--frames",
+        type=int, default=32, dest="frames",
+        help="frames per half buffer")
+
+    parser.add_argument("-i", "--interval",
+        type=int, default=4, dest="interval",
+        help="frames between refill checks")
+
+    options = parser.parse_args()
+    ok = True
+
+    for fps, df in [(30.0, False), (29.97, True), (25.0, False), (23.98, False)]:
+        label = "%5.2f%s" % (fps, "-DF" if df else "   ")
+
+        if not check_streams(fps, df, options.frames):
+            print(label, ": LTC words do not match encoder")
+            ok = False
+
+        # odd, and too few, frames are rounded up to even
+        if not check_streams(fps, df, 1):
+            print(label, ": LTC words do not match encoder, with 1 frame")
+            ok = False
+
+        result = run(fps, df, options.frames, options.interval, None)
+        print(label, ": serviced every %d frames -> %s" % (options.interval, result))
+        ok &= result == "ok"
+
+        # stall the refill for longer than a half buffer
+        stall = (2 * options.frames, 4 * options.frames)
+        result = run(fps, df, options.frames, options.interval, stall)
+        print(label, ": refill stalled for %d frames -> %s" % (stall[1] - stall[0], result))
+        ok &= result == "underrun"
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
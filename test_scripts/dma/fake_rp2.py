@@ -0,0 +1,139 @@
+# Stand-ins for 'rp2.DMA' and 'rp2.StateMachine' FIFOs, so that the
+# DMA buffer swapping in 'libs/dmafeed.py' can be exercised on a host.
+#
+# DMA channels move one word per step() whilst the StateMachine's TX FIFO
+# has space (ie. paced by its DREQ), reload their count when triggered,
+# chain to another channel and call their IRQ handler on completion.
+
+from collections import deque
+
+class StateMachine(object):
+    def __init__(self, id, depth=4):
+        self.id = id
+        self.depth = depth
+        self.tx = deque()
+        self.rx = deque()
+
+    def put(self, value, shift=0):
+        if isinstance(value, int):
+            value = [value]
+        for w in value:
+            if len(self.tx) >= self.depth:
+                raise OverflowError("TX FIFO full, SM %d" % self.id)
+            self.tx.append((w << shift) & 0xFFFFFFFF)
+
+    def tx_fifo(self):
+        return len(self.tx)
+
+    def rx_fifo(self):
+        return len(self.rx)
+
+    def get(self):
+        return self.rx.popleft()
+
+    # host only, StateMachine consuming a word from TX FIFO
+    def pull(self):
+        if not self.tx:
+            return None
+        return self.tx.popleft()
+
+
+class DMA(object):
+    channels = {}
+
+    def __init__(self):
+        self.channel = 0
+        while self.channel in DMA.channels:
+            self.channel += 1
+        if self.channel >= 12:
+            raise OSError("no free DMA channels")
+        DMA.channels[self.channel] = self
+
+        self._read = None
+        self._pos = 0
+        self._count = 0
+        self._reload = 0
+        self._busy = False
+        self._handler = None
+        self.write = None
+        self.ctrl = {}
+
+    @classmethod
+    def reset(cls):
+        cls.channels = {}
+
+    # writing the count sets the reload value, used when triggered
+    @property
+    def count(self):
+        return self._count
+
+    @count.setter
+    def count(self, count):
+        self._reload = count
+
+    @property
+    def read(self):
+        return self._read
+
+    @read.setter
+    def read(self, read):
+        self._read = read
+        self._pos = 0
+
+    def pack_ctrl(self, **kwargs):
+        ctrl = {"size": 2, "inc_read": True, "inc_write": True, "treq_sel": 0x3F,
+                "chain_to": self.channel, "irq_quiet": True}
+        ctrl.update(kwargs)
+        return ctrl
+
+    def config(self, read=None, write=None, count=None, ctrl=None, trigger=False):
+        if read is not None:
+            self.read = read
+        if write is not None:
+            self.write = write
+        if count is not None:
+            self.count = count
+        if ctrl is not None:
+            self.ctrl = ctrl
+        if trigger:
+            self.active(1)
+
+    def irq(self, handler=None, hard=False):
+        self._handler = handler
+
+    def active(self, value=None):
+        if value is None:
+            return self._busy
+        if value:
+            self._count = self._reload
+            self._busy = True
+        else:
+            self._busy = False
+
+    def close(self):
+        self._busy = False
+        DMA.channels.pop(self.channel, None)
+
+    # host only, transfer one word if DREQ allows, returns True if moved
+    def step(self):
+        if not self._busy or self.write.tx_fifo() >= self.write.depth:
+            return False
+
+        self.write.tx.append(self._read[self._pos])
+        self._pos += 1
+        self._count -= 1
+
+        if self._count == 0:
+            self._busy = False
+            chain = self.ctrl.get("chain_to", self.channel)
+            if chain != self.channel:
+                DMA.channels[chain].active(1)
+            if not self.ctrl.get("irq_quiet", True) and self._handler:
+                self._handler(self)
+        return True
+
+    @classmethod
+    def run(cls):
+        # move words until all FIFOs are full, or channels idle
+        while any([ch.step() for ch in list(cls.channels.values())]):
+            pass
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+# Round trip LTC through 'ltcaudio' encoder and decoder, at each frame rate
+# and a couple of sample rates, and report speed as multiple of real time.
+
+from argparse import ArgumentParser
+import numpy as np
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ltcaudio
+from libs.timecode import timecode
+
+def check(fps, df, sample_rate, minutes, noise):
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+    tc.from_ascii("23:50:00:00", False)     # crosses midnight
+    tc.user_from_bcd_hex("20260101")
+
+    num, den = ltcaudio.rational(fps)
+    frames = (minutes * 60 * num) // den
+
+    start = time.perf_counter()
+    pcm = ltcaudio.encode(tc, frames, sample_rate)
+    t_enc = time.perf_counter() - start
+
+    if noise:
+        rng = np.random.default_rng(1)
+        pcm = (pcm + rng.normal(0, noise * 32767, len(pcm))).astype(np.int16)
+
+    start = time.perf_counter()
+    samples, raws, ubs, found = ltcaudio.decode_arrays(pcm, sample_rate)
+    t_dec = time.perf_counter() - start
+
+    # expected sequence of labels, and packet positions
+    ref = timecode()
+    ref.set_fps_df(fps, df)
+    ok = found == fps and len(raws) == frames
+    if ok:
+        for f in range(frames):
+            ref.from_frames(tc.fc + f)
+            expect = -((-f * den * sample_rate) // num)
+            if raws[f] != ref.to_raw() or ubs[f] != tc.ub or samples[f] != expect:
+                print("mismatch at frame", f, ltcaudio.to_ascii(int(raws[f])),
+                      ref.to_ascii(), samples[f], expect)
+                ok = False
+                break
+    else:
+        print("decoded %d of %d frames, fps %s" % (len(raws), frames, found))
+
+    length = len(pcm) / sample_rate
+    print("%5.2f%s @ %d : %d min, encode %6.0fx, decode %6.0fx real time%s" % \
+            (fps, "-DF" if df else "   ", sample_rate, minutes,
+             length / t_enc, length / t_dec, "" if ok else " FAIL"))
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="bench_ltcaudio")
+
+    parser.add_argument("-m", "--minutes",
+        type=int, default=20, dest="minutes",
+        help="length of LTC to encode/decode")
+
+    parser.add_argument("-n", "--noise",
+        type=float, default=0.05, dest="noise",
+        help="gaussian noise added before decode, relative to full scale")
+
+    options = parser.parse_args()
+
+    ok = True
+    for fps, df in [(30.0, False), (29.97, True), (29.97, False), (25.0, False),
+                    (24.98, False), (24.0, False), (23.98, False)]:
+        for sample_rate in [48000, 44100]:
+            ok &= check(fps, df, sample_rate, options.minutes, options.noise)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
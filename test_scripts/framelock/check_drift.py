@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+#
+# Check 'ltc_drift' against LTC rendered with a known clock error (by
+# encoding at a slightly different sample rate), with dropouts and a jump
+# in timecode, decoded in chunks as from a pipe.
+
+from argparse import ArgumentParser
+import numpy as np
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ltcaudio
+from libs.timecode import timecode
+
+def render(fps, df, sample_rate, error, minutes, start):
+    # LTC as recorded by a clock 'error' ppm fast
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+    tc.from_ascii(start.replace(":", ""), False)
+
+    num, den = ltcaudio.rational(fps)
+    frames = (minutes * 60 * num) // den
+
+    # encode at integer rate near the target, then stretch the half bit
+    # boundaries by the remainder
+    rate = sample_rate * (1 + (error * 1e-6))
+    pcm = ltcaudio.encode(tc, frames, int(rate))
+    x = np.arange(int(len(pcm) * rate / int(rate))) * (int(rate) / rate)
+    return pcm[np.minimum(x.astype(np.int64), len(pcm) - 1)], frames
+
+def check(fps, df, sample_rate, error, minutes, order, chunk):
+    pcm, frames = render(fps, df, sample_rate, error, minutes, "23:55:00:00")
+
+    # 2 dropouts of ~1s, and a jump in timecode near the end
+    pcm = pcm.copy()
+    pcm[sample_rate * 60:sample_rate * 61] = 0
+    pcm[sample_rate * 120:sample_rate * 121] = 0
+    tail, more = render(fps, df, sample_rate, error, 1, "10:00:00:00")
+    pcm = np.concatenate((pcm, tail))
+
+    stream = ltcaudio.ltc_stream(sample_rate, fps)
+    drift = ltcaudio.ltc_drift(sample_rate, fps, order)
+    for i in range(0, len(pcm), chunk):
+        s, r, u = stream.feed(pcm[i:i + chunk])
+        drift.add(s, r)
+
+    result = drift.report()
+    print("%5.2f%s %+6.1f ppm, %d min:" % (fps, "-DF" if df else "   ", error, minutes))
+    print(ltcaudio.drift_summary(result, sample_rate))
+
+    ok = result["ppm"] is not None and abs(result["ppm"] - error) < 0.05 and \
+         result["dropouts"] == 2 and result["jumps"] == 1 and result["rms"] < 0.5
+    if order > 1:
+        ok &= abs(result["ppm_per_hour"]) < 0.5
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_drift")
+
+    parser.add_argument("-m", "--minutes",
+        type=int, default=10, dest="minutes",
+        help="length of LTC")
+
+    parser.add_argument("-q", "--quadratic",
+        action="store_true", dest="quadratic",
+        help="also fit change of drift")
+
+    options = parser.parse_args()
+
+    ok = True
+    for fps, df, error in [(29.97, True, 20.0), (25.0, False, -3.5), (24.0, False, 0.0)]:
+        ok &= check(fps, df, 48000, error, options.minutes,
+                    2 if options.quadratic else 1, 24000)
+
+    if not ok:
+        print("FAIL")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+#
+# Check 'framelock.py' end to end, on WAV files of generated LTC with the
+# stand-in 'ffmpeg'/'ffprobe' from 'standin/' (which log each call):
+#   - '--jobs' gives the same manifest, and the same copies, as serial
+#   - cached results are used, and files probed/decoded again once changed,
+#     with '--refresh' or different decode options
+#   - a cache which can not be written is reported, and leaves no temp file
+#   - CSV/JSON manifests hold the LTC found, and the OpenTimelineIO manifest
+#     (with the module, and as plain JSON without it) places each file
+#
+# Each file starts with a different amount of silence, so is corrected
+# against the first (the reference).
+
+from argparse import ArgumentParser
+import subprocess
+import tempfile
+import wave
+import json
+import csv
+import re
+import sys
+import os
+
+import numpy as np
+
+# optional, otherwise the .otio manifest is only checked as JSON
+try:
+    import opentimelineio as otio
+except ImportError:
+    otio = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+import ltcaudio
+from libs.timecode import timecode
+
+FRAMELOCK = os.path.join(HERE, "framelock.py")
+STANDIN = os.path.join(HERE, "standin")
+
+# runs 'framelock.py' as if 'opentimelineio' is not installed
+PLAIN = "import sys, runpy; sys.modules['opentimelineio'] = None; " \
+        "sys.path.insert(0, %r); sys.argv = sys.argv[1:]; " \
+        "runpy.run_path(sys.argv[0], run_name='__main__')" % HERE
+
+def make_file(filepath, start, silence, seconds, fps=25, sample_rate=48000,
+              channels=2, channel=2):
+    """Writes WAV of 'seconds' of LTC from 'start', after 'silence' samples,
+    on one channel (1 = first) - the others are silent."""
+    tc = timecode()
+    tc.set_fps_df(fps)
+    tc.from_ascii(start, False)
+
+    pcm = ltcaudio.encode(tc, int(seconds * fps), sample_rate)
+    pcm = np.concatenate((np.zeros(silence, dtype=np.int16), pcm))
+    out = np.zeros((len(pcm), channels), dtype="<i2")
+    out[:, channel - 1] = pcm
+
+    with wave.open(filepath, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(out.tobytes())
+
+def make_files(folder, count, seconds):
+    """Writes 'count' WAV files, and one which is not audio. Returns names."""
+    names = []
+    for i in range(count):
+        names.append("f%02d.wav" % i)
+        make_file(os.path.join(folder, names[-1]), "%02d000000" % (i + 1),
+                  1000 + 777 * i, seconds)
+
+    names.append("bad.wav")
+    with open(os.path.join(folder, names[-1]), "w") as f:
+        f.write("not audio\n")
+    return names
+
+def run(folder, args, plain=False):
+    """Runs 'framelock.py' in folder with the stand-ins, returns its output
+    and the calls made to them - output folder replaced by 'OUT'. With
+    'plain' the 'opentimelineio' module can not be imported."""
+    log = os.path.join(folder, "calls.txt")
+    if os.path.exists(log):
+        os.unlink(log)
+
+    env = dict(os.environ)
+    env["PATH"] = STANDIN + os.pathsep + env["PATH"]
+    env["FRAMELOCK_LOG"] = log
+    command = [sys.executable] + (["-c", PLAIN] if plain else []) + [FRAMELOCK]
+    result = subprocess.run(command + args, cwd=folder, env=env,
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if result.returncode:
+        print(result.stdout + result.stderr)
+        raise RuntimeError("framelock.py exited with %d" % result.returncode)
+
+    calls = []
+    if os.path.exists(log):
+        with open(log) as f:
+            calls = [re.sub(r"framelock_[-_0-9]+", "OUT", line.rstrip()) for line in f]
+    return result.stdout, calls
+
+def writes(calls):
+    """Returns the ffmpeg calls which write a copy, in order of files."""
+    return sorted([c for c in calls if c.startswith("ffmpeg ") and not c.endswith(" -")],
+                  key=lambda c: c.split(" ")[-1])
+
+def probes(calls):
+    """Returns the files probed, in order."""
+    return [c.split(" ")[-1] for c in calls if c.startswith("ffprobe ")]
+
+def reads(calls, option):
+    """Returns the files read by ffmpeg calls with 'option' - 'wav' to
+    detect the channel, '-af' to decode - sorted."""
+    return sorted([c.split(" ")[c.split(" ").index("-i") + 1] for c in calls \
+            if c.startswith("ffmpeg ") and c.endswith(" -") and option in c.split(" ")])
+
+def load(filepath):
+    with open(filepath) as f:
+        return json.load(f)
+
+def check_jobs(folder, names, jobs):
+    ok = True
+    out, serial = run(folder, ["--no-cache", "--remux", "-m", "serial.json"] + names)
+    out, parallel = run(folder, ["--no-cache", "--remux", "-m", "jobs.json",
+                            "-j", str(jobs)] + names)
+
+    rows = load(os.path.join(folder, "serial.json"))
+    if load(os.path.join(folder, "jobs.json")) != rows:
+        print("--jobs %d manifest differs from serial" % jobs)
+        ok = False
+    if [row["status"] for row in rows] != ["ok"] * (len(names) - 1) + ["no audio"]:
+        print("status of files: %s" % [row["status"] for row in rows])
+        ok = False
+    if len(set([row["correction"] for row in rows[:-1]])) != len(names) - 1:
+        print("files not corrected against reference: %s" % \
+                [row["correction"] for row in rows])
+        ok = False
+
+    if writes(parallel) != writes(serial) or len(writes(serial)) != len(names) - 1:
+        print("--jobs %d copies differ from serial:" % jobs)
+        for a, b in zip(writes(serial), writes(parallel)):
+            if a != b:
+                print("  %s\n  %s" % (a, b))
+        ok = False
+    return ok
+
+def timeline_items(timeline):
+    """Returns (track, [(kind, name, start, duration, rate)]) for each track
+    of OpenTimelineIO timeline."""
+    tracks = []
+    for track in timeline.tracks:
+        items = []
+        for item in track:
+            r = item.source_range
+            items.append((type(item).__name__, item.name, r.start_time.value,
+                          r.duration.value, r.start_time.rate))
+        tracks.append((track.name, items))
+    return tracks
+
+def check_manifest(folder, names):
+    ok = True
+    for ext in ["csv", "json", "otio"]:
+        run(folder, ["--no-cache", "-d", "-m", "sync." + ext] + names)
+    run(folder, ["--no-cache", "-d", "-m", "plain.otio"] + names, plain=True)
+
+    rows = load(os.path.join(folder, "sync.json"))
+    with open(os.path.join(folder, "sync.csv"), newline="") as f:
+        text = list(csv.DictReader(f))
+    if text != [{k: "" if v is None else str(v) for k, v in row.items()} for row in rows]:
+        print("CSV manifest differs from JSON")
+        ok = False
+
+    # LTC starts at each file's label, after its silence
+    placed = []
+    for i, row in enumerate(rows[:-1]):
+        silence = 1000 + 777 * i
+        start = (i + 1) * 3600 * 25 - silence // 1920
+        expect = {"file": names[i], "status": "ok", "reference": names[0], "channel": 2,
+                  "samplerate": 48000, "fps": "25/1", "ltc": "%02d:00:00:00" % (i + 1),
+                  "ltc_sample": silence, "start_frame": start, "offset": silence % 1920}
+        for k in expect:
+            if row[k] != expect[k]:
+                print("manifest %s %s: %s, expected %s" % (names[i], k, row[k], expect[k]))
+                ok = False
+        if row["drift_ppm"] is None or abs(row["drift_ppm"]) > 1:
+            print("manifest %s drift: %s ppm" % (names[i], row["drift_ppm"]))
+            ok = False
+        placed.append((names[i], start * 1920 + row["correction"], row["duration"]))
+
+    # one track per file with LTC, after a gap from the earliest
+    first = min([start for name, start, duration in placed])
+    expect = []
+    for name, start, duration in placed:
+        items = [("Gap", "", 0, start - first, 48000)] if start > first else []
+        items.append(("Clip", name, start, duration * 48000, 48000))
+        expect.append((name, items))
+
+    plain = load(os.path.join(folder, "plain.otio"))
+    if plain.get("OTIO_SCHEMA") != "Timeline.1" or \
+            [t["name"] for t in plain["tracks"]["children"]] != [p[0] for p in placed]:
+        print("plain OpenTimelineIO manifest: %s" % plain.get("OTIO_SCHEMA"))
+        ok = False
+
+    if not otio:
+        print("'opentimelineio' not installed, .otio manifests only checked as JSON")
+        return ok
+
+    for name in ["sync.otio", "plain.otio"]:
+        try:
+            timeline = otio.adapters.read_from_file(os.path.join(folder, name))
+        except Exception as error:
+            print("%s does not load: %s" % (name, error))
+            ok = False
+            continue
+
+        tracks = timeline_items(timeline)
+        for got, want in zip(tracks, expect):
+            if got != want:
+                print("%s track: %s, expected %s" % (name, got, want))
+                ok = False
+        if len(tracks) != len(expect):
+            print("%s has %d tracks, expected %d" % (name, len(tracks), len(expect)))
+            ok = False
+
+        clip = timeline.tracks[0][-1]
+        if dict(clip.metadata["framelock"]) != rows[0]:
+            print("%s clip metadata: %s" % (name, dict(clip.metadata["framelock"])))
+            ok = False
+        if timeline.global_start_time.value != first:
+            print("%s starts at %s, expected %d" % (name, timeline.global_start_time, first))
+            ok = False
+    return ok
+
+def check_cache(folder, names):
+    ok = True
+    cache = os.path.join(folder, "cache.json")
+    audio = sorted(names[:-1])
+
+    def step(name, args, probed, detected, decoded):
+        out, calls = run(folder, ["--cache", cache, "-m", name + ".json"] + args + names)
+        result = True
+        if sorted(probes(calls)) != sorted(probed):
+            print("%s: probed %s, expected %s" % (name, probes(calls), probed))
+            result = False
+        if reads(calls, "wav") != sorted(detected):
+            print("%s: detected %s, expected %s" % (name, reads(calls, "wav"), detected))
+            result = False
+        if reads(calls, "-af") != sorted(decoded):
+            print("%s: decoded %s, expected %s" % (name, reads(calls, "-af"), decoded))
+            result = False
+        return result, load(os.path.join(folder, name + ".json"))
+
+    result, first = step("first", [], names, audio, audio)
+    ok &= result
+
+    # nothing changed, so nothing run
+    result, rows = step("hit", [], [], [], [])
+    if rows != first:
+        print("hit: manifest differs from uncached")
+        ok = False
+    ok &= result
+
+    # changed contents (size and mtime), or only touched
+    make_file(os.path.join(folder, names[1]), "12000000", 3000, 3)
+    st = os.stat(os.path.join(folder, names[2]))
+    os.utime(os.path.join(folder, names[2]), ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    changed = sorted(names[1:3])
+    result, rows = step("changed", [], changed, changed, changed)
+    if rows[1]["ltc"] != "12:00:00:00" or rows[2] != first[2] or rows[3:] != first[3:]:
+        print("changed: manifest rows %s" % rows[1:3])
+        ok = False
+    ok &= result
+
+    # different decode options are decoded again, but not probed/detected
+    result, rows = step("options", ["-l", "5"], [], [], audio)
+    ok &= result
+
+    result, rows = step("refresh", ["-r"], names, audio, audio)
+    ok &= result
+
+    # a folder can not be replaced by the cache file
+    os.mkdir(os.path.join(folder, "locked.json"))
+    before = set(os.listdir(folder))
+    out, calls = run(folder, ["--cache", os.path.join(folder, "locked.json"),
+                              "-m", "locked_m.json"] + names)
+    if "Unable to write cache" not in out:
+        print("cache which can not be written is not reported")
+        ok = False
+    left = set(os.listdir(folder)) - before - set(["calls.txt", "locked_m.json"])
+    if left:
+        print("cache write left files: %s" % sorted(left))
+        ok = False
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_framelock")
+
+    parser.add_argument("-n", "--count",
+        type=int, default=6, dest="count",
+        help="number of files")
+
+    parser.add_argument("-t", "--time",
+        type=float, default=4, dest="seconds",
+        help="seconds of LTC in each file")
+
+    parser.add_argument("-j", "--jobs",
+        type=int, default=4, dest="jobs",
+        help="files processed at once, against serial")
+
+    options = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as folder:
+        names = make_files(folder, options.count, options.seconds)
+        for name, check in [("jobs", lambda: check_jobs(folder, names, options.jobs)),
+                            ("manifest", lambda: check_manifest(folder, names)),
+                            ("cache", lambda: check_cache(folder, names))]:
+            result = check()
+            print("%-10s: %s" % (name, "ok" if result else "FAIL"))
+            ok &= result
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+#
+# Check 'estimate_phase()' recovers fractional delays between two renders of
+# the same LTC. Each is encoded at 16x the sample rate, delayed by a whole
+# number of those samples, given the 25us rise time of SMPTE 12M, then low
+# pass filtered (boxcar) and decimated - so the delay is a known fraction of
+# a sample at the final rate.
+
+from argparse import ArgumentParser
+import numpy as np
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ltcaudio
+from libs.timecode import timecode
+
+OVER = 16
+
+def render(fps, sample_rate, delay, seconds, noise, seed):
+    tc = timecode()
+    tc.set_fps_df(fps)
+    tc.from_ascii("01000000", False)
+
+    num, den = ltcaudio.rational(fps)
+    pcm = ltcaudio.encode(tc, (seconds * num) // den, sample_rate * OVER)
+    pcm = np.concatenate((np.zeros(delay + OVER * 1000, dtype=np.int16), pcm))
+
+    rise = int(25e-6 * sample_rate * OVER)
+    pcm = np.convolve(pcm.astype(np.float64), np.ones(rise) / rise, mode="same")
+
+    n = len(pcm) // OVER
+    pcm = pcm[:n * OVER].reshape(n, OVER).mean(axis=1)
+    rng = np.random.default_rng(seed)
+    return pcm + rng.normal(0, noise * 32767, n)
+
+def check(fps, sample_rate, seconds, noise):
+    ok = True
+    ref = None
+    for delay in [0, 1, 5, 8, 13, 16 + 3, 37]:
+        pcm = render(fps, sample_rate, delay, seconds, noise, delay)
+        samples, raws, ubs, found = ltcaudio.decode_arrays(pcm, sample_rate, fps)
+        result = ltcaudio.estimate_phase(pcm, sample_rate, fps, int(samples[0]))
+        if result is None:
+            print("no estimate, delay", delay)
+            return False
+
+        position, rms = result
+        if ref is None:
+            ref = position
+        error = (position - ref) - (delay / OVER)
+        print("%5.2f @ %d, delay %6.4f : measured %7.4f, error %+.4f (rms %.3f)" % \
+                (fps, sample_rate, delay / OVER, position - ref, error, rms))
+        ok &= abs(error) < 0.02
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_phase")
+
+    parser.add_argument("-s", "--seconds",
+        type=int, default=5, dest="seconds",
+        help="length of LTC used for estimate")
+
+    parser.add_argument("-n", "--noise",
+        type=float, default=0.02, dest="noise",
+        help="gaussian noise, relative to full scale")
+
+    options = parser.parse_args()
+
+    ok = True
+    for fps in [29.97, 25.0]:
+        for sample_rate in [48000, 44100]:
+            ok &= check(fps, sample_rate, options.seconds, options.noise)
+
+    if not ok:
+        print("FAIL")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
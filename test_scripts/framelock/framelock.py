@@ -4,99 +4,515 @@ from dftt_timecode import DfttTimecode
 from fractions import Fraction
 
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+import numpy as np
 import subprocess
+import tempfile
+import json
+import csv
 import sys
 import os
 
+import ltcaudio
+
+# optional, otherwise .otio manifest is written as plain JSON
+try:
+    import opentimelineio as otio
+except ImportError:
+    otio = None
+
 REF_FPS = None
 REF_SR = None
 REF_OFFSET = None
+REF_PHASE = None
+REF_FILE = None
+
+# resolution of fractional corrections, 1/n of a sample
+PHASE_STEPS = 32
 
-def get_framerate(filepath):
-    """Reads the framerate of a video file using ffprobe."""
+# probe/decode results, per file
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "framelock.json")
+CACHE_VERSION = 2
+
+# columns of CSV sync manifest, in order
+MANIFEST_FIELDS = ["file", "status", "reference", "channel", "samplerate", "fps",
+                   "duration", "ltc", "ltc_sample", "start_tc", "start_frame", "offset", "phase",
+                   "correction", "drift_ppm", "drift_ppm_per_hour", "drift_rms"]
+
+def get_streams(filepath):
+    """Reads the samplerate of the 1st audio stream, the framerate of the
+    1st video stream and the duration (in seconds), with one call to
+    ffprobe."""
     command = [
         "ffprobe",
         "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=r_frame_rate",
-        "-of", "default=noprint_wrappers=1:nokey=1",
+        "-show_entries", "stream=codec_type,sample_rate,r_frame_rate:format=duration",
+        "-of", "json",
         str(filepath)
     ]
+    SR = None
+    FPS = None
+    LENGTH = None
     try:
         kwargs = {"capture_output": True, "text": True, "check": True, "stdin": subprocess.DEVNULL}
         if sys.platform == "win32":
             kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
         result = subprocess.run(command, **kwargs)
-        fps_str = result.stdout.strip()
-        if fps_str:
-            return fps_str
-    except (subprocess.CalledProcessError, ValueError, ZeroDivisionError):
+
+        info = json.loads(result.stdout)
+        if "duration" in info.get("format", {}):
+            LENGTH = float(info["format"]["duration"])
+        for stream in info.get("streams", []):
+            if stream.get("codec_type") == "audio" and not SR:
+                SR = int(stream["sample_rate"])
+            elif stream.get("codec_type") == "video" and not FPS:
+                FPS = stream.get("r_frame_rate")
+    except (subprocess.CalledProcessError, OSError, KeyError, ValueError):
         pass
-    return None
+    return SR, FPS, LENGTH
 
-def get_samplerate(filepath):
-    """Reads the samplerate of a video/audio file using ffprobe."""
+def detect_channel(filepath, seconds=5):
+    """Reads the first n seconds of every audio channel, in one call to
+    ffmpeg, and scores each for LTC. Returns (channel, scores) where channel
+    is the only one found to carry LTC, or 0 if none/several do."""
     command = [
-        "ffprobe",
+        "ffmpeg",
         "-v", "error",
-        "-select_streams", "a:0",
-        "-show_entries", "stream=sample_rate",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        str(filepath)
+        "-i", str(filepath),
+        "-vn",
+        "-t", str(seconds),
+        "-f", "wav", "-c:a", "pcm_s16le",
+        "-"
     ]
     try:
-        kwargs = {"capture_output": True, "text": True, "check": True, "stdin": subprocess.DEVNULL}
+        kwargs = {"capture_output": True, "stdin": subprocess.DEVNULL}
         if sys.platform == "win32":
             kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
-        result = subprocess.run(command, **kwargs)
-        fps_str = result.stdout.strip()
-        if fps_str:
-            return int(fps_str)
-    except (subprocess.CalledProcessError, ValueError, ZeroDivisionError):
-        pass
-    return None
+        data = subprocess.run(command, **kwargs).stdout
+
+        # chunks of WAV header, piped output has no valid lengths for data
+        if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+            return 0, []
+        at = 12
+        channels = None
+        while at + 8 <= len(data):
+            name = data[at:at + 4]
+            size = int.from_bytes(data[at + 4:at + 8], "little")
+            if name == b"fmt ":
+                channels = int.from_bytes(data[at + 10:at + 12], "little")
+                samplerate = int.from_bytes(data[at + 12:at + 16], "little")
+            elif name == b"data":
+                at += 8
+                break
+            at += 8 + size + (size & 1)
+        if not channels:
+            return 0, []
+
+        count = (len(data) - at) // (2 * channels)
+        pcm = np.frombuffer(data, dtype="<i2", count=count * channels, offset=at)
+        scores = ltcaudio.channel_scores(pcm.reshape(-1, channels), samplerate)
+    except (OSError, ValueError):
+        return 0, []
+
+    found = [c for c, score in enumerate(scores) if score >= 0.5]
+    return (found[0] + 1 if len(found) == 1 else 0), scores
+
+def get_ltc(filepath, channel=1, samplerate=48000, fps=None, window=30, lock=10,
+            drift=0, phase=0):
+    """Streams one audio channel from ffmpeg, and decodes LTC until 'lock'
+    consecutive frames are found. Returns (sample, raw, fps, report, fine) of
+    the first of these, or None.
+
+    With 'drift' (1 linear, 2 quadratic) the whole file is decoded, and
+    report is the clock drift analysis - otherwise None.
+
+    With 'phase' the following n seconds are used to estimate the position
+    of the first frame to sub-sample precision, fine is (position, rms) -
+    otherwise None."""
+    command = [
+        "ffmpeg",
+        "-v", "error",
+        "-i", str(filepath),
+        "-vn"
+    ]
+    if not drift:
+        command += [
+            "-t", str(window)
+        ]
+    command += [
+        "-af", "pan=mono|c0=c%d" % (channel - 1),
+        "-f", "s16le", "-c:a", "pcm_s16le",
+        "-"
+    ]
 
-def get_ltcdump(filepath, channel=1, fps=None):
-    """Reads the first LTC frame of audio file using ltcdump."""
+    # only validate at a rate which LTC can carry
     if fps:
-        command = [
-            "ltcdump",
-            "-f", str(fps),
-            "-c", str(channel),
-            str(filepath)
-        ]
-    else:
-        command = [
-            "ltcdump",
-            "-c", str(channel),
-            str(filepath)
-        ]
+        rate = ltcaudio.framerate_index(fps)
+        fps = ltcaudio.framerates[rate][ltcaudio.FR_FPS] if rate is not None else None
+
+    stream = ltcaudio.ltc_stream(samplerate, fps)
+    samples = np.zeros(0, dtype=np.int64)
+    raws = np.zeros(0, dtype=np.uint32)
+    found = None
+    analysis = None
+    fine = None
+    keep = [] if phase else None       # PCM, for phase estimate
+    read = 0
+    process = None
     try:
-        kwargs = {
-                "text": True,
-                "stdout": subprocess.PIPE,
-                }
+        kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.PIPE}
         if sys.platform == "win32":
             kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
         process = subprocess.Popen(command, **kwargs)
 
         while True:
-            ltc_str = process.stdout.readline().strip()
-            if not ltc_str:
+            # 1/2s at a time
+            data = process.stdout.read(samplerate & ~1)
+            if len(data) < 2:
+                break
+
+            pcm = np.frombuffer(data, dtype="<i2", count=len(data) // 2)
+            read += len(pcm)
+            if keep is not None:
+                keep.append(pcm)
+
+            s, r, u = stream.feed(pcm)
+            if analysis:
+                analysis.add(s, r)
+
+            elif not found:
+                samples = np.concatenate((samples, s))
+                raws = np.concatenate((raws, r))
+
+                if stream.fps:
+                    num, den = ltcaudio.rational(stream.fps)
+                    first = ltcaudio.find_lock(samples, ltcaudio.frame_counts(raws, stream.fps),
+                                               samplerate * den / num, lock)
+                    if first >= 0:
+                        found = (int(samples[first]), int(raws[first]), stream.fps)
+                        if drift:
+                            # keep going, to the end of the file
+                            analysis = ltcaudio.ltc_drift(samplerate, stream.fps, drift)
+                            analysis.add(samples, raws)
+
+            if found and keep is not None and read >= found[0] + (phase * samplerate):
+                fine = ltcaudio.estimate_phase(np.concatenate(keep), samplerate,
+                                               found[2], found[0])
+                keep = None
+
+            if found and keep is None and not analysis:
                 break
-            elif ltc_str[0] == "#":
-                continue
-            process.kill()
 
-            return ltc_str
-    except (subprocess.CalledProcessError, ValueError, ZeroDivisionError):
+    except (OSError, ValueError):
         pass
+    finally:
+        if process:
+            process.kill()
+            process.stdout.close()
+            process.wait()
+
+    if found and keep:
+        # file ended early
+        fine = ltcaudio.estimate_phase(np.concatenate(keep), samplerate,
+                                       found[2], found[0])
+    if found:
+        return found + (analysis.report() if analysis else None, fine)
     return None
 
+def fractional_filter(correction, samplerate):
+    """Returns ffmpeg audio filter which moves by a fractional number of
+    samples - resampling up by PHASE_STEPS, moving by whole samples at
+    that rate and back down."""
+    steps = int(round(correction * PHASE_STEPS))
+    high = samplerate * PHASE_STEPS
+
+    if steps > 0:
+        return "aresample=%d,adelay=delays=%dS:all=1,aresample=%d" % \
+                (high, steps, samplerate) + ",asetpts=PTS-STARTPTS[a]"
+    return "aresample=%d,atrim=start_sample=%d,aresample=%d,apad=pad_len=%d" % \
+            (high, -steps, samplerate, -(steps // PHASE_STEPS)) + ",asetpts=PTS-STARTPTS[a]"
+
+def probe(target):
+    """Returns (samplerate, framerate, duration) of file, framerate is None
+    for audio."""
+    SR, FPS, LENGTH = get_streams(target)
+    if SR:
+        return SR, FPS, LENGTH
+    return None, None, None
+
+def detect(target, options):
+    """Detects LTC channel of file, as detect_channel()."""
+    return detect_channel(target, options.detect)
+
+def pick_channel(options, FPS, detected):
+    """Returns channel to decode, the detected one or the user's choice."""
+    if detected and detected[0]:
+        return detected[0]
+    return options.vch if FPS else options.ach
+
+def decode(key, samplerate, options):
+    """Decodes LTC for key of (file, channel, framerate), as get_ltc()."""
+    target, channel, fps = key
+    return get_ltc(target, channel, samplerate, Fraction(fps) if fps else None,
+                   options.window, options.lock, options.drift, options.phase)
+
+def prefetch(options, probes, detects, ltcs):
+    """Probes, detects and decodes all files in worker processes, adding to
+    dicts of probe(), detect() and decode() results - the latter keyed by
+    the framerate the reference is expected to have, a wrong guess is
+    decoded again when the files are processed in order."""
+    with ProcessPoolExecutor(max_workers=options.jobs) as pool:
+        targets = [target for target in options.files if target not in probes]
+        probes.update(zip(targets, pool.map(probe, targets)))
+
+        if options.detect:
+            targets = [target for target in options.files \
+                    if probes[target][0] and target not in detects]
+            detects.update(zip(targets, pool.map(detect, targets, [options] * len(targets))))
+
+        ref_fps = None
+        ref = options.noref
+        futures = {}
+        for target in options.files:
+            SR, FPS, LENGTH = probes[target]
+            if not SR:
+                continue
+
+            channel = pick_channel(options, FPS, detects.get(target))
+            key = (target, channel, ref_fps if ref_fps else FPS)
+            if key not in futures and key not in ltcs:
+                futures[key] = pool.submit(decode, key, SR, options)
+
+            # assume 1st file with audio becomes reference
+            if not ref:
+                ref = True
+                ref_fps = FPS
+
+        ltcs.update([(key, f.result()) for key, f in futures.items()])
+
+def file_id(target):
+    """Returns (path, size, mtime) identifying the contents of file, or
+    None if it can not be read."""
+    try:
+        st = os.stat(target)
+    except OSError:
+        return None
+    return os.path.abspath(target), st.st_size, st.st_mtime_ns
+
+def decode_options(options):
+    """Returns the options which change result of decode()."""
+    return [options.window, options.lock, options.drift, options.phase]
+
+def load_cache(options):
+    """Returns dicts of probe(), detect() and decode() results from cache
+    file, for files which have not changed since."""
+    probes = {}
+    detects = {}
+    ltcs = {}
+    if not options.cache or options.refresh:
+        return probes, detects, ltcs
+
+    try:
+        with open(options.cache) as f:
+            cache = json.load(f)
+        if cache.get("version") != CACHE_VERSION:
+            return probes, detects, ltcs
+
+        for target in options.files:
+            if not file_id(target):
+                continue
+            path, size, mtime = file_id(target)
+            entry = cache["files"].get(path)
+            if not entry or entry["size"] != size or entry["mtime"] != mtime:
+                continue
+
+            if "probe" in entry:
+                probes[target] = tuple(entry["probe"])
+
+            if "detect" in entry and entry["detect"][0] == options.detect:
+                detects[target] = tuple(entry["detect"][1:])
+
+            for key, result in entry["ltc"]:
+                channel, fps, used = key
+                if used != decode_options(options):
+                    continue
+                if result:
+                    result = tuple(result[:4]) + (tuple(result[4]) if result[4] else None,)
+                ltcs[(target, channel, fps)] = result
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return probes, detects, ltcs
+
+def save_cache(options, probes, detects, ltcs):
+    """Stores probe(), detect() and decode() results in cache file, keeping
+    those of other files. Written to a temporary file which then replaces
+    it, so a failed write (or another run) does not leave it truncated."""
+    if not options.cache:
+        return
+
+    cache = {"version": CACHE_VERSION, "files": {}}
+    try:
+        with open(options.cache) as f:
+            old = json.load(f)
+        if old.get("version") == CACHE_VERSION:
+            cache = old
+    except (OSError, ValueError):
+        pass
+
+    try:
+        for target in options.files:
+            if target not in probes or not file_id(target):
+                continue
+            path, size, mtime = file_id(target)
+            entry = cache["files"].get(path)
+            if not entry or entry["size"] != size or entry["mtime"] != mtime or options.refresh:
+                entry = {"size": size, "mtime": mtime, "ltc": []}
+                cache["files"][path] = entry
+
+            entry["probe"] = probes[target]
+            if target in detects:
+                entry["detect"] = [options.detect] + list(detects[target])
+            for (t, channel, fps), result in ltcs.items():
+                if t != target:
+                    continue
+                key = [channel, fps, decode_options(options)]
+                entry["ltc"] = [x for x in entry["ltc"] if x[0] != key]
+                entry["ltc"].append([key, result])
+                if result:
+                    entry["channel"] = channel      # where LTC was found
+
+        folder = os.path.dirname(os.path.abspath(options.cache))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(options.cache) + ".",
+                                   suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp, options.cache)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except (OSError, ValueError, TypeError) as error:
+        print("Unable to write cache '%s': %s" % (options.cache, error))
+
+def otio_time(value, rate):
+    """Returns OpenTimelineIO RationalTime."""
+    return {"OTIO_SCHEMA": "RationalTime.1", "rate": rate, "value": value}
+
+def otio_range(start, duration, rate):
+    """Returns OpenTimelineIO TimeRange."""
+    return {"OTIO_SCHEMA": "TimeRange.1", "start_time": otio_time(start, rate),
+            "duration": otio_time(duration, rate)}
+
+def otio_placed(rows):
+    """Returns (row, rate, start, seconds) for each file in which LTC was
+    found, and the earliest start in seconds. Video is timed in frames,
+    audio files in samples including the correction."""
+    placed = []
+    for row in rows:
+        if row["status"] != "ok":
+            continue
+        fps = float(Fraction(row["fps"]))
+        if row["duration"] is None:
+            continue
+        if row["kind"] == "Video":
+            rate = fps
+            start = row["start_frame"]
+        else:
+            rate = float(row["samplerate"])
+            start = round(row["start_frame"] * rate / fps) + row["correction"]
+        placed.append((row, rate, start, start / rate))
+
+    first = min([seconds for row, rate, start, seconds in placed], default=0)
+    return placed, first
+
+def otio_timeline(rows, name):
+    """Returns OpenTimelineIO timeline (for JSON) with a track per file in
+    which LTC was found, each placed at its start timecode after a gap.
+    Audio in video files is not moved, see clip metadata."""
+    placed, first = otio_placed(rows)
+
+    tracks = []
+    for row, rate, start, seconds in placed:
+        children = []
+        if seconds > first:
+            children.append({"OTIO_SCHEMA": "Gap.1", "name": "",
+                             "source_range": otio_range(0, round((seconds - first) * rate), rate),
+                             "effects": [], "markers": [], "metadata": {}})
+        children.append({"OTIO_SCHEMA": "Clip.1", "name": os.path.basename(row["file"]),
+                         "source_range": otio_range(start, row["duration"] * rate, rate),
+                         "media_reference": {"OTIO_SCHEMA": "ExternalReference.1",
+                             "name": "", "available_range": None, "metadata": {},
+                             "target_url": "file://" + os.path.abspath(row["file"])},
+                         "effects": [], "markers": [],
+                         "metadata": {"framelock": {k: row[k] for k in MANIFEST_FIELDS}}})
+        tracks.append({"OTIO_SCHEMA": "Track.1", "name": os.path.basename(row["file"]),
+                       "kind": row["kind"], "source_range": None, "children": children,
+                       "effects": [], "markers": [], "metadata": {}})
+
+    rate = placed[0][1] if placed else 1
+    return {"OTIO_SCHEMA": "Timeline.1", "name": name, "metadata": {},
+            "global_start_time": otio_time(first * rate, rate),
+            "tracks": {"OTIO_SCHEMA": "Stack.1", "name": "tracks", "children": tracks,
+                       "source_range": None, "effects": [], "markers": [], "metadata": {}}}
+
+def otio_schema_timeline(rows, name):
+    """As otio_timeline(), built with the 'opentimelineio' module."""
+    placed, first = otio_placed(rows)
+
+    timeline = otio.schema.Timeline(name=name)
+    for row, rate, start, seconds in placed:
+        track = otio.schema.Track(name=os.path.basename(row["file"]), kind=row["kind"])
+        if seconds > first:
+            track.append(otio.schema.Gap(source_range=otio.opentime.TimeRange(
+                otio.opentime.RationalTime(0, rate),
+                otio.opentime.RationalTime(round((seconds - first) * rate), rate))))
+        track.append(otio.schema.Clip(name=os.path.basename(row["file"]),
+            media_reference=otio.schema.ExternalReference(
+                target_url="file://" + os.path.abspath(row["file"])),
+            source_range=otio.opentime.TimeRange(
+                otio.opentime.RationalTime(start, rate),
+                otio.opentime.RationalTime(row["duration"] * rate, rate)),
+            metadata={"framelock": {k: row[k] for k in MANIFEST_FIELDS}}))
+        timeline.tracks.append(track)
+
+    rate = placed[0][1] if placed else 1
+    timeline.global_start_time = otio.opentime.RationalTime(first * rate, rate)
+    return timeline
+
+def write_manifest(filepath, rows):
+    """Writes results for all files as CSV, JSON or OpenTimelineIO - chosen
+    by extension of filepath."""
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == ".otio" and otio:
+        otio.adapters.write_to_file(otio_schema_timeline(rows,
+                os.path.splitext(os.path.basename(filepath))[0]), filepath)
+        return
+
+    with open(filepath, "w", newline="") as f:
+        if ext == ".csv":
+            writer = csv.DictWriter(f, MANIFEST_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        elif ext == ".otio":
+            json.dump(otio_timeline(rows, os.path.splitext(os.path.basename(filepath))[0]),
+                      f, indent=4)
+        else:
+            json.dump([{k: row[k] for k in MANIFEST_FIELDS} for row in rows], f, indent=4)
+
+def write(command):
+    """Runs ffmpeg command, returns its error output."""
+    kwargs = {"stdin": subprocess.DEVNULL, "stderr": subprocess.PIPE, "text": True}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    try:
+        return subprocess.run(command, **kwargs).stderr
+    except OSError as error:
+        return str(error)
 
 def main():
-    global REF_FPS, REF_SR, REF_OFFSET
+    global REF_FPS, REF_SR, REF_OFFSET, REF_PHASE, REF_FILE
 
     parser = ArgumentParser(prog="framelock")
 
@@ -111,6 +527,34 @@ def main():
         type=int, default=1, dest="vch",
         help="LTC audio channel, for video files")
 
+    parser.add_argument("--detect",
+        type=float, default=5, dest="detect",
+        help="detect LTC channel from first n seconds, 0 to use -a/-v only")
+
+    parser.add_argument("-w", "--window",
+        type=float, default=30, dest="window",
+        help="search for LTC in first n seconds of each file")
+
+    parser.add_argument("-l", "--lock",
+        type=int, default=10, dest="lock",
+        help="number of consecutive LTC frames required")
+
+    parser.add_argument("-d", "--drift",
+        action="store_const", const=1, default=0, dest="drift",
+        help="decode whole file, and report clock drift against LTC")
+
+    parser.add_argument("-q", "--quadratic",
+        action="store_const", const=2, dest="drift",
+        help="as --drift, also fitting change of drift over time")
+
+    parser.add_argument("-p", "--phase",
+        type=float, default=0, dest="phase",
+        help="estimate sub-sample offset, over n seconds of LTC")
+
+    parser.add_argument("-f", "--fractional",
+        action="store_true", dest="fractional",
+        help="apply sub-sample correction (resampling audio), implies --phase 5")
+
     parser.add_argument("-c", "--correction",
         type=int, default=0, dest="correction",
         help="force correction for audio channel(s), ie move by +/- n samples")
@@ -119,16 +563,45 @@ def main():
         action="store_true", dest="noref",
         help="prevent correction of audio channel(s)")
 
+    parser.add_argument("-m", "--manifest",
+        dest="manifest",
+        help="write sync manifest (.csv, .json or .otio) instead of copies of files")
+
+    parser.add_argument("--remux",
+        action="store_true", dest="remux",
+        help="with --manifest, also write corrected copies of files")
+
+    parser.add_argument("--cache",
+        default=CACHE_FILE, dest="cache",
+        help="file to cache probe/LTC results in, default " + CACHE_FILE)
+
+    parser.add_argument("--no-cache",
+        action="store_const", const=None, dest="cache",
+        help="do not use cache")
+
+    parser.add_argument("-r", "--refresh",
+        action="store_true", dest="refresh",
+        help="ignore cached results, probe and decode files again")
+
+    parser.add_argument("-j", "--jobs",
+        type=int, default=1, dest="jobs",
+        help="process n files at once")
+
     options = parser.parse_args()
+    if options.fractional and not options.phase:
+        options.phase = 5
+
+    # corrected copies, unless only the manifest is wanted
+    copies = options.remux or not options.manifest
 
     if not len(options.files):
         parser.error("FILE(s) not specified")
-    else:
-        now = datetime.now()
-        now_str = now.strftime("%m-%d-%Y_%H-%M-%S-%f")
 
-        out_path="framelock_" + now_str
+    now = datetime.now()
+    now_str = now.strftime("%m-%d-%Y_%H-%M-%S-%f")
 
+    out_path="framelock_" + now_str
+    if copies:
         # Using try/except as OSError may be raised due invalid path name etc
         try:
             # exist_ok=True suppresses the exception if folder already exists
@@ -138,59 +611,76 @@ def main():
             print("Error! Unable to create directory: ./" + out_path + "/")
             exit()
 
+    # results from cache, then with --jobs the slow steps are run up front
+    # in parallel - the loop below only collects them
+    probes, detects, ltcs = load_cache(options)
+    if probes:
+        print("Cached results for %d of %d file(s)" % (len(probes), len(options.files)))
+
+    writes = []
+    rows = []
+    if options.jobs > 1:
+        prefetch(options, probes, detects, ltcs)
+
     # itterate though list of files
     # 1st file is used as reference for others
     for target in options.files:
         print("\nProcessing:", target)
 
-        SR = get_samplerate(target)
+        if target not in probes:
+            probes[target] = probe(target)
+        SR, FPS, LENGTH = probes[target]
         LTC = None
 
+        row = dict.fromkeys(MANIFEST_FIELDS)
+        row.update({"file": target, "kind": "Video" if FPS else "Audio",
+                    "samplerate": SR, "duration": LENGTH, "reference": REF_FILE})
+        rows.append(row)
+
         if not SR:
             print("File does not appear to have audio track, skipping.")
+            row["status"] = "no audio"
             continue
         else:
             print("Audio samplerate", SR)
             if REF_SR and REF_SR != SR:
                 print("Samplerate does not match reference, skipping")
+                row["status"] = "samplerate mismatch"
                 continue
 
-            FPS = get_framerate(target)
             if FPS:
                 print("Video FPS:", FPS)
                 if REF_FPS and REF_FPS != FPS:
                     print("Framerate does not match reference, skipping")
+                    row["status"] = "framerate mismatch"
                     continue
 
-            # extract/re-encode the audio track(s) as a '.wav'
-            command = [
-                "ffmpeg",
-                "-v", "error", "-y",
-                "-i", str(target),
-                "-vn", "-c:a", "pcm_s16le",
-                "framelock.wav"
-            ]
-            try:
-                kwargs = {"stdin": subprocess.DEVNULL}
-                if sys.platform == "win32":
-                    kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
-                result = subprocess.run(command, **kwargs)
-
-                # do we need to itterate chanels?
-                if REF_FPS:
-                    LTC = get_ltcdump("framelock.wav", options.ach, REF_FPS)
-                elif FPS:
-                    LTC = get_ltcdump("framelock.wav", options.ach, FPS)
+            # find which channel carries LTC, unless told
+            if options.detect and target not in detects:
+                detects[target] = detect(target, options)
+            detected = detects.get(target)
+            channel = pick_channel(options, FPS, detected)
+            if detected:
+                print("LTC channel scores:", " ".join("%d:%.2f" % (c + 1, score) \
+                        for c, score in enumerate(detected[1])))
+                if not detected[0] and max(detected[1], default=0) >= 0.5:
+                    print("LTC channel ambiguous, using channel", channel)
+                elif not detected[0]:
+                    print("LTC not detected, using channel", channel)
                 else:
-                    LTC = get_ltcdump("framelock.wav", options.ach)
+                    print("LTC detected on channel", channel)
 
-            except (subprocess.CalledProcessError, ValueError, ZeroDivisionError):
-                pass
+            # stream audio from file, and decode until LTC locks
+            key = (target, channel, REF_FPS if REF_FPS else FPS)
+            if key not in ltcs:
+                ltcs[key] = decode(key, SR, options)
+            LTC = ltcs[key]
+            row["channel"] = channel
+            row["status"] = "no LTC"
 
             if LTC:
-                parts = LTC.split()
-                tc_str = list(parts[1])
-                sample = int(parts[3])
+                sample, raw, ltc_fps, report, fine = LTC
+                tc_str = list(ltcaudio.to_ascii(raw))
 
                 df = False
                 if tc_str[8] == '.':
@@ -200,8 +690,11 @@ def main():
                 tc = None
                 if REF_FPS:
                     parts = REF_FPS.split('/')
-                else:
+                elif FPS:
                     parts = FPS.split('/')
+                else:
+                    # audio only, use rate of LTC
+                    parts = [str(x) for x in ltcaudio.rational(ltc_fps)]
 
                 if len(parts) > 1:
                     tc = DfttTimecode("".join(tc_str), \
@@ -214,22 +707,45 @@ def main():
 
                 if tc:
                     print("Found LTC Packet:", tc, "@", sample)
+                    if report:
+                        print(ltcaudio.drift_summary(report, SR))
+                    if fine:
+                        print("Sub-sample position: %.3f (jitter %.3f RMS)" % fine)
                     samples_per_frame = SR / tc.fps
 
                     frames = sample / samples_per_frame
                     OFFSET = int(sample - (int(frames) * samples_per_frame))
+                    PHASE = None
+                    if fine:
+                        PHASE = fine[0] - (int(frames) * samples_per_frame)
 
                     correction = 0
                     if options.correction:
                         correction = options.correction
                     elif REF_OFFSET:
                         correction = REF_OFFSET - OFFSET
+
+                    if not options.correction and PHASE is not None and REF_PHASE is not None:
+                        print("Fractional offset: %+.3f samples" % (REF_PHASE - PHASE))
+                        if options.fractional:
+                            correction = round((REF_PHASE - PHASE) * PHASE_STEPS) / PHASE_STEPS
+                            if correction == int(correction):
+                                correction = int(correction)
                     if correction:
                         print("Correction:", correction)
 
                     tc2 = tc - int(frames)
                     print("Writing Start TC:", tc2)
 
+                    row.update({"status": "ok", "fps": "/".join(parts),
+                                "ltc": str(tc), "ltc_sample": sample,
+                                "start_tc": str(tc2), "start_frame": tc2.framecount,
+                                "offset": OFFSET, "phase": PHASE, "correction": correction})
+                    if report:
+                        row.update({"drift_ppm": report["ppm"],
+                                    "drift_ppm_per_hour": report["ppm_per_hour"],
+                                    "drift_rms": report["rms"]})
+
                     # build command to write a copy of file
                     command = [
                         "ffmpeg",
@@ -247,7 +763,12 @@ def main():
                     ]
 
                     # have to re-encode audio in order to trim/delay
-                    if correction > 0:
+                    if correction != int(correction):
+                        command += [
+                            "-c:v", "copy",
+                            "-af", fractional_filter(correction, SR)
+                        ]
+                    elif correction > 0:
                         command += [
                             "-c:v", "copy",
                             "-af", "adelay=delays=" + \
@@ -283,10 +804,16 @@ def main():
                         os.path.join(out_path, target)
                     ]
                     try:
-                        kwargs = {"stdin": subprocess.DEVNULL}
-                        if sys.platform == "win32":
-                            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
-                        result = subprocess.run(command, **kwargs)
+                        if not copies:
+                            pass
+                        elif options.jobs > 1:
+                            # run once all files are processed
+                            writes.append((target, command))
+                        else:
+                            kwargs = {"stdin": subprocess.DEVNULL}
+                            if sys.platform == "win32":
+                                kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+                            result = subprocess.run(command, **kwargs)
 
                         # store reference for processing other files
                         if not options.noref and not REF_SR:
@@ -295,10 +822,31 @@ def main():
                                 REF_FPS = FPS
                             REF_SR = SR
                             REF_OFFSET = OFFSET
+                            REF_PHASE = PHASE
+                            REF_FILE = target
+                            row["reference"] = target
 
                     except (subprocess.CalledProcessError, ValueError, ZeroDivisionError):
                         pass
 
+    save_cache(options, probes, detects, ltcs)
+
+    if options.manifest:
+        try:
+            write_manifest(options.manifest, rows)
+            print("\nWrote manifest for %d file(s): %s" % (len(rows), options.manifest))
+        except OSError as error:
+            print("\nError! Unable to write manifest '%s': %s" % (options.manifest, error))
+
+    if writes:
+        # errors are collected, and reported in order of files
+        print("\nWriting %d file(s), %d at a time" % (len(writes), options.jobs))
+        with ThreadPoolExecutor(max_workers=options.jobs) as pool:
+            errors = pool.map(write, [command for target, command in writes])
+            for (target, command), error in zip(writes, errors):
+                if error:
+                    print("\nError writing '%s':\n%s" % (target, error.rstrip()))
+
 if __name__ == "__main__":
     main()
 
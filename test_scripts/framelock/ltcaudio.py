@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+#
+# Audio LTC encoder/decoder for host tools, vectorized with NumPy.
+#
+# Packets are built and checked by the same 'timecode' class as used on the
+# Pico (via 'encode_range()' and 'decode_many()'), only the conversion to and
+# from bi-phase mark audio is done here.
+#
+# Bits are sent LSB first; 64 bits of packet (2 words, as the FIFO without
+# Sync) followed by the 16 bit Sync word.
+
+from argparse import ArgumentParser
+from fractions import Fraction
+from array import array
+import numpy as np
+import wave
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.timecode import timecode, halfwords
+from libs.framerates import framerates, framerate_index, FR_FPS, FR_FRAMES, FR_NUM, FR_DEN
+from libs.dropframe import drop_frames, frames_per_day
+
+SYNC = 0xBFFC
+SYNC_BITS = np.array([(SYNC >> i) & 1 for i in range(16)], dtype=np.uint8)
+
+BLOCK = 1800            # frames rendered per pass, bounds temporary memory
+INVALID = 0xFFFFFFFF    # 'decode_many()' marker for labels which can not be counted
+
+def rational(fps):
+    """Returns exact rate as (num, den), from the framerate registry if known."""
+    rate = framerate_index(fps)
+    if rate is not None:
+        return framerates[rate][FR_NUM], framerates[rate][FR_DEN]
+
+    f = Fraction(fps).limit_denominator(1001)
+    return f.numerator, f.denominator
+
+def encoded_length(frames, sample_rate, fps):
+    """Returns number of samples needed for 'frames' of LTC."""
+    num, den = rational(fps)
+    return -((-frames * den * sample_rate) // num)
+
+def encode(tc, frames, sample_rate=48000, amplitude=0.5, start=None, out=None):
+    """Renders 'frames' of LTC from timecode 'tc' as int16 PCM. Starts from
+    frame count 'start' (None for the current frame), the flags/userbits are
+    those set on 'tc'. Returns array of samples."""
+    num, den = rational(tc.fps)
+    if start is None:
+        start = tc.to_frames()
+
+    length = encoded_length(frames, sample_rate, tc.fps)
+    if out is None:
+        out = np.empty(length, dtype=np.int16)
+
+    peak = int(amplitude * 32767)
+    levels = np.array([-peak, peak], dtype=np.int16)
+
+    words = array("I", [0] * (2 * BLOCK))
+    words_h = halfwords(words)
+    level = 0
+    done = 0
+    pos = 0
+    while done < frames:
+        n = min(BLOCK, frames - done)
+        tc.encode_range(start + done, n, words, False, words_h)
+
+        # bits, in the order sent
+        data = np.frombuffer(words, dtype="<u4", count=2 * n).view(np.uint8)
+        bits = np.empty((n, 80), dtype=np.uint8)
+        bits[:, :64] = np.unpackbits(data.reshape(n, 8), axis=1, bitorder="little")
+        bits[:, 64:] = SYNC_BITS
+
+        # bi-phase mark, transition at start of every bit and mid-bit for '1'
+        t = np.empty(n * 160, dtype=np.uint8)
+        t[0::2] = 1
+        t[1::2] = bits.ravel()
+        t[0] ^= level
+        half = np.bitwise_xor.accumulate(t)
+        level = half[-1]
+
+        # samples in each half bit, from exact (rational) boundaries
+        h = np.arange(done * 160, ((done + n) * 160) + 1, dtype=np.int64)
+        bounds = -((-h * den * sample_rate) // (160 * num))
+        count = np.diff(bounds)
+
+        pcm = np.repeat(levels[half], count)
+        out[pos:pos + len(pcm)] = pcm
+        pos += len(pcm)
+        done += n
+
+    return out[:pos]
+
+def slice_bits(pcm, sample_rate=None, fps=None, fine=False):
+    """Slices PCM into bi-phase mark bits, returns (bits, sample at start of
+    each bit). 'fps' (or sample rate) sets expected bit period, otherwise it
+    is estimated from the signal.
+
+    With 'fine', also returns the start of each bit to sub-sample precision,
+    as the centroid of the slope around the zero crossing."""
+    empty = (np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64))
+    if fine:
+        empty += (np.zeros(0),)
+
+    x = np.asarray(pcm)
+    if len(x) < 2:
+        return empty
+
+    # zero crossings, about the centre of the signal
+    if x.dtype.kind == "f":
+        mid = (float(x.max()) + float(x.min())) / 2
+    else:
+        mid = (int(x.max()) + int(x.min())) // 2
+    s = x > mid
+
+    # start of buffer counts as an edge, so a packet at sample 0 is kept
+    edges = np.flatnonzero(s[1:] != s[:-1]) + 1
+    edges = np.concatenate((np.zeros(1, dtype=edges.dtype), edges))
+    if len(edges) < 3:
+        return empty
+    d = np.diff(edges)
+
+    # half bit period
+    if fps and sample_rate:
+        half = sample_rate / (160 * float(fps))
+    else:
+        med = float(np.median(d))
+        doubles = np.count_nonzero((d > 1.6 * med) & (d < 2.4 * med))
+        halves = np.count_nonzero((d > 0.4 * med) & (d < 0.6 * med))
+        half = med if doubles > halves else med / 2
+
+    # a long interval is a whole '0' bit, so always starts a bit, whereas
+    # within a run of short intervals only every other one starts a bit
+    short = d < 1.5 * half
+    k = np.arange(len(d))
+    last_long = np.maximum.accumulate(np.where(short, -1, k))
+    starts = np.flatnonzero(~short | (((k - last_long) & 1) == 1))
+
+    if not fine:
+        return short[starts].astype(np.uint8), edges[starts]
+
+    # crossing lies between samples e-1 and e, use the 4 steps around it
+    # (each positioned half way between its samples) - unlike interpolating
+    # between 2 samples this does not depend on shape of the edge
+    e = np.clip(edges[starts], 3, len(x) - 2)
+    w = np.abs(np.diff(x[e[:, None] + np.arange(-3, 2)].astype(np.float64), axis=1))
+    pos = (e[:, None] + np.arange(-2, 2)) - 0.5
+    total = np.sum(w, axis=1)
+    centre = np.sum(w * pos, axis=1) / np.where(total > 0, total, 1.0)
+    return short[starts].astype(np.uint8), edges[starts], centre
+
+def sync_bits(bits):
+    """Returns index of 1st bit of each packet, located by its Sync word."""
+    n = len(bits) - 15
+    if n <= 64:
+        return np.zeros(0, dtype=np.int64)
+
+    v = bits[:n].astype(np.uint16)
+    for j in range(1, 16):
+        v |= bits[j:n + j].astype(np.uint16) << j
+
+    first = np.flatnonzero(v == SYNC)
+    return first[first >= 64] - 64
+
+def find_frames(bits, positions):
+    """Locates Sync words in bit stream, returns (data bits of each packet as
+    2 words, sample at start of each packet)."""
+    first = sync_bits(bits)
+    if not len(first):
+        return np.zeros((0, 2), dtype="<u4"), np.zeros(0, dtype=np.int64)
+
+    data = bits[first[:, None] + np.arange(64)]
+    words = np.packbits(data, axis=1, bitorder="little").view("<u4")
+    return words, positions[first]
+
+def decode_arrays(pcm, sample_rate, fps=None, offset=0):
+    """Decodes LTC in PCM buffer, returns arrays of (sample at start of packet,
+    raw label as 'timecode.to_raw()', userbits), and the fps used to validate
+    labels (estimated from packet spacing if not given)."""
+    bits, positions = slice_bits(pcm, sample_rate, fps)
+    words, samples = find_frames(bits, positions)
+    if not len(samples):
+        return samples, np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32), fps
+
+    if not fps:
+        fps = estimate_fps(samples, sample_rate)
+
+    tc = timecode()
+    tc.set_fps_df(fps)
+
+    packets = array("I")
+    packets.frombytes(np.ascontiguousarray(words, dtype="<u4").tobytes())
+    raws = array("I", [0] * len(samples))
+    ubs = array("I", [0] * len(samples))
+    tc.decode_many(packets, raws, ubs)
+
+    raws = np.frombuffer(raws, dtype=np.uint32)
+    ubs = np.frombuffer(ubs, dtype=np.uint32)
+    valid = raws != INVALID
+    return samples[valid] + offset, raws[valid], ubs[valid], fps
+
+def decode(pcm, sample_rate, fps=None, offset=0):
+    """Decodes LTC in PCM buffer, returns list of (sample, raw, userbits)."""
+    samples, raws, ubs, fps = decode_arrays(pcm, sample_rate, fps, offset)
+    return list(zip(samples.tolist(), raws.tolist(), ubs.tolist()))
+
+def estimate_fps(samples, sample_rate):
+    """Returns known fps closest to spacing of consecutive packets."""
+    d = np.diff(samples)
+    if not len(d):
+        return framerates[0][FR_FPS]
+
+    spacing = float(np.median(d))
+    d = d[np.abs(d - spacing) < 0.5 * spacing]
+    fps = sample_rate / float(np.mean(d))
+
+    best = min(framerates, key=lambda r: abs((r[FR_NUM] / r[FR_DEN]) - fps))
+    return best[FR_FPS]
+
+def channel_scores(pcm, sample_rate):
+    """Scores each channel (column) of PCM for LTC; the fraction of expected
+    packets which were found, by their Sync words, spaced as a frame at
+    any rate from 23.98 to 30fps. Noise or programme audio scores near 0."""
+    pcm = np.asarray(pcm)
+    if pcm.ndim == 1:
+        pcm = pcm[:, None]
+
+    scores = []
+    for c in range(pcm.shape[1]):
+        bits, positions = slice_bits(pcm[:, c], sample_rate)
+        starts = positions[sync_bits(bits)]
+        spacing = np.diff(starts)
+        good = (spacing > sample_rate / 30.5) & (spacing < sample_rate / 23.5)
+        if not np.any(good):
+            scores.append(0.0)
+            continue
+
+        expected = len(pcm) / float(np.median(spacing[good]))
+        scores.append(min(1.0, np.count_nonzero(good) / max(expected - 1, 1)))
+    return scores
+
+def estimate_phase(pcm, sample_rate, fps, anchor):
+    """Returns (position, rms) of the packet which starts at sample 'anchor',
+    to sub-sample precision - or None. Fitted by least squares to the start of
+    every bit of the following packets, so also follows any clock drift.
+    Position is in the same (integer) convention as 'decode_arrays()'."""
+    bits, positions, fine = slice_bits(pcm, sample_rate, fps, True)
+    first = sync_bits(bits)
+
+    num, den = rational(fps)
+    spf = sample_rate * den / num
+    bit = spf / 80
+
+    # every bit of packets from anchor, which has an edge after it
+    first = first[(positions[first] >= anchor - (spf / 4)) & (first + 80 < len(positions))]
+    if len(first) < 2:
+        return None
+    n = np.rint((positions[first] - anchor) / spf).astype(np.int64)
+    x = ((n[:, None] * 80) + np.arange(80)).ravel()
+    y = fine[first[:, None] + np.arange(80)].ravel() - anchor
+
+    # fit, then again without outliers (ie. a corrupt packet)
+    good = np.ones(len(x), dtype=bool)
+    for i in range(2):
+        slope, start = np.polyfit(x[good], y[good], 1)
+        residual = y - (start + (slope * x))
+        good = np.abs(residual) < bit / 4
+        if np.count_nonzero(good) < 80:
+            return None
+
+    rms = float(np.sqrt(np.mean(residual[good] ** 2)))
+
+    # integer convention has edge at 1st sample past the crossing
+    return anchor + start + 0.5, rms
+
+def frame_counts(raws, fps):
+    """Converts array of raw labels to frames since midnight, as
+    'label_to_frames()' - dropped labels skip forwards."""
+    rate = framerate_index(fps)
+    nominal = framerates[rate][FR_FRAMES] if rate is not None else int(float(fps) + 0.1)
+
+    raws = np.asarray(raws, dtype=np.int64)
+    hh = (raws >> 24) & 0x1F
+    mm = (raws >> 16) & 0x3F
+    ss = (raws >> 8) & 0x3F
+    ff = raws & 0x3F
+    drop = np.where(raws & 0x80, drop_frames(nominal), 0)
+
+    ff = np.where((ss == 0) & (ff < drop) & (mm % 10 != 0), drop, ff)
+    tm = (hh * 60) + mm
+    return (((tm * 60) + ss) * nominal) + ff - (drop * (tm - (tm // 10)))
+
+def find_lock(samples, counts, frame_length, lock):
+    """Returns index of first run of 'lock' packets which count up by one
+    frame, spaced by 'frame_length' samples (+/-10%), or -1."""
+    if len(samples) < lock:
+        return -1
+    if lock < 2:
+        return 0
+
+    good = (np.diff(counts) == 1) & \
+           (np.abs(np.diff(samples) - frame_length) < 0.1 * frame_length)
+
+    # length of run of good steps, ending at each step
+    k = np.arange(len(good))
+    run = k - np.maximum.accumulate(np.where(good, -1, k))
+    end = np.flatnonzero(run >= lock - 1)
+    if not len(end):
+        return -1
+    return int(end[0]) - (lock - 2)
+
+class ltc_stream(object):
+    """Decodes LTC from consecutive PCM buffers, ie. as read from a pipe.
+    Each packet is reported once, with sample counted from the first
+    buffer."""
+
+    def __init__(self, sample_rate, fps=None):
+        self.sample_rate = sample_rate
+        self.fps = fps              # estimated from 1st packets, if None
+
+        # keep 2 frames of samples between buffers, so that a packet which
+        # is split is found in the next one
+        self.keep = (2 * sample_rate) // 23
+        self.tail = np.zeros(0, dtype=np.int16)
+        self.base = 0               # sample number of tail[0]
+        self.last = None            # sample of last reported packet
+
+    def feed(self, pcm):
+        """Decodes next buffer, returns arrays of (sample, raw, userbits) for
+        packets which were completed."""
+        buf = np.concatenate((self.tail, np.asarray(pcm, dtype=self.tail.dtype)))
+        samples, raws, ubs, fps = decode_arrays(buf, self.sample_rate, self.fps, self.base)
+        if not self.fps and len(samples) >= 8:
+            self.fps = fps          # enough packets to trust estimate
+
+        if self.last is not None:
+            # already reported, allowing for edges moving by a sample or so
+            new = samples > self.last + (self.keep // 4)
+            samples, raws, ubs = samples[new], raws[new], ubs[new]
+        if len(samples):
+            self.last = int(samples[-1])
+
+        keep = min(len(buf), self.keep)
+        self.base += len(buf) - keep
+        self.tail = buf[len(buf) - keep:]
+        return samples, raws, ubs
+
+class ltc_drift(object):
+    """Fits sample position against frame count, over the whole of a stream
+    in one pass with flat memory. Only sums are kept, of the deviation from
+    the nominal position - which is small, so does not lose precision.
+
+    A jump in timecode (or in samples) starts a new segment, the longest is
+    reported."""
+
+    def __init__(self, sample_rate, fps, order=1):
+        num, den = rational(fps)
+        self.sample_rate = sample_rate
+        self.fps = fps
+        self.spf = sample_rate * den / num      # samples per frame
+        self.order = order                      # 1 linear, 2 quadratic
+        self.total = None                       # frames per day, for wrap
+
+        self.segments = []
+        self.last = None                        # (count, sample) of last packet
+        self.pos = 0                            # its frame, from segment anchor
+        self.frames = 0
+        self.dropouts = 0
+        self.missing = 0
+        self.jumps = 0
+        self.glitches = 0
+        self.peak = 0.0                         # worst frame interval error
+
+        # last packet is held back, until its next neighbour is seen
+        self.pending = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def _segment(self, count, sample):
+        # anchor, and sums of t^k and e * t^k, ee, with t in hours
+        seg = {"count": count, "sample": sample, "n": 0,
+               "t": np.zeros(2 * self.order + 1), "et": np.zeros(self.order + 1), "ee": 0.0}
+        self.segments.append(seg)
+        return seg
+
+    def add(self, samples, raws):
+        """Adds packets, arrays as returned by 'ltc_stream.feed()'."""
+        if not len(samples):
+            return
+        if self.total is None:
+            rate = framerate_index(self.fps)
+            nominal = framerates[rate][FR_FRAMES] if rate is not None else int(float(self.fps) + 0.1)
+            self.total = frames_per_day(nominal, drop_frames(nominal) if raws[0] & 0x80 else 0)
+
+        counts = np.concatenate((self.pending[0], frame_counts(raws, self.fps)))
+        samples = np.concatenate((self.pending[1], np.asarray(samples, dtype=np.int64)))
+
+        # a single corrupt packet (ie. at the edge of a dropout) is out of
+        # phase with both neighbours, which agree with each other
+        c, s = counts, samples
+        if self.last is not None:
+            c = np.concatenate(([self.last[0]], counts))
+            s = np.concatenate(([self.last[1]], samples))
+        dc = np.diff(c)
+        dc[dc < -(self.total // 2)] += self.total
+        phase = s - (np.concatenate(([0], np.cumsum(dc))) * self.spf)
+
+        glitch = np.zeros(len(c), dtype=bool)
+        glitch[1:-1] = (np.abs(phase[1:-1] - phase[:-2]) > self.spf / 2) & \
+                       (np.abs(phase[2:] - phase[:-2]) < self.spf / 2)
+        if self.last is not None:
+            glitch = glitch[1:]
+        self.glitches += int(np.count_nonzero(glitch))
+
+        good = ~glitch
+        good[-1] = False
+        self.pending = (counts[-1:], samples[-1:])
+        self._fit(counts[good], samples[good])
+
+    def flush(self):
+        """Adds the held back packet, at end of stream."""
+        self._fit(self.pending[0], self.pending[1])
+        self.pending = (self.pending[0][:0], self.pending[1][:0])
+
+    def _fit(self, counts, samples):
+        if not len(samples):
+            return
+        if self.last is None:
+            self._segment(int(counts[0]), int(samples[0]))
+            self.last = (int(counts[0]) - 1, int(samples[0]) - self.spf)
+            self.pos = -1
+
+        # steps from previous packet, unwrapping midnight
+        dc = np.diff(counts, prepend=self.last[0])
+        dc[dc < -(self.total // 2)] += self.total
+        ds = np.diff(samples, prepend=self.last[1])
+        err = ds - (dc * self.spf)
+
+        jump = (dc <= 0) | (np.abs(err) > self.spf / 2)
+        gap = ~jump & (dc > 1)
+        self.dropouts += int(np.count_nonzero(gap))
+        self.missing += int(np.sum(dc[gap] - 1))
+        ok = ~jump & ~gap
+        if np.any(ok):
+            self.peak = max(self.peak, float(np.max(np.abs(err[ok]))))
+
+        # frame count relative to segment anchor, split at jumps
+        x = np.cumsum(dc)
+        cut = np.flatnonzero(jump)
+        bounds = np.concatenate(([0], cut, [len(x)]))
+        for i in range(len(bounds) - 1):
+            a, b = bounds[i], bounds[i + 1]
+            if a == b:
+                continue
+            if jump[a]:
+                self.jumps += 1
+                seg = self._segment(int(counts[a]), int(samples[a]))
+                rel = x[a:b] - x[a]
+            else:
+                seg = self.segments[-1]
+                rel = x[a:b] + self.pos
+            self.pos = int(rel[-1])
+
+            e = samples[a:b] - seg["sample"] - (rel * self.spf)
+            t = rel * self.spf / (self.sample_rate * 3600)
+            tk = np.ones(len(t))
+            for k in range(2 * self.order + 1):
+                seg["t"][k] += np.sum(tk)
+                if k <= self.order:
+                    seg["et"][k] += np.sum(e * tk)
+                tk = tk * t
+            seg["ee"] += float(np.sum(e * e))
+            seg["n"] += b - a
+
+        self.frames += len(samples)
+        self.last = (int(counts[-1]), int(samples[-1]))
+
+    def report(self):
+        """Returns dict of results, for the longest segment."""
+        self.flush()
+        result = {"frames": self.frames, "segments": len(self.segments),
+                  "dropouts": self.dropouts, "missing": self.missing,
+                  "jumps": self.jumps, "glitches": self.glitches, "peak": self.peak,
+                  "ppm": None, "ppm_per_hour": None, "rms": None}
+        if not self.segments:
+            return result
+
+        seg = max(self.segments, key=lambda x: x["n"])
+        m = self.order + 1
+        if seg["n"] <= m:
+            return result
+
+        # normal equations, deviation e = b0 + b1.t + b2.t^2
+        a = np.array([[seg["t"][i + j] for j in range(m)] for i in range(m)])
+        try:
+            beta = np.linalg.solve(a, seg["et"])
+        except np.linalg.LinAlgError:
+            return result
+
+        residual = seg["ee"] - float(np.dot(beta, seg["et"]))
+        scale = 1e6 / (self.sample_rate * 3600)
+        result["ppm"] = beta[1] * scale
+        if self.order > 1:
+            result["ppm_per_hour"] = 2 * beta[2] * scale
+        result["rms"] = float(np.sqrt(max(residual, 0.0) / seg["n"]))
+        return result
+
+def drift_summary(result, sample_rate):
+    """Formats 'ltc_drift.report()' as text."""
+    if result["ppm"] is None:
+        return "Drift: not enough LTC frames (%d)" % result["frames"]
+
+    text = "Drift: %+.3f ppm" % result["ppm"]
+    if result["ppm_per_hour"] is not None:
+        text += " (%+.3f ppm/hour)" % result["ppm_per_hour"]
+    text += ", jitter %.2f samples RMS (%.1fus), worst frame %.1f samples" % \
+            (result["rms"], 1e6 * result["rms"] / sample_rate, result["peak"])
+    text += "\n       %d frames, %d dropout(s) / %d frames missing, %d discontinuities, %d bad packets" % \
+            (result["frames"], result["dropouts"], result["missing"], result["jumps"], result["glitches"])
+    return text
+
+def to_ascii(raw):
+    """Formats raw label, with '.' before frames for Drop-Frame."""
+    return "%2.2d:%2.2d:%2.2d%s%2.2d" % ((raw >> 24) & 0x1F, (raw >> 16) & 0x3F,
+            (raw >> 8) & 0x3F, "." if raw & 0x80 else ":", raw & 0x3F)
+
+def read_wav(filepath, channel=1):
+    """Reads one channel (1 = first) of 16bit WAV file, returns (pcm, sample_rate)."""
+    with wave.open(filepath, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError("only 16bit PCM is supported")
+        channels = f.getnchannels()
+        rate = f.getframerate()
+        pcm = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+
+    return pcm.reshape(-1, channels)[:, channel - 1], rate
+
+def write_wav(filepath, pcm, sample_rate):
+    with wave.open(filepath, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(np.asarray(pcm, dtype="<i2").tobytes())
+
+def main():
+    parser = ArgumentParser(prog="ltcaudio")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    gen = sub.add_parser("encode", help="generate WAV file of LTC")
+    gen.add_argument("wav", metavar="FILE")
+    gen.add_argument("-f", "--fps", default="25", dest="fps",
+        help="frame rate, ie. 29.97")
+    gen.add_argument("-t", "--timecode", default="00:00:00:00", dest="start",
+        help="start timecode, use '.' or ';' before frames for Drop-Frame")
+    gen.add_argument("-l", "--length", type=float, default=60, dest="length",
+        help="length in seconds")
+    gen.add_argument("-s", "--samplerate", type=int, default=48000, dest="sr",
+        help="sample rate")
+    gen.add_argument("-u", "--userbits", default=None, dest="ub",
+        help="userbits, as 8 hex digits")
+
+    dump = sub.add_parser("dump", help="list LTC frames in WAV file")
+    dump.add_argument("wav", metavar="FILE")
+    dump.add_argument("-c", "--channel", type=int, default=1, dest="channel",
+        help="audio channel, 1 = first")
+    dump.add_argument("-f", "--fps", default=None, dest="fps",
+        help="frame rate, estimated if not given")
+
+    options = parser.parse_args()
+
+    if options.cmd == "encode":
+        tc = timecode()
+        tc.set_fps_df(float(options.fps))
+        tc.from_ascii(options.start)
+        if options.ub:
+            tc.user_from_bcd_hex(options.ub)
+
+        num, den = rational(tc.fps)
+        frames = int(options.length * num / den)
+        write_wav(options.wav, encode(tc, frames, options.sr), options.sr)
+    else:
+        pcm, sr = read_wav(options.wav, options.channel)
+        fps = float(options.fps) if options.fps else None
+        samples, raws, ubs, fps = decode_arrays(pcm, sr, fps)
+
+        num, den = rational(fps)
+        length = (sr * den) // num
+
+        # same layout as 'ltcdump'
+        print("#User bits  Timecode   |    Pos. (samples)")
+        for s, r, u in zip(samples.tolist(), raws.tolist(), ubs.tolist()):
+            print("%8.8x   %s | %8d %8d" % (u, to_ascii(r), s, s + length - 1))
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@
 # with audio-LTC on one channel. The audio is randomly delayed, and used
 # for testing 'framelock.py' script
 
-BASETC="01:00:00:00"
+BASETC="01:00:00;00"
 RATE="30000/1001"
+FPS="29.97"
 
 # create 60s audio file, with randomly offset LTC (by upto 1s)
 OFFSET=`awk -v min=0 -v max=1 'BEGIN{srand(); print min+rand()*(max-min+1)}'`
-ltcgen -f $RATE"df" -s 48000 -t $BASETC -l 1:00:00 ltc_m.wav 2>&1 >> /dev/null
+python3 ltcaudio.py encode -f $FPS -s 48000 -t $BASETC -l 60 ltc_m.wav
 
 # mix LTC to one side of a stero file
 sox ltc_m.wav -c 2 ltc_s.wav remix 1 0
@@ -19,9 +20,9 @@ sox silent.wav ltc_s.wav sample.wav
 #
 #ffmpeg -y -i silent.wav -i ltc_s.wav -filter_complex "[0:a][1:a]concat=n=2:v=0:a=1[out]" -map "[out]" -c:a pcm_s16le -write_bext 1 -metadata description="sSPEED=029.970-DF" sample.wav
 
-# check the first reported TC, and make 'labels' for audacity
-ltcdump -a sample.wav > sample.txt
-TC=`ltcdump sample.wav | grep -v -e "^#" | head -n 1`
+# check the first reported TC, and list all frames
+python3 ltcaudio.py dump -c 1 sample.wav > sample.txt
+TC=`grep -v -e "^#" sample.txt | head -n 1`
 echo $TC
 
 # render image to 60s 1080p video, with LTC audio track
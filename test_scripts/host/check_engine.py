@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+#
+# Run the engine of 'pico_timecode.py' - 'pico_timecode_thread()' on core 1,
+# its IRQ handlers and timers - on the host stand-ins for MicroPython (see
+# 'shim.py') against the PIO emulator, in virtual time. Set up as
+# 'ascii_display_thread()' does in MONITOR mode (ie. DEMO, decoding its own
+# LTC output) and report:
+#   - throughput, simulated vs wall clock time
+#   - TX labels counting, and RX labels following them
+#   - FIFO headroom ('eng.stats()'), duty cycle and scheduler use - with
+#     core 1 woken by SEV from the IRQs, or '--no-sev' polling on SysTick
+#   - heap growth by the engine's code, traced with 'tracemalloc' (slow)
+#   - UI writes whilst running: userbits follow without a jump in labels,
+#     a label which is set is sent exactly, after those already in the FIFOs
+#   - Buffer Underflow, when core 1 is then held off (ie. by a long GC)
+
+from argparse import ArgumentParser
+from collections import deque
+import tracemalloc
+import time
+import sys
+
+import shim
+clock = shim.install()
+
+import pico_timecode as pt
+import mp_thread as _thread
+import rp2
+import utime
+from machine import Pin
+from libs.timecode import timecode
+from libs.framerates import framerates, framerate_index, FR_SM_FREQ
+
+class monitor(object):
+    # checks labels at each TX/RX IRQ, as registered 'irq_callbacks',
+    # keeping only recent ones so the heap does not grow
+    def __init__(self, eng):
+        self.eng = eng
+        self.tc = timecode()
+        self.tc.set_fps_df(eng.tc.fps, eng.tc.df)
+        self.sent = deque([], 8)
+        self.reset()
+
+    def reset(self):
+        self.tx = 0
+        self.tx_bad = 0
+        self.rx = 0
+        self.rx_bad = 0
+        self.rx_last = None
+        self.jumps = []
+
+    def follows(self, a, b):
+        self.tc.from_raw(a)
+        self.tc.next_frame()
+        return self.tc.to_raw() == b
+
+    def tx_callback(self, sm):
+        raw = pt.tx_raw
+        if self.sent and not self.follows(self.sent[-1], raw):
+            self.tx_bad += 1
+            self.jumps.append(raw)
+        self.sent.append(raw)
+        self.tx += 1
+
+    def rx_callback(self, sm):
+        # latest decoded, should be one recently sent
+        raw = self.eng.rc.to_raw()
+        if raw not in self.sent or (self.rx_last is not None and \
+                not self.follows(self.rx_last, raw)):
+            self.rx_bad += 1
+        self.rx_last = raw
+        self.rx += 1
+
+def start(fps, df, calval=0):
+    # as 'ascii_display_thread()', MONITOR mode so RX runs too
+    eng = pt.engine()
+    pt.eng = eng
+    eng.mode = pt.MONITOR
+    eng.set_stopped(True)
+    eng.tc.set_fps_df(fps, df)
+    eng.tc.from_ascii("00:59:50:00", False)
+    eng.calval = calval
+
+    sm_freq = framerates[eng.tc.rate][FR_SM_FREQ]
+    eng.sm = []
+    eng.sm.append(rp2.StateMachine(pt.SM_START, pt.auto_start, freq=sm_freq,
+                           jmp_pin=Pin(21)))
+    eng.sm.append(rp2.StateMachine(pt.SM_BLINK, pt.shift_led_irq_1x, freq=sm_freq,
+                           jmp_pin=Pin(26),
+                           out_base=Pin(25)))
+    eng.sm.append(rp2.StateMachine(pt.SM_BUFFER, pt.buffer_out, freq=sm_freq,
+                           out_base=Pin(22)))
+    eng.sm.append(rp2.StateMachine(pt.SM_ENCODE, pt.encode_dmc, freq=sm_freq,
+                           jmp_pin=Pin(22),
+                           in_base=Pin(13),
+                           out_base=Pin(13)))
+    eng.sm.append(rp2.StateMachine(pt.SM_TX_RAW, pt.tx_raw_value, freq=sm_freq))
+    eng.sm.append(rp2.StateMachine(pt.SM_SYNC, pt.sync_and_read, freq=sm_freq,
+                           jmp_pin=Pin(19),
+                           in_base=Pin(19),
+                           out_base=Pin(21),
+                           set_base=Pin(21)))
+    eng.sm.append(rp2.StateMachine(pt.SM_DECODE, pt.decode_dmc, freq=sm_freq,
+                           jmp_pin=Pin(13),
+                           in_base=Pin(13),
+                           set_base=Pin(19)))
+
+    eng.config_clocks(eng.tc.fps)
+    pt.irq_attach(eng)
+
+    mon = monitor(eng)
+    pt.irq_callbacks[pt.SM_BLINK] = mon.tx_callback
+    pt.irq_callbacks[pt.SM_SYNC] = mon.rx_callback
+
+    pt.stop = False
+    _thread.start_new_thread(pt.pico_timecode_thread, (eng, lambda: pt.stop))
+    return eng, mon
+
+def engine_heap(snap1, snap2):
+    # growth of memory allocated by the engine's code
+    files = [tracemalloc.Filter(True, "*pico_timecode.py"),
+             tracemalloc.Filter(True, "*libs/*")]
+    stats = snap2.filter_traces(files).compare_to(snap1.filter_traces(files), "lineno")
+    return sum([s.size_diff for s in stats if s.size_diff > 0]), \
+           [s for s in stats if s.size_diff > 0][:3]
+
+def check_writes(eng, mon):
+    # as the UI would, from core 0
+    ok = True
+    mon.reset()
+    eng.tc.user_from_bcd_hex("12345678")
+    utime.sleep(0.5)
+    if mon.tx_bad or mon.rx_bad:
+        print("labels jumped when userbits were written: %d TX, %d RX" % \
+                (mon.tx_bad, mon.rx_bad))
+        ok = False
+    if eng.rc.user_to_raw() != 0x12345678:
+        print("userbits not sent: %08x" % eng.rc.user_to_raw())
+        ok = False
+
+    target = timecode()
+    target.set_fps_df(eng.tc.fps, eng.tc.df)
+    target.from_ascii("10000000", False)
+
+    mon.reset()
+    eng.tc.from_raw(target.to_raw())
+    utime.sleep(0.5)
+    if mon.jumps != [target.to_raw()] or mon.rx_bad > 1:
+        print("label set to %s, sent %s" % (target.to_ascii(),
+                ", ".join(["%08x" % j for j in mon.jumps])))
+        ok = False
+    return ok
+
+def check(fps, df, seconds, calval, stall, heap=False):
+    ok = True
+    clock.collects = 0
+    clock.scheduled = 0
+    start_us = clock.us()
+    wall = time.perf_counter()
+
+    eng, mon = start(fps, df, calval)
+    utime.sleep(1)
+    mon.reset()
+
+    if heap:
+        tracemalloc.start()
+        snap1 = tracemalloc.take_snapshot()
+    utime.sleep(seconds)
+    if heap:
+        snap2 = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    simulated = (clock.us() - start_us) / 1000000
+    elapsed = time.perf_counter() - wall
+    stats = eng.stats()
+    duty, per_frame = eng.duty_cycle()
+
+    # after start up
+    if not mon.tx or not mon.rx:
+        print("no TX/RX labels")
+        ok = False
+    if mon.tx_bad:
+        print("TX labels not counting: %d" % mon.tx_bad)
+        ok = False
+    if mon.rx_bad:
+        print("RX labels do not follow TX: %d" % mon.rx_bad)
+        ok = False
+
+    if eng.mode == pt.HALTED or eng.fifo.underruns:
+        print("unexpected Buffer Underflow")
+        ok = False
+
+    print("%5.2f%s: %.0fs simulated in %.1fs (%.1fx real time), %d TX, %d RX" % \
+            (fps, "-DF" if df else "   ", simulated, elapsed, simulated / elapsed,
+             mon.tx, mon.rx))
+    print("        FIFOs %s, duty %.2f%% (%.0fus/frame), %d scheduled, %d collect()" % \
+            (", ".join(["%s %d..%d" % (k, stats[k]["min"], stats[k]["max"]) for k in \
+                        ["buffer_tx", "blink_tx", "tx_raw_tx", "sync_rx"]]),
+             100 * duty, per_frame, clock.scheduled, clock.collects))
+
+    # CPython's ints are objects, so a few come and go
+    if heap:
+        grown, top = engine_heap(snap1, snap2)
+        print("        engine heap grew %d bytes" % grown)
+        if grown > 1024:
+            for s in top:
+                print("          ", s)
+
+    ok &= check_writes(eng, mon)
+
+    # hold off core 1, FIFOs should run dry
+    if stall:
+        clock.stall(1, stall * 1000)
+        utime.sleep(0.1 + (stall / 1000))
+        if eng.mode != pt.HALTED or eng.fifo.underruns != 1:
+            print("Buffer Underflow not reported, after %dms stall" % stall)
+            ok = False
+
+    # stop engine's thread
+    pt.irq_callbacks[pt.SM_BLINK] = None
+    pt.irq_callbacks[pt.SM_SYNC] = None
+    pt.stop = True
+    while clock.threads() > 1:
+        utime.sleep(0.1)
+
+    if stall:
+        print("        %dms stall: %s, %d underrun" % (stall,
+                "HALTED" if eng.mode == pt.HALTED else "running", eng.fifo.underruns))
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_engine")
+
+    parser.add_argument("-s", "--seconds",
+        type=float, default=10, dest="seconds",
+        help="length of run to simulate, per frame rate")
+
+    parser.add_argument("-c", "--calval",
+        type=float, default=0, dest="calval",
+        help="calibration value, fractions exercise the dithering timers")
+
+    parser.add_argument("-S", "--stall",
+        type=int, default=200, dest="stall",
+        help="ms to hold off core 1 at the end, 0 to skip")
+
+    parser.add_argument("-m", "--heap",
+        action="store_true", dest="heap",
+        help="trace heap growth by the engine, slows the run")
+
+    parser.add_argument("-n", "--no-sev",
+        action="store_true", dest="no_sev",
+        help="IRQs do not SEV, core 1 polls on SysTick (1ms) instead - RX labels "
+             "then lag the RX IRQ, and are reported")
+
+    parser.add_argument("-f", "--fps",
+        dest="fps",
+        help="only this frame rate (ie. '29.97')")
+
+    options = parser.parse_args()
+    if options.no_sev:
+        pt.sev = None
+
+    rates = [(30.0, False), (29.97, True), (25.0, False), (24.0, False), (23.98, False)]
+    if options.fps:
+        rates = [(framerates[framerate_index(options.fps)][0],
+                  framerate_index(options.fps) == 1)]
+
+    ok = True
+    for fps, df in rates:
+        ok &= check(fps, df, options.seconds, options.calval, options.stall, options.heap)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
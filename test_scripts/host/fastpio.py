@@ -0,0 +1,396 @@
+# Faster stand-in for the PIO emulator (see '../pio/pioemu.py'), for runs
+# of the engine over hours or days on the virtual clock (see 'soak.py').
+#
+# Rather than executing instructions, each of pico_timecode's programs is
+# modelled by what it does to its FIFOs, IRQs and the sync pin, at the
+# times the emulator shows (in StateMachine cycles, from the release by
+# SM_START clearing IRQ 4):
+#   - 'buffer_out' takes a word per 1024 cycles, Underflow IRQ when empty
+#   - 'shift_led_irq_1x/4x' take 2 words per frame, IRQ per frame/quarter,
+#     first frame has 4 extra divisions
+#   - 'tx_raw_value' copies its TX FIFO to its RX FIFO
+#   - 'sync_and_read' finds 0xBFFC, IRQ and pin low, then pushes the next
+#     64 bits as 2 words, pin going high before the last bit
+#   - 'auto_start' releases the others, 'start_from_sync' does so once the
+#     sync pin goes low then high; both push their count when pin goes low
+#   - 'tx_fifo_purge' empties its TX FIFO
+#
+# LTC is followed 16 bits at a time, as halves of the words 'buffer_out'
+# sends, looped back to 'sync_and_read' (ie. DEMO) unless an external
+# 'source' calls 'decode()' instead. So a day of LTC takes minutes.
+#
+# Not modelled: waveforms (LED, LTC and decoded pins), 'encode_dmc' and
+# 'decode_dmc' (their LTC is perfect), sync found part way through a half,
+# RX samples lost while 'sync_and_read' stalls on a full FIFO (words are
+# dropped instead) and Blink's 2nd word being pulled part way in to a frame.
+
+from collections import deque
+import heapq
+
+import pioemu
+
+SYS_FREQ = 125_000_000
+
+PIN_SYNC = 21               # 'sync_and_read' set pin, 'SM_START' jmp pin
+SYNC_WORD = 0xBFFC
+
+# timing in StateMachine cycles, as 'pioemu' shows
+HALF = 512                  # 16 bits of LTC
+FRAME = 2560
+DIVISION = 128              # of Blink pattern
+QUARTER = 640
+BLINK_IRQ = 8               # IRQ after start of frame (after extra divisions)
+SYNC_FOUND = 22             # pin low, after end of sync
+SYNC_IRQ = 11               # after pin low
+SYNC_HIGH = 2030            # pin high, after pin low
+SYNC_PUSH = 2050            # words pushed, after pin low
+START_RELEASE = 3           # 'auto_start' clears IRQ 4
+START_COUNT = 1             # count offset, RX phase 1 when looped back
+
+BLINK = ["shift_led_irq_1x", "shift_led_irq_4x"]
+START = ["auto_start", "start_from_sync"]
+
+current = None
+
+class StateMachine(object):
+    # As 'pioemu.StateMachine', behaviour from the program's name
+    def __init__(self, id, prog=None, freq=-1, **kwargs):
+        self.id = id
+        self.emu = current
+        self.emu.sm[id] = self
+        self.running = False
+        self.handler = None
+        self.tx = deque()
+        self.rx = deque()
+        self.prog = None
+        self.name = None
+        self.gen = 0                # events of earlier runs are ignored
+        self.div256 = 0x10000
+        if prog is not None:
+            self.init(prog, freq, **kwargs)
+
+    def init(self, prog, freq=-1, **kwargs):
+        self.prog = prog
+        self.name = None
+        for name, p in pioemu.programs.items():
+            if p is prog:
+                self.name = name
+
+        join = (prog[pioemu._PROG_SHIFTCTRL] >> 30) & 3
+        self.tx_depth = 8 if join == pioemu.PIO.JOIN_TX else (0 if join == pioemu.PIO.JOIN_RX else 4)
+        self.rx_depth = 8 if join == pioemu.PIO.JOIN_RX else (0 if join == pioemu.PIO.JOIN_TX else 4)
+
+        # 'sync_and_read' set pin starts low
+        if self.name == "sync_and_read":
+            self.emu.set_pin(PIN_SYNC, 0, True)
+
+        self.active(0)
+        self.set_freq(freq)
+
+    def set_freq(self, freq):
+        if freq <= 0:
+            self.write_clkdiv(1 << 16)
+        else:
+            div = (self.emu.sys_freq * 256) // freq
+            self.write_clkdiv(div << 8)
+
+    def write_clkdiv(self, value):
+        # as CLKDIV register, 16.8 fixed point in bits 8-31
+        if self.running and self.name in START:
+            self.emu.count(self)
+        self.div256 = max(256, (value >> 8) or 0x10000)
+
+    def read_clkdiv(self):
+        return self.div256 << 8
+
+    def after(self, t, acc, k):
+        # time of k-th tick after one at 't', and fraction carried
+        n = acc + (k * self.div256)
+        return t + (n >> 8), n & 0xFF
+
+    def active(self, value=None):
+        if value is None:
+            return int(self.running)
+        if value and not self.running:
+            self.running = True
+            self.gen += 1
+            self.emu.started(self)
+        elif not value and self.running:
+            self.running = False
+            self.gen += 1
+        return int(self.running)
+
+    def exec(self, instr):
+        pass
+
+    def put(self, value, shift=0):
+        if isinstance(value, int):
+            value = [value]
+        for w in value:
+            if len(self.tx) >= self.tx_depth:
+                raise OverflowError("TX FIFO full, SM %d" % self.id)
+            self.tx.append((w << shift) & 0xFFFFFFFF)
+        if self.running:
+            self.emu.fed(self)
+
+    def get(self, buf=None, shift=0):
+        if not self.rx:
+            raise RuntimeError("RX FIFO empty, SM %d" % self.id)
+        if buf is None:
+            value = self.rx.popleft() >> shift
+        else:
+            for i in range(len(buf)):
+                buf[i] = self.rx.popleft() >> shift
+            value = None
+        if self.running:
+            self.emu.fed(self)
+        return value
+
+    def tx_fifo(self):
+        return len(self.tx)
+
+    def rx_fifo(self):
+        return len(self.rx)
+
+    def irq(self, handler=None, trigger=None, hard=False):
+        self.handler = handler
+
+
+class model(object):
+    # As 'pioemu.emulator', for the virtual clock and 'machine.Pin'
+    def __init__(self, sys_freq=SYS_FREQ):
+        global current
+
+        self.sys_freq = sys_freq
+        self.now = 0
+        self.sm = {}
+        self.queue = []             # (time, seq, func, args)
+        self.seq = 0
+
+        self.level = 0              # GPIO levels, bit per pin
+        self.outputs = 0
+
+        self.busy = False           # within run(), ie. IRQ handler
+        self.halt = False           # set by handler, run() returns after
+        self.source = None          # external LTC, else looped back
+
+        self.start = None           # SM_START, and its count origin
+        self.sync = None
+        self.rx_need = 0            # halves still to read after sync
+        self.rx_halves = []
+        self.rx_found = 0
+        self.rx_dropped = 0         # words lost, RX FIFO full
+        self.underflows = 0
+        current = self
+
+    # -- GPIO
+
+    def set_pin(self, pin, value, output=None):
+        if output is not None:
+            if output:
+                self.outputs |= 1 << pin
+            else:
+                self.outputs &= ~(1 << pin)
+        if ((self.level >> pin) & 1) == value:
+            return
+        self.level ^= 1 << pin
+        if pin == PIN_SYNC:
+            self.sync_edge(value)
+
+    def write_pindirs(self, base, count, value):
+        for i in range(count):
+            pin = (base + i) & 31
+            if (value >> i) & 1:
+                self.outputs |= 1 << pin
+            else:
+                self.outputs &= ~(1 << pin)
+
+    def pin(self, pin):
+        return (self.level >> pin) & 1
+
+    # -- events
+
+    def at(self, t, func, *args):
+        self.seq += 1
+        heapq.heappush(self.queue, (t, self.seq, func, args))
+
+    def run(self, until):
+        # run events up to (not including) system time 'until'
+        self.busy = True
+        queue = self.queue
+        while queue and queue[0][0] < until:
+            t, seq, func, args = heapq.heappop(queue)
+            self.now = t
+            func(*args)
+            if self.halt:
+                self.halt = False
+                until = t + 1
+        self.now = until
+        self.busy = False
+
+    def run_for(self, cycles):
+        self.run(self.now + cycles)
+
+    def interrupt(self, sm, gen):
+        # flags 0-3 interrupt the CPU
+        if sm.gen == gen and sm.handler:
+            sm.handler(sm)
+
+    # -- StateMachines
+
+    def started(self, sm):
+        if sm.name in START:
+            self.start = sm
+            sm.origin = None
+            sm.armed = not self.pin(PIN_SYNC)
+            if sm.name == "auto_start":
+                t, acc = sm.after(self.now, 0, START_RELEASE)
+                self.at(t, self.release, sm, sm.gen)
+        elif sm.name == "buffer_out" or sm.name in BLINK:
+            sm.waiting = True
+            sm.stalled = None
+        elif sm.name == "sync_and_read":
+            # expected sync word, into Y
+            if sm.tx:
+                sm.tx.popleft()
+            self.sync = sm
+            self.rx_need = 0
+        elif sm.name == "tx_fifo_purge":
+            sm.tx.clear()
+        self.fed(sm)
+
+    def fed(self, sm):
+        # FIFO written or read
+        if sm.name == "tx_raw_value":
+            while sm.tx and len(sm.rx) < sm.rx_depth:
+                sm.rx.append(sm.tx.popleft())
+        elif sm.name in BLINK and sm.stalled is not None and len(sm.tx) >= 2:
+            first = sm.stalled
+            sm.stalled = None
+            self.frame(sm, sm.gen, 0, first)
+
+    def release(self, sm, gen):
+        # IRQ 4 cleared, waiting machines start together
+        if sm.gen != gen:
+            return
+        sm.origin = self.now
+        sm.base = 0.0
+        for m in self.sm.values():
+            if m.running and getattr(m, "waiting", False):
+                m.waiting = False
+                if m.name == "buffer_out":
+                    self.word(m, m.gen, 0)
+                else:
+                    self.frame(m, m.gen, 0, True)
+        if not self.pin(PIN_SYNC):
+            self.trigger(sm)
+
+    def count(self, sm):
+        # cycles of SM_START since release, rebased when divider changes
+        if sm.origin is None:
+            return 0
+        sm.base += ((self.now - sm.origin) * 256) / sm.div256
+        sm.origin = self.now
+        return int(sm.base)
+
+    def trigger(self, sm):
+        # pin low, count pushed without blocking
+        x = (-((self.count(sm) // 4) + START_COUNT)) & 0xFFFFFFFF
+        if len(sm.rx) < sm.rx_depth:
+            sm.rx.append(x)
+
+    def sync_edge(self, value):
+        sm = self.start
+        if not sm or not sm.running:
+            return
+        if sm.origin is not None:
+            if not value:
+                self.trigger(sm)
+        elif sm.name == "start_from_sync":
+            if not value:
+                sm.armed = True
+            elif sm.armed:
+                t, acc = sm.after(self.now, 0, START_RELEASE)
+                self.at(t, self.release, sm, sm.gen)
+
+    def word(self, sm, gen, acc):
+        # 'buffer_out', next word or Underflow
+        if sm.gen != gen:
+            return
+        if not sm.tx:
+            self.underflows += 1
+            self.interrupt(sm, gen)
+            return
+        w = sm.tx.popleft()
+        t1, acc = sm.after(self.now, acc, HALF)
+        t2, acc = sm.after(t1, acc, HALF)
+        self.at(t1, self.loopback, w & 0xFFFF)
+        self.at(t2, self.loopback, w >> 16)
+        self.at(t2, self.word, sm, gen, acc)
+
+    def frame(self, sm, gen, acc, first):
+        # Blink, 2 words per frame and IRQ(s) at fixed divisions
+        if sm.gen != gen:
+            return
+        if len(sm.tx) < 2:
+            sm.stalled = first
+            return
+        sm.tx.popleft()
+        sm.tx.popleft()
+
+        extra = 4 * DIVISION if first else 0
+        quarters = 4 if sm.name == "shift_led_irq_4x" else 1
+        for q in range(quarters):
+            t, a = sm.after(self.now, acc, extra + BLINK_IRQ + (q * QUARTER))
+            self.at(t, self.interrupt, sm, gen)
+
+        t, acc = sm.after(self.now, acc, extra + FRAME)
+        self.at(t, self.frame, sm, gen, acc, False)
+
+    # -- RX
+
+    def loopback(self, half):
+        if self.source is None:
+            self.decode(half)
+
+    def decode(self, half):
+        # 16 bits of LTC, ending now
+        sm = self.sync
+        if not sm or not sm.running:
+            return
+        if not self.rx_need:
+            if half == SYNC_WORD:
+                self.rx_found, acc = sm.after(self.now, 0, SYNC_FOUND)
+                self.at(self.rx_found, self.found, sm, sm.gen)
+                self.rx_need = 4
+                self.rx_halves = []
+            return
+
+        self.rx_halves.append(half)
+        self.rx_need -= 1
+        if not self.rx_need:
+            h = self.rx_halves
+            t, acc = sm.after(self.rx_found, 0, SYNC_PUSH)
+            self.at(t, self.push, sm, sm.gen, (h[1] << 16) + h[0], (h[3] << 16) + h[2])
+
+    def found(self, sm, gen):
+        if sm.gen != gen:
+            return
+        self.set_pin(PIN_SYNC, 0)
+        t, acc = sm.after(self.now, 0, SYNC_IRQ)
+        self.at(t, self.interrupt, sm, gen)
+        t, acc = sm.after(self.now, 0, SYNC_HIGH)
+        self.at(t, self.sync_high, sm, gen)
+
+    def sync_high(self, sm, gen):
+        if sm.gen == gen:
+            self.set_pin(PIN_SYNC, 1)
+
+    def push(self, sm, gen, w0, w1):
+        if sm.gen != gen:
+            return
+        if len(sm.rx) + 2 > sm.rx_depth:
+            self.rx_dropped += 2
+            return
+        sm.rx.append(w0)
+        sm.rx.append(w1)
@@ -0,0 +1,157 @@
+# Host stand-in for MicroPython's 'machine', on the virtual clock (see
+# 'vclock.py'). Pins are the PIO emulator's GPIOs, the PIO clock divider
+# registers are the emulated StateMachines' and Timers are soft timers,
+# their callbacks scheduled onto core 0.
+#
+# Not provided: SPI, I2C, ADC, UART and friends of the board front-ends.
+
+import vclock
+
+# PIO blocks, and offset of SM0_CLKDIV (SMs are 0x18 apart)
+_PIO_BASE = [0x50200000, 0x50300000]
+_CLKDIV = 0x0c8
+_SIO_CPUID = 0xd0000000
+
+class _mem(object):
+    # registers as a dict, with those of the PIO clock dividers and CPUID
+    def __init__(self):
+        self.regs = {}
+
+    def _sm(self, addr):
+        for block, base in enumerate(_PIO_BASE):
+            offset = addr - base - _CLKDIV
+            if 0 <= offset < 4 * 0x18 and offset % 0x18 == 0:
+                return vclock.current.emu.sm.get((block << 2) + offset // 0x18)
+        return None
+
+    def __getitem__(self, addr):
+        if addr == _SIO_CPUID:
+            return vclock.current.core().id
+        sm = self._sm(addr)
+        if sm:
+            return sm.read_clkdiv()
+        return self.regs.get(addr, 0)
+
+    def __setitem__(self, addr, value):
+        value &= 0xFFFFFFFF
+        self.regs[addr] = value
+        sm = self._sm(addr)
+        if sm:
+            sm.write_clkdiv(value)
+
+mem32 = _mem()
+
+def freq(hz=None):
+    if hz is None:
+        return vclock.current.sys_freq
+    vclock.current.sys_freq = hz
+    vclock.current.emu.sys_freq = hz
+
+def idle():
+    # WFE, until an IRQ/event or the next SysTick (1ms)
+    c = vclock.current
+    tick = c.cycles(vclock.TICK_US)
+    c.sleep_until(((c.now // tick) + 1) * tick, True)
+
+def lightsleep(ms=None, *args):
+    vclock.current.sleep_us(1000 * ms if ms else 1000)
+
+def disable_irq():
+    # handlers only run when a core yields, so nothing to do
+    return 0
+
+def enable_irq(state=0):
+    pass
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+def unique_id():
+    return b"\x00" * 8
+
+
+class Pin(object):
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = self.IN
+        self.handler = None
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        emu = vclock.current.emu
+        if mode != -1:
+            self.mode = mode
+            emu.write_pindirs(self.id, 1, int(mode == self.OUT))
+        if pull == self.PULL_UP and not (emu.outputs >> self.id) & 1:
+            emu.set_pin(self.id, 1)
+        elif pull == self.PULL_DOWN and not (emu.outputs >> self.id) & 1:
+            emu.set_pin(self.id, 0)
+        if value is not None:
+            self.value(value)
+
+    def value(self, x=None):
+        emu = vclock.current.emu
+        if x is None:
+            return emu.pin(self.id)
+        emu.set_pin(self.id, int(bool(x)))
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def toggle(self):
+        self.value(1 - self.value())
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        # kept, but edges are not delivered
+        self.handler = handler
+
+
+class Timer(object):
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.seq = 0
+        self.callback = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None, tick_hz=1000,
+             hard=False):
+        c = vclock.current
+        self.deinit()
+        self.mode = mode
+        self.callback = callback
+        if freq > 0:
+            self.period = c.sys_freq // freq
+        else:
+            self.period = c.cycles((1000000 * period) // tick_hz)
+        c.add_timer(c.now + self.period, self)
+
+    def deinit(self):
+        # pending expiry is ignored, see 'clock.advance()'
+        self.seq = 0
+
+    def expire(self):
+        c = vclock.current
+        if self.mode == self.PERIODIC:
+            c.add_timer(c.now + self.period, self)
+        else:
+            self.seq = 0
+        c.interrupt()
+        if self.callback:
+            c.schedule(self.callback, self)
@@ -0,0 +1,33 @@
+# Host stand-in for the 'micropython' module, scheduled functions are run
+# by core 0 when it next yields (see 'vclock.py')
+
+import vclock
+
+def schedule(func, arg):
+    vclock.current.schedule(func, arg)
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+def mem_info(verbose=False):
+    import gc
+    print("stack: 0 out of 0\nGC: total: %d, used: %d, free: %d" % \
+            (gc.mem_alloc() + gc.mem_free(), gc.mem_alloc(), gc.mem_free()))
+
+def const(value):
+    return value
+
+def native(f):
+    return f
+
+viper = native
+
+# inline assembler routines modelled on the host, by name
+_asm_thumb = {
+    "sev": lambda: vclock.current.sev(),
+}
+
+def asm_thumb(f):
+    if f.__name__ not in _asm_thumb:
+        raise NotImplementedError("asm_thumb '%s' has no host model" % f.__name__)
+    return _asm_thumb[f.__name__]
@@ -0,0 +1,27 @@
+# Host stand-in for MicroPython's 'gc', installed as 'gc' by 'shim.install()'.
+# 'collect()' is counted and costs virtual time rather than collecting;
+# heap use is that traced by 'tracemalloc', when it is running.
+
+import gc as _cpython
+import tracemalloc
+import vclock
+
+HEAP = 192 * 1024       # nominal, free is what is left of it
+
+def collect():
+    vclock.current.collects += 1
+    vclock.current.spend(vclock.COST_COLLECT)
+
+def mem_alloc():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+def mem_free():
+    return max(0, HEAP - mem_alloc())
+
+def threshold(amount=None):
+    return -1
+
+def __getattr__(name):
+    return getattr(_cpython, name)
@@ -0,0 +1,46 @@
+# Host stand-in for MicroPython's '_thread', threads are cores on the
+# virtual clock and locks are co-operative, spinning in virtual time.
+# Installed as '_thread' by 'shim.install()', anything else comes from
+# CPython's, as the standard library uses it too.
+
+import _thread as _cpython
+import vclock
+
+class lock(object):
+    def __init__(self):
+        self._locked = False
+
+    def acquire(self, waitflag=1, timeout=-1):
+        while self._locked:
+            if not waitflag:
+                return False
+            vclock.current.spend(vclock.COST_POLL)
+        self._locked = True
+        return True
+
+    def release(self):
+        if not self._locked:
+            raise RuntimeError("release unlocked lock")
+        self._locked = False
+
+    def locked(self):
+        return self._locked
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+def allocate_lock():
+    return lock()
+
+def start_new_thread(func, args, kwargs=None):
+    return vclock.current.start_thread(func, args, kwargs)
+
+def exit():
+    raise SystemExit
+
+def __getattr__(name):
+    return getattr(_cpython, name)
@@ -0,0 +1,67 @@
+# Host stand-in for MicroPython's 'rp2', StateMachines are those of the
+# PIO emulator (see '../pio/pioemu.py') on the virtual clock: 'put()'
+# blocks in virtual time, FIFO levels cost a poll and handlers wake the
+# cores from WFE. Or those of the faster model (see 'fastpio.py'), when
+# the clock was installed with it.
+#
+# Not provided: DMA, so 'engine.dma' has to stay False.
+
+import pioemu
+import fastpio
+import vclock
+
+from pioemu import asm_pio, PIOASMError
+
+class PIO(pioemu.PIO):
+    def __init__(self, id):
+        self.id = id
+
+    def add_program(self, prog):
+        pass
+
+    def remove_program(self, prog=None):
+        pass
+
+    def state_machine(self, id, prog=None, freq=-1, **kwargs):
+        return StateMachine((self.id << 2) + id, prog, freq, **kwargs)
+
+
+class _virtual(object):
+    # on the virtual clock, either emulated or modelled
+    def put(self, value, shift=0):
+        c = vclock.current
+        if isinstance(value, int):
+            value = [value]
+        for w in value:
+            while len(self.tx) >= self.tx_depth:
+                if self.emu.busy or not self.running:
+                    raise OverflowError("TX FIFO full, SM %d" % self.id)
+                c.spend(vclock.COST_POLL)
+            super().put(w, shift)
+
+    def tx_fifo(self):
+        vclock.current.spend(vclock.COST_POLL)
+        return len(self.tx)
+
+    def rx_fifo(self):
+        vclock.current.spend(vclock.COST_POLL)
+        return len(self.rx)
+
+    def irq(self, handler=None, trigger=None, hard=False):
+        if handler is None:
+            self.handler = None
+            return
+
+        def interrupt(sm):
+            vclock.current.interrupt()
+            handler(sm)
+        self.handler = interrupt
+
+
+if isinstance(vclock.current.emu, fastpio.model):
+    _machine = fastpio.StateMachine
+else:
+    _machine = pioemu.StateMachine
+
+class StateMachine(_virtual, _machine):
+    pass
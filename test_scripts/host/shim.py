@@ -0,0 +1,34 @@
+# Install the host stand-ins for MicroPython, so 'pico_timecode.py' and its
+# engine can be imported and run on a PC:
+#
+#   import shim
+#   clock = shim.install()
+#   import pico_timecode as pt
+#
+# 'machine', 'rp2', 'micropython', 'utime' and 'uctypes' are found on the
+# path, '_thread' and 'gc' are built into CPython so are replaced in
+# 'sys.modules'. Returns the virtual clock, see 'vclock.py'; 'fast' uses the
+# model of the StateMachines (see 'fastpio.py') rather than the emulator.
+
+# before '_thread' is replaced
+import threading
+import sys
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TOP = os.path.join(HERE, "..", "..")
+
+def install(sys_freq=180_000_000, fast=False):
+    for path in [HERE, os.path.join(HERE, "..", "pio"), TOP]:
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    import vclock
+    import mp_thread
+    import mp_gc
+    import fastpio
+
+    clock = vclock.clock(sys_freq, fastpio.model(sys_freq) if fast else None)
+    sys.modules["_thread"] = mp_thread
+    sys.modules["gc"] = mp_gc
+    return clock
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+#
+# Soak the engine of 'pico_timecode.py' for a day or more, in minutes: the
+# host stand-ins for MicroPython (see 'shim.py') with the faster model of
+# the StateMachines (see 'fastpio.py'), so that the things which happen
+# hourly or daily are covered - midnight wrap, Drop-Frame minutes, the
+# calibration timers dithering the dividers and Jam re-validation.
+#
+# RX decodes its own TX (ie. DEMO, MONITOR mode), or with '--jam' an
+# external LTC generator which the engine Jams to, optionally again every
+# '--rejam' minutes. Each TX frame can be logged (TX raw, RX raw, FIFO
+# level, calval, divider and RX phase) and is checked for:
+#   - TX and RX labels counting, without skips or repeats
+#   - labels which Drop-Frame skips, or which are not valid
+#   - RX labels being ones sent, when looped back
+#   - RX phase moving from where it started, by more than '--limit'
+#   - frame rate, vs. the divider the calibration value asks for
+#   - Buffer Underflow, lost RX words and the engine's thread ending
+# Labels are counted here, rather than with 'libs/timecode.py'.
+#
+# To run faster than with the emulator the SysTick is 10ms and polls only
+# yield every 20us, see 'vclock.py'.
+
+from argparse import ArgumentParser
+from collections import deque
+from array import array
+import time
+import gzip
+import sys
+
+import shim
+clock = shim.install(fast=True)
+
+import vclock
+vclock.TICK_US = 10000
+vclock.POLL_QUANTUM_US = 20
+
+import pico_timecode as pt
+import mp_thread as _thread
+import fastpio
+import rp2
+import utime
+from machine import Pin
+from libs.timecode import timecode
+from libs.framerates import framerates, framerate_index, \
+        FR_FRAMES, FR_NUM, FR_DEN, FR_DIV, FR_SM_FREQ
+
+# label of raw value, and frames since midnight for it
+def label(raw):
+    return ((raw >> 24) & 0x1F, (raw >> 16) & 0x3F, (raw >> 8) & 0x3F, raw & 0x3F)
+
+def frame_number(raw, nominal, drop):
+    hh, mm, ss, ff = label(raw)
+    minutes = (hh * 60) + mm
+    return (((minutes * 60) + ss) * nominal) + ff - (drop * (minutes - (minutes // 10)))
+
+def bad_label(raw, nominal, drop):
+    # not a label, or one which Drop-Frame skips
+    hh, mm, ss, ff = label(raw)
+    if hh > 23 or mm > 59 or ss > 59 or ff >= nominal:
+        return "invalid"
+    if drop and ss == 0 and ff < drop and mm % 10:
+        return "dropped"
+    return None
+
+def ascii(raw):
+    hh, mm, ss, ff = label(raw)
+    return "%02d:%02d:%02d%s%02d" % (hh, mm, ss, ";" if raw & 0x80 else ":", ff)
+
+class generator(object):
+    # external LTC into the model's 'sync_and_read', for Jam, from a clock
+    # 'ppm' faster than nominal
+    def __init__(self, emu, fps, df, start, ppm=0.0):
+        self.emu = emu
+        self.tc = timecode()
+        self.tc.from_ascii(start)
+        self.tc.set_fps_df(fps, df)
+
+        # system cycles per 16bit half, in 1/256ths
+        rate = framerates[framerate_index(fps)]
+        self.half = round((emu.sys_freq * 256 * 16 * rate[FR_DEN]) / \
+                          (rate[FR_NUM] * 80 * (1 + (ppm / 1000000))))
+        self.words = array("I", [0, 0])
+        self.t = 0
+
+    def start(self):
+        self.emu.source = self
+        self.t = self.emu.now << 8
+        self.frame()
+
+    def frame(self):
+        self.tc.to_ltc_words(self.words, False)
+        self.tc.next_frame()
+        w0, w1 = self.words
+        for half in (w0 & 0xFFFF, w0 >> 16, w1 & 0xFFFF, w1 >> 16, fastpio.SYNC_WORD):
+            self.t += self.half
+            self.emu.at(self.t >> 8, self.emu.decode, half)
+        self.emu.at(self.t >> 8, self.frame)
+
+
+class soak(object):
+    # per frame log and checks, from the TX callback and each RX decode
+    def __init__(self, fps, df, limit, log=None):
+        rate = framerates[framerate_index(fps)]
+        self.nominal = rate[FR_FRAMES]
+        self.drop = (2 if self.nominal == 30 else 4) if df else 0
+        self.total = frame_number(24 << 24, self.nominal, self.drop)
+        self.div = rate[FR_DIV] >> 8
+        self.limit = limit
+        self.log = log
+        if log:
+            log.write("# us tx rx fifo calval div phase\n")
+
+        self.eng = None
+        self.sent = deque([], 8)
+        self.tx = 0
+        self.rx = 0
+        self.faults = {}            # counts, and first few examples
+        self.examples = []
+        self.fifo = [99, 0]
+        self.phases = [0, 0]        # RX phase moved, least and most
+        self.jams = []              # time to Jam, in s
+        self.jam_fails = 0
+        self.cycles = 0             # TX frames, system cycles they took
+        self.frames = 0
+        self.divs = 0               # and dividers they were sent with
+        self.stopped = None
+
+    def fault(self, kind, what):
+        self.faults[kind] = self.faults.get(kind, 0) + 1
+        if len(self.examples) < 10:
+            self.examples.append("%s %s: %s" % (hms(clock.us()), kind, what))
+
+    def attach(self, eng, started):
+        # new engine, labels restart
+        self.eng = eng
+        self.started = started
+        self.tx_last = None
+        self.rx_last = None
+        self.mode = eng.mode
+        self.tx_time = None
+        self.phase = None           # first, and since then
+        self.moved = 0
+        self.moves = 0
+        self.away = False
+
+        # every RX decode, as the engine makes them
+        decode = eng.rc.from_ltc_bytes
+        def from_ltc_bytes(b, acquire=True):
+            valid = decode(b, acquire)
+            self.rx_frame(valid)
+            return valid
+        eng.rc.from_ltc_bytes = from_ltc_bytes
+
+        pt.irq_callbacks[pt.SM_BLINK] = self.tx_frame
+
+    def follows(self, kind, last, raw):
+        if last is None:
+            return
+        fn = frame_number(raw, self.nominal, self.drop)
+        step = (fn - frame_number(last, self.nominal, self.drop)) % self.total
+        if step == 0:
+            self.fault(kind + " repeat", ascii(raw))
+        elif step != 1:
+            self.fault(kind + " skip", "%s after %s" % (ascii(raw), ascii(last)))
+
+    def tx_frame(self, sm):
+        raw = pt.tx_raw & 0xFFFFFFFF
+        eng = self.eng
+        # from the model, as polling FIFO levels would yield
+        fifo = eng.sm[pt.SM_BUFFER].tx
+        div = eng.sm[pt.SM_BUFFER].div256
+
+        if self.tx_last is None and eng.mode <= pt.MONITOR:
+            self.jams.append((clock.now - self.started) / clock.sys_freq)
+        bad = bad_label(raw, self.nominal, self.drop)
+        if bad:
+            self.fault("TX " + bad, ascii(raw))
+        self.follows("TX", self.tx_last, raw)
+        self.tx_last = raw
+        self.sent.append(raw)
+        self.tx += 1
+
+        self.fifo[0] = min(self.fifo[0], len(fifo))
+        self.fifo[1] = max(self.fifo[1], len(fifo))
+        if self.tx_time is not None:
+            self.cycles += clock.now - self.tx_time
+            self.frames += 1
+            self.divs += div
+        self.tx_time = clock.now
+
+        if self.log:
+            self.log.write("%d %08x %08x %d %g %x %d\n" % (clock.us(), raw,
+                    self.rx_last or 0, len(fifo), eng.calval, div,
+                    pt.rx_phase() if self.phase is not None else 0))
+
+    def rx_frame(self, valid):
+        eng = self.eng
+        raw = eng.rc.to_raw() & 0xFFFFFFFF
+
+        # Jam restarted, as validation failed
+        if eng.mode == pt.JAM and pt.MONITOR < self.mode < pt.JAM:
+            self.jam_fails += 1
+        self.mode = eng.mode
+
+        if not valid:
+            self.fault("RX invalid", "after %s" % ascii(raw))
+            self.rx_last = None
+            return
+        bad = bad_label(raw, self.nominal, self.drop)
+        if bad:
+            self.fault("RX " + bad, ascii(raw))
+        self.follows("RX", self.rx_last, raw)
+        if clock.emu.source is None and self.sent and raw not in self.sent:
+            self.fault("RX not sent", ascii(raw))
+        self.rx_last = raw
+        self.rx += 1
+
+        # RX vs TX phase, once TX is running - SM_START's 1st count is
+        # from its release of the others, rather than a sync
+        if self.tx_last is None:
+            return
+        self.moves += 1
+        if self.moves < 2:
+            return
+        phase = pt.rx_phase()
+        if self.phase is None:
+            self.phase = phase
+            self.last_phase = phase
+
+        # followed past +/-320, as it drifts by whole frames
+        self.moved += ((phase - self.last_phase + 320) % 640) - 320
+        self.last_phase = phase
+
+        self.phases[0] = min(self.phases[0], self.moved)
+        self.phases[1] = max(self.phases[1], self.moved)
+        if abs(self.moved) > self.limit:
+            if not self.away:
+                self.fault("RX phase", "%+d from %d" % (self.moved, self.phase))
+            self.away = True
+        else:
+            self.away = False
+
+    def check(self, calval):
+        ok = True
+        if self.stopped:
+            print("engine stopped: %s" % self.stopped)
+            ok = False
+        if not self.tx or not self.rx:
+            print("no TX/RX labels")
+            ok = False
+        if self.faults:
+            ok = False
+        if fastpio.current.rx_dropped:
+            print("RX words dropped: %d" % fastpio.current.rx_dropped)
+            ok = False
+
+        # frame rate, vs. average divider
+        if self.frames:
+            measured = self.cycles / self.frames
+            expected = (2560 * (self.div - calval)) / 256
+            error = 1000000 * ((measured / expected) - 1)
+            actual = 1000000 * ((measured / ((2560 * self.divs) / (256 * self.frames))) - 1)
+            print("frame rate: %+.4f ppm vs. calval %g, %+.4f ppm vs. dividers used" % \
+                    (error, calval, actual))
+            # dithering part way through its period, when run was short
+            allowed = 0.05 + ((1000000 / self.div) * (self.eng.period / 1000) / \
+                              (self.cycles / clock.sys_freq))
+            if abs(error) > allowed:
+                print("frame rate does not follow calval")
+                ok = False
+        return ok
+
+
+def hms(us):
+    s = us // 1000000
+    return "%d:%02d:%02d" % (s // 3600, (s // 60) % 60, s % 60)
+
+def start(fps, df, label, calval, jam):
+    # as 'ascii_display_thread()', MONITOR mode or Jamming
+    eng = pt.engine()
+    pt.eng = eng
+    eng.mode = pt.JAM if jam else pt.MONITOR
+    eng.set_stopped(True)
+    eng.tc.from_ascii(label)
+    eng.tc.set_fps_df(fps, df)
+    eng.calval = calval
+
+    sm_freq = framerates[eng.tc.rate][FR_SM_FREQ]
+    eng.sm = []
+    if jam:
+        eng.sm.append(rp2.StateMachine(pt.SM_START, pt.start_from_sync, freq=sm_freq,
+                               in_base=Pin(21),
+                               jmp_pin=Pin(21)))
+    else:
+        eng.sm.append(rp2.StateMachine(pt.SM_START, pt.auto_start, freq=sm_freq,
+                               jmp_pin=Pin(21)))
+    eng.sm.append(rp2.StateMachine(pt.SM_BLINK, pt.shift_led_irq_1x, freq=sm_freq,
+                           jmp_pin=Pin(26),
+                           out_base=Pin(25)))
+    eng.sm.append(rp2.StateMachine(pt.SM_BUFFER, pt.buffer_out, freq=sm_freq,
+                           out_base=Pin(22)))
+    eng.sm.append(rp2.StateMachine(pt.SM_ENCODE, pt.encode_dmc, freq=sm_freq,
+                           jmp_pin=Pin(22),
+                           in_base=Pin(13),
+                           out_base=Pin(13)))
+    eng.sm.append(rp2.StateMachine(pt.SM_TX_RAW, pt.tx_raw_value, freq=sm_freq))
+    eng.sm.append(rp2.StateMachine(pt.SM_SYNC, pt.sync_and_read, freq=sm_freq,
+                           jmp_pin=Pin(19),
+                           in_base=Pin(19),
+                           out_base=Pin(21),
+                           set_base=Pin(21)))
+    eng.sm.append(rp2.StateMachine(pt.SM_DECODE, pt.decode_dmc, freq=sm_freq,
+                           jmp_pin=Pin(18 if jam else 13),
+                           in_base=Pin(18 if jam else 13),
+                           set_base=Pin(19)))
+
+    eng.config_clocks(eng.tc.fps)
+    pt.irq_attach(eng)
+
+    pt.stop = False
+    _thread.start_new_thread(pt.pico_timecode_thread, (eng, lambda: pt.stop))
+    return eng
+
+def stop(eng):
+    pt.irq_callbacks[pt.SM_BLINK] = None
+    pt.stop = True
+    while clock.threads() > 1:
+        utime.sleep(0.1)
+
+def run(options, fps, df, log):
+    mon = soak(fps, df, options.limit, log)
+    if options.jam:
+        gen = generator(clock.emu, fps, df, options.start, options.ppm)
+        gen.start()
+
+    wall = time.perf_counter()
+    hours = int(options.hours * 3600)
+    rejam = int(options.rejam * 60)
+    mon.attach(start(fps, df, options.start, options.calval, options.jam), clock.now)
+
+    for s in range(1, hours + 1):
+        utime.sleep(1)
+
+        if mon.eng.mode == pt.HALTED or clock.threads() < 2:
+            mon.stopped = "HALTED, %d underrun" % mon.eng.fifo.underruns \
+                    if mon.eng.mode == pt.HALTED else "thread ended"
+            break
+
+        if options.jam and rejam and s % rejam == 0 and s < hours:
+            stop(mon.eng)
+            mon.attach(start(fps, df, options.start, options.calval, True), clock.now)
+
+        if s % 3600 == 0 or s == hours:
+            elapsed = time.perf_counter() - wall
+            print("%s: %.0fs wall (%.0fx real time), TX %s, RX %s, FIFO %d..%d, "
+                  "phase %+d..%+d, %d faults" % (hms(clock.us()), elapsed, s / elapsed,
+                    ascii(mon.tx_last or 0), ascii(mon.rx_last or 0), mon.fifo[0],
+                    mon.fifo[1], mon.phases[0], mon.phases[1],
+                    sum(mon.faults.values())))
+            sys.stdout.flush()
+
+    if not mon.stopped:
+        stop(mon.eng)
+    return mon
+
+def main():
+    parser = ArgumentParser(prog="soak")
+
+    parser.add_argument("-H", "--hours",
+        type=float, default=24, dest="hours",
+        help="simulated time to run for")
+
+    parser.add_argument("-f", "--fps",
+        default="29.97", dest="fps",
+        help="frame rate, 29.97 is Drop-Frame unless '--ndf'")
+
+    parser.add_argument("-N", "--ndf",
+        action="store_true", dest="ndf",
+        help="29.97 without Drop-Frame")
+
+    parser.add_argument("-s", "--start",
+        default="23:59:58:00", dest="start",
+        help="starting label, default passes midnight whilst Jamming")
+
+    parser.add_argument("-c", "--calval",
+        type=float, default=0.5, dest="calval",
+        help="calibration value, fractions exercise the dithering timers")
+
+    parser.add_argument("-j", "--jam",
+        action="store_true", dest="jam",
+        help="Jam to an external LTC generator, rather than free running")
+
+    parser.add_argument("-p", "--ppm",
+        type=float, default=0, dest="ppm",
+        help="external generator faster than nominal, in ppm")
+
+    parser.add_argument("-r", "--rejam",
+        type=float, default=0, dest="rejam",
+        help="restart and Jam again every this many minutes")
+
+    parser.add_argument("-l", "--limit",
+        type=int, default=8, dest="limit",
+        help="RX phase movement allowed, in SM_START counts (4 cycles)")
+
+    parser.add_argument("-o", "--log",
+        dest="log",
+        help="file to log each frame to, compressed if '.gz'")
+
+    options = parser.parse_args()
+
+    rate = framerate_index(options.fps)
+    if rate is None:
+        print("unknown frame rate: %s" % options.fps)
+        sys.exit(1)
+    fps = framerates[rate][0]
+    df = rate == 1 and not options.ndf
+
+    log = None
+    if options.log:
+        log = gzip.open(options.log, "wt") if options.log.endswith(".gz") \
+                else open(options.log, "w")
+
+    print("%.2f%s, from %s for %gh, calval %g%s" % (fps, "-DF" if df else "",
+            options.start, options.hours, options.calval,
+            ", Jam to %+g ppm" % options.ppm if options.jam else ""))
+    mon = run(options, fps, df, log)
+    if log:
+        log.close()
+
+    print("%d TX frames, %d RX, FIFO %d..%d, RX phase %s, moved %+d..%+d" % (mon.tx,
+            mon.rx, mon.fifo[0], mon.fifo[1], mon.phase, mon.phases[0], mon.phases[1]))
+    if options.jam:
+        print("Jammed %d times, in %s s, %d validation restarts" % (len(mon.jams),
+                ", ".join(["%.2f" % j for j in mon.jams]), mon.jam_fails))
+        if mon.moves:
+            # phase goes -ve as RX gets ahead
+            print("RX vs TX: %+.3f ppm since last Jam" % \
+                    ((-1000000 * mon.moved) / (640 * mon.moves)))
+
+    ok = mon.check(options.calval)
+    for kind in sorted(mon.faults):
+        print("%s: %d" % (kind, mon.faults[kind]))
+    for e in mon.examples:
+        print("  ", e)
+
+    print("PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
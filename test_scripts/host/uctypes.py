@@ -0,0 +1,20 @@
+# Host stand-in for the parts of 'uctypes' used to alias buffers, an
+# address is a handle on the object rather than a pointer
+
+_objects = {}
+
+def addressof(obj):
+    _objects[id(obj)] = obj
+    return id(obj)
+
+def bytearray_at(addr, size):
+    return memoryview(_objects[addr]).cast("B")[:size]
+
+# only a single ARRAY of UINT16, as used by 'libs/timecode.halfwords()'
+ARRAY = 2 << 30
+UINT16 = 2 << 27
+
+class struct(object):
+    def __init__(self, addr, desc):
+        for name, (kind, count) in desc.items():
+            setattr(self, name, memoryview(_objects[addr]).cast("B").cast("H")[:count & 0xFFFF])
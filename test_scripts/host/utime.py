@@ -0,0 +1,41 @@
+# Host stand-in for MicroPython's 'utime'/'time', on the virtual clock
+
+import vclock
+
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALF = _TICKS_PERIOD // 2
+
+def sleep(seconds):
+    vclock.current.sleep_us(int(seconds * 1000000))
+
+def sleep_ms(ms):
+    vclock.current.sleep_us(int(ms * 1000))
+
+def sleep_us(us):
+    vclock.current.sleep_us(int(us))
+
+def ticks_us():
+    c = vclock.current
+    c.spend(vclock.COST_POLL)
+    return c.us() & _TICKS_MAX
+
+def ticks_ms():
+    c = vclock.current
+    c.spend(vclock.COST_POLL)
+    return (c.us() // 1000) & _TICKS_MAX
+
+def ticks_cpu():
+    return vclock.current.now & _TICKS_MAX
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+def time():
+    return vclock.current.us() // 1000000
+
+def time_ns():
+    return vclock.current.us() * 1000
@@ -0,0 +1,239 @@
+# Virtual clock for the host stand-ins of 'machine', 'rp2', '_thread',
+# 'micropython' and 'utime', so the engine of 'pico_timecode.py' can run
+# on a PC against the PIO emulator, faster than real time.
+#
+# Time is the emulator's, in system cycles, and only moves when the code
+# on a 'core' sleeps, idles (WFE) or spends time polling. The cores are
+# threads, but only the one holding the baton runs; when it yields, the
+# emulator and timers are run up to the next core due to wake, which then
+# gets the baton. So runs are repeatable, and code between yields is as
+# atomic as it is with IRQs disabled.
+#
+# Python code itself takes no time, except for the nominal costs below.
+# IRQ handlers run from within the emulator, on whichever core yielded.
+
+import threading
+import traceback
+import heapq
+from collections import deque
+
+import pioemu
+
+SYS_FREQ = 180_000_000
+
+# nominal CPU costs, in us
+COST_POLL = 1               # reading ticks or FIFO levels
+COST_COLLECT = 1000         # 'gc.collect()'
+
+SCHEDULE_DEPTH = 8          # as MicroPython's scheduler queue
+TICK_US = 1000              # SysTick, 'machine.idle()' returns on each
+POLL_QUANTUM_US = 0         # spent time is owed until this much, then yield
+
+current = None
+
+class core(object):
+    def __init__(self, id):
+        self.id = id
+        self.wake = 0           # system time to resume
+        self.until = 0          # time sleep finishes
+        self.wfe = False        # IRQs and events end sleep early
+        self.woken = False
+        self.event = False      # latched by 'sev()', ends next WFE at once
+        self.frozen = 0         # held off until, see 'stall()'
+        self.busy = 0           # cycles spent, not sleeping
+        self.owed = 0           # cycles spent, not yet yielded
+
+
+class clock(object):
+    def __init__(self, sys_freq=SYS_FREQ, emu=None):
+        global current
+
+        self.sys_freq = sys_freq
+        self.emu = emu or pioemu.reset(sys_freq)
+        self.cond = threading.Condition()
+        self.cores = {threading.get_ident(): core(0)}
+        self.baton = self.cores[threading.get_ident()]
+        self.timers = []            # (time, seq, timer)
+        self.seq = 0
+        self.pending = deque()      # 'micropython.schedule()' queue
+        self.events = 0             # IRQs and timer expiries
+        self.collects = 0
+        self.scheduled = 0
+        current = self
+
+    # -- time
+
+    @property
+    def now(self):
+        return self.emu.now
+
+    def us(self):
+        return (self.emu.now * 1000000) // self.sys_freq
+
+    def cycles(self, us):
+        return max(1, (us * self.sys_freq) // 1000000)
+
+    def core(self):
+        # core of calling thread, 0 for any thread not started as one
+        c = self.cores.get(threading.get_ident())
+        return c if c else self.cores_by_id(0)
+
+    def cores_by_id(self, id):
+        for c in self.cores.values():
+            if c.id == id:
+                return c
+        return None
+
+    # -- yielding
+
+    def sleep_until(self, t, wfe=False):
+        me = self.core()
+        if wfe and me.event:
+            me.event = False
+            return
+        me.until = t
+        me.wfe = wfe
+        me.woken = False
+        while True:
+            me.wake = max(me.until if not me.woken else self.emu.now, me.frozen)
+            self.switch(me)
+            if me.id == 0:
+                self.run_pending()
+            if self.emu.now >= me.frozen and \
+                    (self.emu.now >= me.until or (wfe and me.woken)):
+                break
+        me.wfe = False
+
+    def sleep_us(self, us, wfe=False):
+        self.sleep_until(self.emu.now + self.cycles(us), wfe)
+
+    def spend(self, us):
+        # CPU time, ignored in handlers as they run within the emulator
+        if self.emu.busy:
+            return
+        n = self.cycles(us)
+        me = self.core()
+        me.busy += n
+        me.owed += n
+        if me.owed < self.cycles(POLL_QUANTUM_US):
+            return
+        n = me.owed
+        me.owed = 0
+        self.sleep_until(self.emu.now + n)
+
+    def switch(self, me):
+        with self.cond:
+            nxt = self.advance()
+            if nxt is not me:
+                self.baton = nxt
+                self.cond.notify_all()
+                while self.baton is not me:
+                    self.cond.wait()
+
+    def advance(self):
+        # run emulator and timers up to the next core to wake, returns it
+        while True:
+            nxt = min(self.cores.values(), key=lambda c: (c.wake, c.id))
+            t = nxt.wake
+            if self.timers and self.timers[0][0] <= t:
+                when, seq, timer = self.timers[0]
+                if self.run_to(when):
+                    heapq.heappop(self.timers)
+                    if timer.seq == seq:
+                        timer.expire()
+                continue
+            if self.run_to(t):
+                return nxt
+
+    def run_to(self, t):
+        # False if a handler woke a core first
+        if t > self.emu.now:
+            self.emu.run(t)
+        return self.emu.now >= t
+
+    # -- events
+
+    def interrupt(self):
+        # IRQ or timer, taken on core 0 so wakes it from WFE - not core 1
+        self.events += 1
+        self.wake_core(self.cores_by_id(0))
+
+    def sev(self):
+        # SEV instruction, wakes both cores from WFE or latches the event
+        for c in self.cores.values():
+            if c.wfe and not c.woken:
+                self.wake_core(c)
+            else:
+                c.event = True
+
+    def wake_core(self, c):
+        if c.wfe and not c.woken:
+            c.woken = True
+            at = self.emu.now + (1 if self.emu.busy else 0)
+            if c.wake > at:
+                c.wake = max(at, c.frozen)
+                self.emu.halt = self.emu.busy
+
+    def schedule(self, func, arg):
+        if len(self.pending) >= SCHEDULE_DEPTH:
+            raise RuntimeError("schedule queue full")
+        self.pending.append((func, arg))
+        self.scheduled += 1
+
+        # core 0 runs them, as soon as it can
+        c = self.cores_by_id(0)
+        at = self.emu.now + (1 if self.emu.busy else 0)
+        if c.wake > at:
+            c.wake = max(at, c.frozen)
+            self.emu.halt = self.emu.busy
+
+    def run_pending(self):
+        while self.pending:
+            func, arg = self.pending.popleft()
+            func(arg)
+
+    def add_timer(self, t, timer):
+        self.seq += 1
+        timer.seq = self.seq
+        heapq.heappush(self.timers, (t, self.seq, timer))
+
+    def stall(self, id, us):
+        # hold core 'id' off for 'us' from its next yield, ie. long GC
+        c = self.cores_by_id(id)
+        if c:
+            c.frozen = self.emu.now + self.cycles(us)
+
+    # -- threads
+
+    def start_thread(self, func, args, kwargs=None):
+        if len(self.cores) > 1:
+            raise OSError("core1 in use")
+
+        c = core(1)
+        c.wake = self.emu.now
+
+        def run():
+            with self.cond:
+                while self.baton is not c:
+                    self.cond.wait()
+            try:
+                func(*args, **(kwargs or {}))
+            except SystemExit:
+                pass
+            except Exception:
+                print("Unhandled exception in thread started by", func)
+                traceback.print_exc()
+            finally:
+                with self.cond:
+                    del self.cores[threading.get_ident()]
+                    self.baton = self.advance()
+                    self.cond.notify_all()
+
+        t = threading.Thread(target=run, daemon=True)
+        with self.cond:
+            t.start()
+            self.cores[t.ident] = c
+        return t.ident
+
+    def threads(self):
+        return len(self.cores)
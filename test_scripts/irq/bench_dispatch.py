@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+#
+# Compare the cost of the original 'irq_handler', which compares the IRQ's
+# StateMachine against each entry of 'eng.sm', with the dispatch table
+# built once by 'irq_attach()'. Both are copied here with the hardware
+# accesses stubbed, so only the dispatch work is measured.
+#
+# On the Pico, the handler time is measured with 'eng.profile()' and
+# reported in 'eng.prof.summary()["handler"]'.
+
+from argparse import ArgumentParser
+import time
+
+SM_START    = 0
+SM_BLINK    = 1
+SM_BUFFER   = 2
+SM_ENCODE   = 3
+SM_TX_RAW   = 4
+SM_SYNC     = 5
+SM_DECODE   = 6
+
+HALTED  = -1
+
+class sm(object):
+    def __init__(self, id):
+        self.id = id
+
+    def rx_fifo(self):
+        return 0
+
+    def get(self):
+        return 0
+
+class engine(object):
+    def __init__(self):
+        self.sm = [sm(i) for i in range(7)]
+        self.mode = 0
+        self.prof = None
+
+eng = engine()
+stop = False
+tx_raw = 0
+tx_ticks_us = 0
+rx_ticks_us = 0
+quarters = 0
+_hasUsbDevice = True
+scheduled = 0
+
+irq_callbacks = [None] * 8
+
+def schedule(func, arg):
+    global scheduled
+    scheduled += 1
+
+def display_callback(sm=None):
+    pass
+
+def ticks_us():
+    return 0
+
+#---------------------------------------------
+# original, compares against each StateMachine
+
+def legacy_irq_handler(m):
+    global eng, stop
+    global tx_raw, rx_ticks_us, tx_ticks_us
+    global quarters, _hasUsbDevice
+
+    ticks = ticks_us()
+
+    if m==eng.sm[SM_BLINK]:
+        if quarters==0 and eng.sm[SM_TX_RAW].rx_fifo():
+            tx_raw = eng.sm[SM_TX_RAW].get()
+
+        if _hasUsbDevice:
+            quarters += 1
+            if quarters==4:
+                quarters = 0
+
+        tx_ticks_us = ticks
+
+    if m==eng.sm[SM_SYNC]:
+        rx_ticks_us = ticks
+
+    if m==eng.sm[SM_BUFFER]:
+        stop = 1
+        eng.mode = HALTED
+
+    for i in range(len(eng.sm)):
+        if irq_callbacks[i] and m==eng.sm[i]:
+            schedule(irq_callbacks[i], i)
+
+#---------------------------------------------
+# dispatch table, as 'irq_attach()'
+
+def irq_blink(ticks):
+    global tx_raw, tx_ticks_us
+    global quarters
+
+    if quarters==0 and eng.sm[SM_TX_RAW].rx_fifo():
+        tx_raw = eng.sm[SM_TX_RAW].get()
+
+    if _hasUsbDevice:
+        quarters += 1
+        if quarters==4:
+            quarters = 0
+
+    tx_ticks_us = ticks
+
+def irq_sync(ticks):
+    global rx_ticks_us
+    rx_ticks_us = ticks
+
+def irq_buffer(ticks):
+    global stop
+    stop = 1
+    eng.mode = HALTED
+
+irq_handlers = [None, irq_blink, irq_buffer, None, None, irq_sync, None, None]
+irq_table = {}
+
+def irq_attach(eng):
+    global irq_table
+
+    table = {}
+    for i in range(len(eng.sm)):
+        table[eng.sm[i]] = (irq_handlers[i], i)
+    irq_table = table
+
+def irq_handler(m):
+    ticks = ticks_us()
+
+    entry = irq_table.get(m)
+    if entry:
+        handler, i = entry
+        if handler:
+            handler(ticks)
+
+        if irq_callbacks[i]:
+            schedule(irq_callbacks[i], i)
+
+#---------------------------------------------
+
+def bench(name, handler, m, count):
+    global scheduled
+    scheduled = 0
+
+    start = time.perf_counter()
+    for n in range(count):
+        handler(m)
+    t = time.perf_counter() - start
+
+    print("%-8s %-6s: %6.3f us per IRQ (%d callbacks scheduled)" % \
+            (name, ["START", "BLINK", "BUFFER", "ENCODE", "TX_RAW", "SYNC", "DECODE"][m.id],
+             t * 1e6 / count, scheduled))
+    return t
+
+def main():
+    parser = ArgumentParser(prog="bench_dispatch")
+
+    parser.add_argument("-n", "--count",
+        type=int, default=200000, dest="count",
+        help="number of IRQs to time")
+
+    options = parser.parse_args()
+
+    irq_callbacks[SM_BLINK] = display_callback
+    irq_attach(eng)
+
+    for m in [eng.sm[SM_BLINK], eng.sm[SM_SYNC]]:
+        before = bench("legacy", legacy_irq_handler, m, options.count)
+        after = bench("table", irq_handler, m, options.count)
+        print("speed up %.2fx" % (before / after))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+#
+# Check the IRQ latency profiler, 'libs/irqprof.py', with IRQs fed in at
+# known times rather than from the Pico:
+#   - percentiles, and the jitter/duration percentiles of 'summary()'
+#   - IRQs counted as late, against a given or the median interval
+#   - ring wraparound, keeping the newest IRQs, and ticks_us() wrapping
+#   - 'csv()' rows, to a file and to the REPL
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+import random
+import csv
+import io
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.irqprof import irq_profiler, percentile, ticks_delta, \
+        PROF_TX, PROF_RX, TICKS_PERIOD, TICKS_MASK
+
+NOMINAL = 33367         # us, 29.97fps
+
+def feed(prof, src, start, intervals):
+    # IRQs at 'start' then after each interval, ticks wrap as ticks_us()
+    t = start
+    prof.irq(src, t & TICKS_MASK)
+    for iv in intervals:
+        t += iv
+        prof.irq(src, t & TICKS_MASK)
+
+def check_percentile():
+    ok = True
+    values = list(range(1, 101))
+    for p, expect in [(0, 1), (50, 51), (90, 90), (99, 99), (100, 100)]:
+        if percentile(values, p) != expect:
+            print("percentile %d of 1..100: %d, expected %d" % \
+                    (p, percentile(values, p), expect))
+            ok = False
+    if percentile([], 50) != 0 or percentile([7], 99) != 7:
+        print("percentile of empty/single values")
+        ok = False
+    return ok
+
+def check_summary(rng, count, late):
+    ok = True
+    prof = irq_profiler(4 * count)
+    prof.start()
+
+    # TX jitters, with some IRQs held off past 'late'; RX is steady
+    tx = [NOMINAL + rng.randint(-40, 40) for i in range(count)]
+    held = rng.sample(range(count), 5)
+    for i in held:
+        tx[i] = NOMINAL + late + 1 + rng.randint(0, 1000)
+    feed(prof, PROF_TX, 1000, tx)
+    feed(prof, PROF_RX, 2000, [NOMINAL] * count)
+
+    handler = [rng.randint(20, 60) for i in range(count)]
+    for d in handler:
+        prof.handler(d)
+    for i in range(count):
+        prof.callback(i % 3, 1000 + i, 100 * (i % 3) + (i % 7))
+
+    s = prof.summary(NOMINAL, late)
+    t = s["tx"]
+    jitter = sorted([abs(x - NOMINAL) for x in tx])
+    expect = {
+        "irqs": count + 1, "nominal": NOMINAL, "min": min(tx), "max": max(tx),
+        "jitter_p50": percentile(jitter, 50), "jitter_p90": percentile(jitter, 90),
+        "jitter_p99": percentile(jitter, 99), "jitter_max": jitter[-1],
+        "late": len(held)}
+    for k in expect:
+        if t[k] != expect[k]:
+            print("summary tx %s: %s, expected %s" % (k, t[k], expect[k]))
+            ok = False
+    if abs(t["mean"] - sum(tx) / count) > 1e-6:
+        print("summary tx mean: %f" % t["mean"])
+        ok = False
+
+    if s["rx"]["late"] or s["rx"]["jitter_max"]:
+        print("summary rx, steady IRQs are late/jitter: %s" % s["rx"])
+        ok = False
+
+    # median is the nominal when not given, so the held off IRQs are still late
+    m = prof.summary(0, late)["tx"]
+    if m["nominal"] != sorted(tx)[count // 2] or m["late"] != len(held):
+        print("summary tx, median nominal %d, %d late" % (m["nominal"], m["late"]))
+        ok = False
+
+    h = s["handler"]
+    d = sorted(handler)
+    if (h["irqs"], h["p50"], h["p99"], h["max"]) != \
+            (count, percentile(d, 50), percentile(d, 99), d[-1]):
+        print("summary handler: %s" % h)
+        ok = False
+
+    for slot in range(3):
+        d = sorted([100 * slot + (i % 7) for i in range(count) if i % 3 == slot])
+        c = s["callbacks"][slot]
+        if (c["calls"], c["p50"], c["p99"], c["max"]) != \
+                (len(d), percentile(d, 50), percentile(d, 99), d[-1]):
+            print("summary callback %d: %s" % (slot, c))
+            ok = False
+    return ok
+
+def check_wrap(rng):
+    ok = True
+    prof = irq_profiler(10)         # rounded up to 16
+    if prof.size != 16:
+        print("size 10 not rounded up to 16: %d" % prof.size)
+        ok = False
+    prof.start()
+
+    # 40 IRQs, across ticks_us() wrapping
+    start = TICKS_PERIOD - (20 * NOMINAL)
+    tx = [NOMINAL + rng.randint(-40, 40) for i in range(39)]
+    feed(prof, PROF_TX, start, tx)
+
+    t = prof.timestamps(PROF_TX)
+    expect = [(start + sum(tx[:i])) & TICKS_MASK for i in range(40)][-16:]
+    if t != expect:
+        print("ring does not hold the newest 16 IRQs, oldest first")
+        ok = False
+    if prof.intervals(PROF_TX) != tx[-15:]:
+        print("intervals across ticks_us() wrapping: %s" % prof.intervals(PROF_TX))
+        ok = False
+    if ticks_delta(5, TICKS_MASK - 4) != 10 or ticks_delta(TICKS_MASK - 4, 5) != -10:
+        print("ticks_delta() across wrapping")
+        ok = False
+
+    for i in range(20):
+        prof.handler(i)
+        prof.callback(1, i, i)
+    if prof.summary()["handler"]["irqs"] != 16 or \
+            [c[2] for c in prof.callbacks()] != list(range(4, 20)):
+        print("handler/callback rings do not hold the newest 16")
+        ok = False
+
+    # start() empties the rings
+    prof.start()
+    s = prof.summary()
+    if s["tx"] is not None or s["handler"] is not None or s["callbacks"]:
+        print("start() did not empty the rings")
+        ok = False
+    return ok
+
+def check_csv(rng):
+    ok = True
+    prof = irq_profiler(16)
+    prof.start()
+    feed(prof, PROF_TX, TICKS_PERIOD - 50000, [NOMINAL + rng.randint(-40, 40) for i in range(20)])
+    feed(prof, PROF_RX, 1234, [NOMINAL] * 5)
+    for i in range(3):
+        prof.callback(i, 100 + i, 10 * i)
+
+    f = io.StringIO()
+    prof.csv(f)
+    text = f.getvalue()
+
+    repl = io.StringIO()
+    with redirect_stdout(repl):
+        prof.csv()
+    if repl.getvalue() != text:
+        print("csv() to REPL differs from to file")
+        ok = False
+
+    rows = list(csv.reader(io.StringIO(text)))
+    if rows[0] != ["source", "slot", "ticks_us", "us"]:
+        print("csv header: %s" % rows[0])
+        return False
+
+    for src, name in [(PROF_TX, "tx"), (PROF_RX, "rx")]:
+        got = [r for r in rows[1:] if r[0] == name]
+        t = prof.timestamps(src)
+        iv = [""] + ["%d" % x for x in prof.intervals(src)]
+        if [int(r[2]) for r in got] != t or [r[3] for r in got] != iv or \
+                any([r[1] for r in got]):
+            print("csv %s rows do not match timestamps/intervals" % name)
+            ok = False
+
+    got = [(int(r[1]), int(r[2]), int(r[3])) for r in rows[1:] if r[0] == "callback"]
+    if got != prof.callbacks():
+        print("csv callback rows: %s" % got)
+        ok = False
+
+    if len(rows) != 1 + 16 + 6 + 3:
+        print("csv has %d rows" % len(rows))
+        ok = False
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_irqprof")
+
+    parser.add_argument("-n", "--count",
+        type=int, default=1000, dest="count",
+        help="IRQs fed in, for the summary")
+
+    parser.add_argument("-l", "--late",
+        type=int, default=250, dest="late",
+        help="us after the nominal interval an IRQ is late")
+
+    parser.add_argument("-s", "--seed",
+        type=int, default=1, dest="seed",
+        help="random seed, for the jitter")
+
+    options = parser.parse_args()
+    rng = random.Random(options.seed)
+
+    ok = True
+    for name, result in [("percentile", check_percentile()),
+                         ("summary", check_summary(rng, options.count, options.late)),
+                         ("wraparound", check_wrap(rng)),
+                         ("csv", check_csv(rng))]:
+        print("%-10s: %s" % (name, "ok" if result else "FAIL"))
+        ok &= result
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
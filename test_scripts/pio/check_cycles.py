@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+#
+# Static cycle budget of the PIO programs of 'pico_timecode.py', without
+# running them: every path between two points of a program is walked from
+# the assembled words (branching both ways on pins/FIFO state, counting
+# loops where X/Y are known) and its best/worst case cycles are checked
+# against the budgets which the comments describe:
+#   - LTC bits are 32 cycles, the '1' transition at 16 cycles
+#   - the Blink/LED machine's frame is 2560 cycles (80 bits)
+#   - SM_START counts once every 4 cycles, whichever path it takes
+#   - the decoder samples past the centre transition, at ~3/4 of a bit,
+#     and the sync machine reads the decoded pin inside its valid window
+# then against each frame rate's 'sm_freq' and clock divider.
+#
+# Stalls (WAIT, blocking IRQ, PULL on empty FIFO) are counted as the one
+# cycle they take once satisfied. Runs in a few 10s of ms, so can be used
+# to gate every change to the programs.
+
+from argparse import ArgumentParser
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.framerates import framerates, FR_FRAMES, FR_NUM, FR_DEN, FR_DIV, \
+        FR_SM_FREQ, FR_NAME, CPU_FREQ
+
+import pioemu
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "pico_timecode.py")
+
+LTC_BITS = 80           # bits per LTC frame
+BIT = 32                # cycles per LTC bit
+SYNC = 1                # worst case cycles from pin edge to WAIT completing
+
+# Budgets: program, from, to, cycles (exact, or (best, worst) limits),
+# description and assumptions. 'from'/'to' are labels, pc or (label, offset),
+# 'to' can be a list. Assumptions:
+#   x      - value of X at 'from', ie. a loop counter part way through
+#   out_x  - value loaded by 'out(x, ..)', ie. divisions per Blink frame
+#   irqs   - only paths raising this many IRQs
+#   per_x  - cycles per X decrement, on every path
+BUDGETS = [
+    ("encode_dmc", "toggle-0", "toggle-0", BIT, "LTC bit", {}),
+    ("encode_dmc", "toggle-0", "toggle-1", BIT // 2, "'1' transition", {}),
+    ("encode_dmc2", "toggle-0", "toggle-0", BIT, "LTC bit", {}),
+    ("encode_dmc2", "toggle-0", "toggle-1", BIT // 2, "'1' transition", {}),
+    ("buffer_out", "start", "start", BIT, "LTC bit", {}),
+    ("shift_led_irq_1x", "wrap_target", "wrap_target", LTC_BITS * BIT, "frame, 1 IRQ",
+            {"out_x": 19, "irqs": 1}),
+    ("shift_led_irq_4x", "wrap_target", "wrap_target", LTC_BITS * BIT, "frame, 4 IRQs",
+            {"out_x": 19, "irqs": 4}),
+    ("auto_start", "wait_for_low", "wait_for_low", None, "count", {"per_x": 4}),
+    ("auto_start", "wait_for_high", "wait_for_high", None, "count", {"per_x": 4}),
+    ("start_from_sync", "wait_for_low", "wait_for_low", None, "count", {"per_x": 4}),
+    ("start_from_sync", "wait_for_high", "wait_for_high", None, "count", {"per_x": 4}),
+    # sample after the centre transition, with margin either side
+    ("decode_dmc", "previously_low", ("previously_low", 2),
+            (BIT // 2 + 4, BIT - 4 - SYNC), "sample", {}),
+    ("decode_dmc", "previously_high", ("previously_high", 2),
+            (BIT // 2 + 4, BIT - 4 - SYNC), "sample", {}),
+    # back to waiting before the next bit's edge
+    ("decode_dmc", "previously_low", ["previously_low", "previously_high"],
+            (BIT // 2, BIT - 1 - SYNC), "ready", {}),
+    ("decode_dmc", "previously_high", ["previously_low", "previously_high"],
+            (BIT // 2, BIT - 1 - SYNC), "ready", {}),
+    ("sync_and_read", "next_bit", "next_bit", BIT, "LTC bit", {"x": 1}),
+    ("sync_and_read", "next_bit2", "next_bit2", BIT, "LTC bit", {"x": 1}),
+    # ready for the next 'irq(clear, 5)' if sync is not found
+    ("sync_and_read", ("find_sync", 2), ["find_sync", ("find_sync", 5)],
+            (1, BIT - 2), "ready", {}),
+]
+
+# instruction fields
+JMP, WAIT, IN, OUT, PUSH_PULL, MOV, IRQ, SET = range(8)
+X, Y = 1, 2
+MASK = 0xFFFFFFFF
+
+class program(object):
+    def __init__(self, name, prog):
+        self.name = name
+        self.labels = pioemu.labels[name]
+
+        execctrl = prog[pioemu._PROG_EXECCTRL]
+        self.top = (execctrl >> 12) & 0x1F
+        self.bottom = (execctrl >> 7) & 0x1F
+        data = prog[pioemu._PROG_DATA]
+        if self.top == 0x1F:
+            self.top = len(data) - 1
+
+        side_count = prog[pioemu._PROG_SIDESET_PINS]
+        if side_count is None:
+            side_count = 0
+        elif not isinstance(side_count, int):
+            side_count = len(side_count)
+        side_bits = side_count + ((execctrl >> 30) & 1)
+
+        self.code = [(w >> 13, (w >> 5) & 7, w & 0x1F,
+                      ((w >> 8) & 0x1F) & ((1 << (5 - side_bits)) - 1)) for w in data]
+
+    def pc(self, where):
+        # pc of label, pc or (label, offset)
+        if isinstance(where, int):
+            return where
+        if isinstance(where, tuple):
+            return self.pc(where[0]) + where[1]
+        if where == "wrap_target":
+            return self.bottom
+        return self.labels[where]
+
+    def after(self, pc):
+        return self.bottom if pc == self.top else pc + 1
+
+    def walk(self, start, end, x=None, out_x=None):
+        # every path from 'start' to (first) arrival at one of 'end', as
+        # set of (cycles, irqs raised, X decrements). Paths which come back
+        # to the same state without getting there, ie. polling, are dropped
+        memo = {}
+        stack = set()
+
+        def visit(pc, x, y, first):
+            if pc in end and not first:
+                return set([(0, 0, 0)]), False
+
+            key = (pc, x, y)
+            if key in stack:
+                return set(), True
+            if key in memo and not first:
+                return memo[key], False
+
+            op, a, b, delay = self.code[pc]
+            cost = 1 + delay
+            irqs = 0
+            decs = 0
+            nexts = [(self.after(pc), x, y)]
+
+            if op == JMP:
+                nexts = []
+                if a == 0:
+                    nexts = [(b, x, y)]
+                elif a in (1, 3):
+                    v = x if a == 1 else y
+                    if v is None:
+                        nexts = [(b, x, y), (self.after(pc), x, y)]
+                    else:
+                        nexts = [(b if v == 0 else self.after(pc), x, y)]
+                elif a in (2, 4):
+                    if a == 2:
+                        decs = 1
+                    v = x if a == 2 else y
+                    if v is None:
+                        n = [(b, x, y), (self.after(pc), x, y)]
+                    else:
+                        d = (v - 1) & MASK
+                        n = [(b if v != 0 else self.after(pc),
+                              d if a == 2 else x, d if a == 4 else y)]
+                    nexts = n
+                elif a == 5:
+                    if x is None or y is None:
+                        nexts = [(b, x, y), (self.after(pc), x, y)]
+                    else:
+                        nexts = [(b if x != y else self.after(pc), x, y)]
+                else:
+                    # pin, not_osre - data dependent
+                    nexts = [(b, x, y), (self.after(pc), x, y)]
+            elif op == OUT:
+                if a == X:
+                    nexts = [(self.after(pc), out_x, y)]
+                elif a == Y:
+                    nexts = [(self.after(pc), x, None)]
+                elif a in (5, 7):
+                    raise ValueError("%s: OUT to PC/EXEC at %d" % (self.name, pc))
+            elif op == MOV:
+                src = None if (b >> 3) & 3 else {1: x, 2: y, 3: 0}.get(b & 7)
+                if a == X:
+                    nexts = [(self.after(pc), src, y)]
+                elif a == Y:
+                    nexts = [(self.after(pc), x, src)]
+                elif a in (4, 5):
+                    raise ValueError("%s: MOV to PC/EXEC at %d" % (self.name, pc))
+            elif op == IRQ:
+                if not a & 2:
+                    irqs = 1
+            elif op == SET:
+                if a == X:
+                    nexts = [(self.after(pc), b, y)]
+                elif a == Y:
+                    nexts = [(self.after(pc), x, b)]
+
+            stack.add(key)
+            paths = set()
+            cut = False
+            for n in nexts:
+                p, c = visit(n[0], n[1], n[2], False)
+                cut |= c
+                for cycles, i, d in p:
+                    paths.add((cycles + cost, i + irqs, d + decs))
+            stack.discard(key)
+
+            # only remember complete results
+            if not cut and not first:
+                memo[key] = paths
+            return paths, cut
+
+        start = self.pc(start)
+        if not isinstance(end, list):
+            end = [end]
+        end = set([self.pc(e) for e in end])
+        return visit(start, x, None, True)[0]
+
+def where(w):
+    # printable 'from'/'to'
+    if isinstance(w, list):
+        return "|".join([where(e) for e in w])
+    if isinstance(w, tuple):
+        return "%s+%d" % w
+    return str(w)
+
+def check_budget(programs, name, start, end, expect, what, assume):
+    # walk, compare with budget and report; returns (ok, best, worst)
+    p = program(name, programs[name])
+    paths = p.walk(start, end, assume.get("x"), assume.get("out_x"))
+    if "irqs" in assume:
+        paths = [q for q in paths if q[1] == assume["irqs"]]
+
+    ok = len(paths) > 0
+    if "per_x" in assume:
+        ok &= all([d and c == assume["per_x"] * d for c, i, d in paths])
+        expect = "%d/count" % assume["per_x"]
+    elif isinstance(expect, tuple):
+        ok &= all([expect[0] <= c <= expect[1] for c, i, d in paths])
+        expect = "%d..%d" % expect
+    else:
+        ok &= all([c == expect for c, i, d in paths])
+
+    cycles = sorted(set([c for c, i, d in paths]))
+    best = cycles[0] if cycles else None
+    worst = cycles[-1] if cycles else None
+    print("%-17s %-48s %-15s %5s %5s %9s%s" % (name, "%s -> %s" % (where(start), where(end)), what,
+            best, worst, expect, "" if ok else "  FAIL"))
+    return ok, best, worst
+
+def check_rx(programs):
+    # the sync machine samples the decoder's output pin: the 'in_(pins, 2)'
+    # looking for sync reads the previous bit, the data bits the current
+    # bit - both have to land while the pin is valid
+    ok = True
+    dec = program("decode_dmc", programs["decode_dmc"])
+    syn = program("sync_and_read", programs["sync_and_read"])
+
+    # decoder: edge to 'irq(clear, 5)', and to setting the output pin
+    clear = SYNC + max([c for c, i, d in dec.walk("previously_low", ("previously_low", 1))])
+    valid = SYNC + max([c for c, i, d in dec.walk("previously_low", [("previously_low", 3),
+                        ("previously_low", 5)])]) + 1
+
+    # sync: flag seen cycle after clear, 'irq(block, 5)' completes
+    sample = clear + 1 + 1
+    data = [c for c, i, d in syn.walk(("find_sync", 2), "next_bit")]
+    if len(data) != 1:
+        print("sync_and_read: %d paths from sync to data" % len(data))
+        return False
+    data = sample + data[0]
+
+    # pin holds bit N from edge N + valid, until edge N+1 + valid
+    margins = [("sync (bit N-1)", sample, valid - BIT, valid),
+               ("data (bit N)", data, valid, valid + BIT)]
+    for what, at, lo, hi in margins:
+        fail = not (lo + 2 <= at <= hi - 2)
+        ok &= not fail
+        print("%-17s %-48s %-15s %5d %5s %9s%s" % ("sync_and_read", "edge -> in_(pins)",
+                what, at, "", "%d..%d" % (lo, hi), "  FAIL" if fail else ""))
+    return ok
+
+def check_rates(frame):
+    # each rate's 'sm_freq' is frame cycles per frame, the divider gets
+    # the (fractional) rate to within its resolution
+    ok = True
+    for r in framerates:
+        fail = []
+        if r[FR_SM_FREQ] != r[FR_FRAMES] * frame:
+            fail.append("sm_freq %d != %d x %d" % (r[FR_SM_FREQ], r[FR_FRAMES], frame))
+
+        div = r[FR_DIV]
+        if div & 0xFF or not 1 <= div >> 16 <= 0xFFFF:
+            fail.append("divider 0x%8.8x out of range" % div)
+
+        div = (div >> 8) / 256
+        fps = CPU_FREQ / div / frame
+        nominal = r[FR_NUM] / r[FR_DEN]
+        ppm = (fps - nominal) * 1e6 / nominal
+        step = 1e6 / (r[FR_DIV] >> 8)
+        if abs(ppm) > step:
+            fail.append("rate error %.2f ppm, step %.2f ppm" % (ppm, step))
+
+        ok &= not fail
+        print("%-6s sm_freq %6d div %9.4f -> %.6f fps, %+5.2f ppm, %.2f ppm/step%s" % \
+                (r[FR_NAME], r[FR_SM_FREQ], div, fps, ppm, step,
+                 "  FAIL: " + ", ".join(fail) if fail else ""))
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_cycles")
+
+    parser.add_argument("-l", "--list",
+        action="store_true", dest="list",
+        help="list assembled programs")
+
+    options = parser.parse_args()
+
+    programs = pioemu.load_programs(SOURCE)
+    if options.list:
+        for name, prog in programs.items():
+            print(name)
+            print("\n".join(pioemu.disassemble(prog)))
+
+    ok = True
+    bit = None
+    frame = set()
+    print("%-17s %-48s %-15s %5s %5s %9s" % ("program", "path", "", "best", "worst", "budget"))
+    for budget in BUDGETS:
+        good, best, worst = check_budget(programs, *budget)
+        ok &= good
+        if budget[3] == BIT and budget[4] == "LTC bit" and good:
+            bit = best
+        if budget[3] == LTC_BITS * BIT:
+            frame.add(worst)
+
+    ok &= check_rx(programs)
+
+    # encoder's bits must fill the Blink frame exactly
+    if bit is None or frame != set([LTC_BITS * bit]):
+        print("LTC frame (%s x %s) does not match Blink frame %s" % \
+                (LTC_BITS, bit, sorted(frame)))
+        ok = False
+
+    print()
+    ok &= check_rates(LTC_BITS * BIT)
+
+    if not ok:
+        print("FAIL")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
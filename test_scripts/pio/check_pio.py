@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+#
+# Run the PIO programs of 'pico_timecode.py' on the host emulator, wired
+# and fed as 'ascii_display_thread()'/'pico_timecode_thread()' do in RUN
+# mode (ie. DEMO, decoding its own LTC output) and check the timing which
+# is otherwise only described by the cycle counting comments:
+#   - LTC bits are 32 cycles, with the '1' transition at 16 cycles
+#   - the Blink/LED machine's IRQ(s) repeat every 2560 cycles (one frame)
+#   - the decoder/sync machines read back the same packets as were sent
+#   - SM_START's count at RX sync, ie. 'rx_phase()', does not wander
+#   - stopping the FIFO refill is reported as Buffer Underflow
+
+from argparse import ArgumentParser
+from array import array
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.timecode import timecode
+from libs.framerates import framerates, framerate_index, FR_DIV, FR_SM_FREQ, CPU_FREQ
+
+import pioemu
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "pico_timecode.py")
+
+# StateMachines, as 'pico_timecode.py'
+SM_START    = 0
+SM_BLINK    = 1
+SM_BUFFER   = 2
+SM_ENCODE   = 3
+SM_TX_RAW   = 4
+SM_SYNC     = 5
+SM_DECODE   = 6
+
+# pins
+PIN_LTC_OUT = 13
+PIN_SYNC    = 21
+PIN_RAW     = 22
+PIN_LED     = 25
+PIN_MTC     = 26
+PIN_DECODED = 19
+
+# Blink/LED words, as 'pico_timecode_thread()'
+BLINK_LED = 0b01010101010101010101 << 6
+BLINK = {
+    False: ((0b101010101010101000_11111111 << 6) + 23,
+            0b101010101010_10101010101010101010,
+            (0b10101010101010101010101000 << 6) + 19,
+            0b10101010101010101010_101010101010),
+    True:  ((0b101010001010101000_11111111 << 6) + 23,
+            0b101010101010_10101000101010100010,
+            (0b10100010101010001010101000 << 6) + 19,
+            0b10101010101010101010_101010001010),
+}
+
+class board(object):
+    def __init__(self, programs, fps, df, usb):
+        self.fps = fps
+        self.usb = usb
+        rate = framerate_index(fps)
+        self.div = framerates[rate][FR_DIV]
+        sm_freq = framerates[rate][FR_SM_FREQ]
+
+        self.emu = pioemu.reset(CPU_FREQ)
+        SM = pioemu.StateMachine
+        self.sm = [
+            SM(SM_START, programs["auto_start"], freq=sm_freq, jmp_pin=PIN_SYNC),
+            SM(SM_BLINK, programs["shift_led_irq_4x" if usb else "shift_led_irq_1x"],
+               freq=sm_freq, jmp_pin=PIN_MTC, out_base=PIN_LED),
+            SM(SM_BUFFER, programs["buffer_out"], freq=sm_freq, out_base=PIN_RAW),
+            SM(SM_ENCODE, programs["encode_dmc"], freq=sm_freq, jmp_pin=PIN_RAW,
+               in_base=PIN_LTC_OUT, out_base=PIN_LTC_OUT),
+            SM(SM_TX_RAW, programs["tx_raw_value"], freq=sm_freq),
+            SM(SM_SYNC, programs["sync_and_read"], freq=sm_freq, jmp_pin=PIN_DECODED,
+               in_base=PIN_DECODED, out_base=PIN_SYNC, set_base=PIN_SYNC),
+            SM(SM_DECODE, programs["decode_dmc"], freq=sm_freq, jmp_pin=PIN_LTC_OUT,
+               in_base=PIN_LTC_OUT, set_base=PIN_DECODED),
+        ]
+
+        # as 'engine.config_clocks()'
+        for m in self.sm:
+            m.write_clkdiv(self.div)
+
+        self.blink_irqs = []        # SM_BLINK cycle count at each IRQ
+        self.sync_irqs = 0
+        self.underflow = False
+        self.sm[SM_BLINK].irq(self.irq_blink)
+        self.sm[SM_BUFFER].irq(self.irq_buffer)
+        self.sm[SM_SYNC].irq(self.irq_sync)
+
+        self.tc = timecode()
+        self.tc.set_fps_df(fps, df)
+        self.tc.from_ascii("00:59:59:00", False)
+        self.tc.user_from_bcd_hex("20260101")
+        self.sent = []
+        self.send_sync = True
+        self.feeding = True
+
+    def irq_blink(self, m):
+        self.blink_irqs.append(m.cycles)
+        if self.sm[SM_TX_RAW].rx_fifo():
+            self.sm[SM_TX_RAW].get()
+
+    def irq_buffer(self, m):
+        self.underflow = True
+
+    def irq_sync(self, m):
+        self.sync_irqs += 1
+
+    def start(self):
+        self.sm[SM_SYNC].put(0xCFFFFFF0)
+        first, second = BLINK[self.usb][:2]
+        self.sm[SM_BLINK].put(first)
+        self.sm[SM_BLINK].put(second)
+
+        self.feed()
+        for m in range(SM_BLINK, SM_DECODE + 1):
+            self.sm[m].active(1)
+            self.emu.run_for(CPU_FREQ // 200)
+        self.sm[SM_START].active(1)
+
+    def feed(self):
+        # as engine's main loop, a frame whenever there is space
+        w = array("I", [0, 0, 0])
+        buffer = self.sm[SM_BUFFER]
+        while self.feeding and buffer.tx_fifo() < (6 - self.send_sync):
+            self.sm[SM_TX_RAW].put(self.tc.to_raw())
+            n = self.tc.to_ltc_words(w, self.send_sync)
+            buffer.put(w[:n])
+            self.sent.append(self.tc.to_raw())
+            self.send_sync = not self.send_sync
+            self.tc.next_frame()
+
+            irq1, irq2 = BLINK[self.usb][2:]
+            self.sm[SM_BLINK].put(irq1 | (BLINK_LED if self.tc.ff == 0 else 0))
+            self.sm[SM_BLINK].put(irq2)
+
+    def run(self, seconds, step=0.002):
+        # CPU services the FIFOs every 'step', returns received labels
+        rc = timecode()
+        rc.set_fps_df(self.fps, self.tc.df)
+        received = []
+        phases = []
+        end = self.emu.now + int(seconds * CPU_FREQ)
+        while self.emu.now < end and not self.underflow:
+            self.emu.run_for(int(step * CPU_FREQ))
+            while self.sm[SM_SYNC].rx_fifo() >= 2:
+                if self.sm[SM_START].rx_fifo():
+                    ticks = self.sm[SM_START].get()
+                    phases.append(((4294967295 - ticks + 188) % 640) - 320)
+                p = [self.sm[SM_SYNC].get(), self.sm[SM_SYNC].get()]
+                received.append(rc.to_raw() if rc.from_ltc_packet(p) else None)
+            self.feed()
+        return received, phases
+
+def cycles(emu, times, div):
+    # StateMachine cycles between system clock times
+    scale = div / 65536
+    return [round((b - a) / scale) for a, b in zip(times, times[1:])]
+
+def check(programs, fps, df, usb, seconds, vcd=None):
+    ok = True
+    b = board(programs, fps, df, usb)
+    b.emu.trace = set([PIN_LTC_OUT, PIN_RAW, PIN_LED, PIN_MTC, PIN_DECODED, PIN_SYNC])
+    b.start()
+
+    start = time.perf_counter()
+    received, phases = b.run(seconds)
+    elapsed = time.perf_counter() - start
+
+    # encoder: half bits of 16 cycles, nothing else
+    halves = set(cycles(b.emu, b.emu.edges(PIN_LTC_OUT), b.div))
+    if not halves <= set([16, 32]):
+        print("LTC transitions not on half bits:", sorted(halves))
+        ok = False
+
+    # blink: IRQs per frame, after the long first frame
+    per = 4 if usb else 1
+    irqs = b.blink_irqs[per + 1:]
+    frames = set([irqs[i + per] - irqs[i] for i in range(len(irqs) - per)])
+    if frames != set([2560]):
+        print("Blink IRQs not every 2560 cycles:", sorted(frames))
+        ok = False
+
+    # loopback: the received labels follow those sent
+    if None in received or len(received) < 2 or received[0] not in b.sent:
+        print("RX failed to decode:", received[:4])
+        ok = False
+    else:
+        first = b.sent.index(received[0])
+        if received != b.sent[first:first + len(received)]:
+            print("RX labels do not match TX")
+            ok = False
+
+    # RX vs TX phase, as 'rx_phase()'
+    if len(set(phases[2:])) > 1:
+        print("rx_phase() wanders:", sorted(set(phases)))
+        ok = False
+
+    if b.underflow:
+        print("unexpected Buffer Underflow")
+        ok = False
+
+    # stop refilling, SM_BUFFER should raise IRQ
+    b.feeding = False
+    b.run(0.2)
+    if not b.underflow:
+        print("Buffer Underflow not reported")
+        ok = False
+
+    if vcd:
+        b.emu.write_vcd(vcd, {PIN_LTC_OUT: "ltc_out", PIN_RAW: "raw", PIN_LED: "led",
+                              PIN_MTC: "mtc", PIN_DECODED: "decoded", PIN_SYNC: "sync"})
+
+    print("%5.2f%s %s: %d frames, rx_phase %s, %d instructions, %.0fx real time%s" % \
+            (fps, "-DF" if df else "   ", "4x" if usb else "1x", len(received),
+             phases[-1] if phases else None, b.emu.instructions, seconds / elapsed,
+             "" if ok else " FAIL"))
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_pio")
+
+    parser.add_argument("-s", "--seconds",
+        type=float, default=10, dest="seconds",
+        help="length of LTC to simulate, per frame rate")
+
+    parser.add_argument("-o", "--vcd",
+        dest="vcd",
+        help="write pin waveforms (of last run) to VCD file")
+
+    parser.add_argument("-l", "--list",
+        action="store_true", dest="list",
+        help="list assembled programs")
+
+    options = parser.parse_args()
+
+    programs = pioemu.load_programs(SOURCE)
+    if options.list:
+        for name, prog in programs.items():
+            print(name)
+            print("\n".join(pioemu.disassemble(prog)))
+
+    ok = True
+    for fps, df in [(30.0, False), (29.97, True), (25.0, False), (24.0, False), (23.98, False)]:
+        for usb in [False, True]:
+            ok &= check(programs, fps, df, usb, options.seconds, options.vcd)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
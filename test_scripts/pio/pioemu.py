@@ -0,0 +1,1020 @@
+# Host emulator for the RP2040's PIO, to check the timing of the
+# '@rp2.asm_pio' programs in 'pico_timecode.py' without a scope.
+#
+# Programs are assembled as MicroPython's 'rp2.asm_pio()' does, to the same
+# 16bit instruction words, and 'load_programs()' takes them from a source
+# file without importing it (which needs the Pico). This module can also
+# stand in for 'rp2' itself, as it has 'asm_pio', 'PIO' and 'StateMachine'.
+#
+# The emulator runs each StateMachine on its own clock divider (16.8 fixed
+# point) against the system clock; time is counted in system cycles. Only
+# the cycles where an instruction executes are visited - delays are jumped
+# over and stalled machines sleep until a pin, IRQ flag or FIFO changes -
+# so minutes of LTC take seconds. Modelled:
+#   - all instructions, delay and side-set, wrap, 'exec' via OUT/MOV
+#   - TX/RX FIFOs (4 deep, 8 when joined), autopull/autopush and thresholds
+#   - IRQ flags 0-7 per PIO block, 'rel()', wait/clear, handlers on 0-3
+#   - GPIOs with the 2 cycle input synchroniser, and external drivers
+#   - pin waveforms, for assertions or export as VCD
+# Not modelled: STATUS (reads as 0), pin overrides/inversion and DMA.
+
+from collections import deque
+from array import array
+import heapq
+import types
+import ast
+
+SYS_FREQ = 125_000_000      # power on default, pico_timecode uses 180MHz
+SYNC_CYCLES = 2             # GPIO input synchroniser
+
+# fields of a program, as 'rp2.asm_pio()' returns
+_PROG_DATA = 0
+_PROG_OFFSET_PIO0 = 1
+_PROG_EXECCTRL = 2
+_PROG_SHIFTCTRL = 3
+_PROG_OUT_PINS = 4
+_PROG_SET_PINS = 5
+_PROG_SIDESET_PINS = 6
+
+class PIOASMError(Exception):
+    pass
+
+class PIO(object):
+    IN_LOW = 0
+    IN_HIGH = 1
+    OUT_LOW = 2
+    OUT_HIGH = 3
+
+    SHIFT_LEFT = 0
+    SHIFT_RIGHT = 1
+
+    JOIN_NONE = 0
+    JOIN_TX = 1
+    JOIN_RX = 2
+
+    IRQ_SM0 = 0x100
+    IRQ_SM1 = 0x200
+    IRQ_SM2 = 0x400
+    IRQ_SM3 = 0x800
+
+#-------------------------------------------------------
+# Assembler
+
+class _emit(object):
+    def __init__(self, out_init=None, set_init=None, sideset_init=None,
+                 in_shiftdir=0, out_shiftdir=0, autopush=False, autopull=False,
+                 push_thresh=32, pull_thresh=32, fifo_join=0):
+        self.labels = {}
+        shiftctrl = (fifo_join << 30) | ((pull_thresh & 0x1F) << 25) | \
+                ((push_thresh & 0x1F) << 20) | (out_shiftdir << 19) | \
+                (in_shiftdir << 18) | (autopull << 17) | (autopush << 16)
+        self.prog = [array("H"), -1, 0, shiftctrl, out_init, set_init, sideset_init]
+        self.wrap_used = False
+        if sideset_init is None:
+            self.sideset_count = 0
+        elif isinstance(sideset_init, int):
+            self.sideset_count = 1
+        else:
+            self.sideset_count = len(sideset_init)
+        self.num_instr = 0
+        self.num_sideset = 0
+
+    def start_pass(self, pass_):
+        if pass_ == 1:
+            if not self.wrap_used and self.num_instr:
+                self.wrap()
+            self.delay_max = 31
+            if self.sideset_count:
+                self.sideset_opt = self.num_sideset != self.num_instr
+                if self.sideset_opt:
+                    self.prog[_PROG_EXECCTRL] |= 1 << 30
+                    self.sideset_count += 1
+                self.delay_max >>= self.sideset_count
+        self.pass_ = pass_
+        self.num_instr = 0
+        self.num_sideset = 0
+
+    def __getitem__(self, key):
+        return self.delay(key)
+
+    def delay(self, delay):
+        if self.pass_ > 0:
+            if delay > self.delay_max:
+                raise PIOASMError("delay too large")
+            self.prog[_PROG_DATA][-1] |= delay << 8
+        return self
+
+    def side(self, value):
+        self.num_sideset += 1
+        if self.pass_ > 0:
+            if self.sideset_count == 0:
+                raise PIOASMError("no sideset")
+            elif value >= (1 << self.sideset_count):
+                raise PIOASMError("sideset too large")
+            set_bit = 13 - self.sideset_count
+            self.prog[_PROG_DATA][-1] |= (self.sideset_opt << 12) | (value << set_bit)
+        return self
+
+    def wrap_target(self):
+        self.prog[_PROG_EXECCTRL] |= self.num_instr << 7
+
+    def wrap(self):
+        assert self.num_instr
+        self.prog[_PROG_EXECCTRL] |= (self.num_instr - 1) << 12
+        self.wrap_used = True
+
+    def label(self, label):
+        if self.pass_ == 0:
+            if label in self.labels:
+                raise PIOASMError("duplicate label {}".format(label))
+            self.labels[label] = self.num_instr
+
+    def word(self, instr, label=None):
+        if self.pass_ == 1:
+            if label is None:
+                label = 0
+            else:
+                if label not in self.labels:
+                    raise PIOASMError("unknown label {}".format(label))
+                label = self.labels[label]
+            self.prog[_PROG_DATA].append(instr | label)
+        self.num_instr += 1
+        return self
+
+    def nop(self):
+        return self.word(0xA042)
+
+    def jmp(self, cond, label=None):
+        if label is None:
+            label = cond
+            cond = 0
+        return self.word(0x0000 | (cond << 5), label)
+
+    def wait(self, polarity, src, index):
+        if src == 6:
+            src = 1         # "pin"
+        elif src != 0:
+            src = 2         # "irq"
+        return self.word(0x2000 | (polarity << 7) | (src << 5) | index)
+
+    def in_(self, src, data):
+        if not 0 < data <= 32:
+            raise PIOASMError("invalid bit count {}".format(data))
+        return self.word(0x4000 | (src << 5) | (data & 0x1F))
+
+    def out(self, dest, data):
+        if dest == 8:
+            dest = 7        # exec
+        if not 0 < data <= 32:
+            raise PIOASMError("invalid bit count {}".format(data))
+        return self.word(0x6000 | (dest << 5) | (data & 0x1F))
+
+    def push(self, value=0, value2=0):
+        value |= value2
+        if not value & 1:
+            value |= 0x20   # block by default
+        return self.word(0x8000 | (value & 0x60))
+
+    def pull(self, value=0, value2=0):
+        value |= value2
+        if not value & 1:
+            value |= 0x20   # block by default
+        return self.word(0x8080 | (value & 0x60))
+
+    def mov(self, dest, src):
+        if dest == 8:
+            dest = 4        # exec
+        return self.word(0xA000 | (dest << 5) | src)
+
+    def irq(self, mod, index=None):
+        if index is None:
+            index = mod
+            mod = 0
+        return self.word(0xC000 | (mod & 0x60) | index)
+
+    def set(self, dest, data):
+        return self.word(0xE000 | (dest << 5) | data)
+
+_pio_funcs = {
+    # source constants for wait
+    "gpio": 0,
+    # source/dest constants for in_, out, mov, set
+    "pins": 0, "x": 1, "y": 2, "null": 3, "pindirs": 4, "pc": 5, "status": 5,
+    "isr": 6, "osr": 7, "exec": 8,
+    # operation functions for mov's src
+    "invert": lambda x: x | 0x08,
+    "reverse": lambda x: x | 0x10,
+    # jmp condition constants
+    "not_x": 1, "x_dec": 2, "not_y": 3, "y_dec": 4, "x_not_y": 5, "pin": 6, "not_osre": 7,
+    # constants for push, pull
+    "noblock": 0x01, "block": 0x21, "iffull": 0x40, "ifempty": 0x40,
+    # constants and modifiers for irq
+    "clear": 0x40, "rel": lambda x: x | 0x10,
+}
+
+# labels and programs assembled, by function name
+labels = {}
+programs = {}
+
+def asm_pio(**kw):
+    # as 'rp2.asm_pio()', runs the function twice with the instructions
+    # as its globals; 1st pass finds labels, 2nd emits
+    emit = _emit(**kw)
+
+    def dec(f):
+        gl = dict(_pio_funcs)
+        for name in ["wrap_target", "wrap", "label", "word", "nop", "jmp", "wait",
+                     "in_", "out", "push", "pull", "mov", "irq", "set"]:
+            gl[name] = getattr(emit, name)
+
+        g = types.FunctionType(f.__code__, gl, f.__name__)
+        emit.start_pass(0)
+        g()
+        emit.start_pass(1)
+        g()
+        labels[f.__name__] = dict(emit.labels)
+        programs[f.__name__] = emit.prog
+        return emit.prog
+
+    return dec
+
+def load_programs(filepath):
+    # assemble each '@rp2.asm_pio' decorated function from a source file,
+    # without running the rest of it; returns dict of programs by name
+    with open(filepath) as f:
+        tree = ast.parse(f.read(), filepath)
+
+    defs = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and any([isinstance(d, ast.Call) and \
+                ast.unparse(d.func) == "rp2.asm_pio" for d in node.decorator_list]):
+            defs.append(node)
+
+    ns = {"rp2": types.SimpleNamespace(asm_pio=asm_pio, PIO=PIO)}
+    exec(compile(ast.Module(body=defs, type_ignores=[]), filepath, "exec"), ns)
+    return dict([(node.name, ns[node.name]) for node in defs])
+
+def disassemble(prog):
+    # listing of program words, for debugging
+    names = ["jmp", "wait", "in", "out", "push/pull", "mov", "irq", "set"]
+    return ["%2d: %4.4x %s" % (i, w, names[w >> 13]) for i, w in enumerate(prog[_PROG_DATA])]
+
+#-------------------------------------------------------
+# Emulator
+
+_pin_id = lambda p: p if p is None or isinstance(p, int) else p.id
+
+# reasons a StateMachine is stalled, and what wakes it
+STALL_PIN = 1
+STALL_IRQ = 2
+STALL_TX = 3
+STALL_RX = 4
+
+class StateMachine(object):
+    # As 'rp2.StateMachine', on the current emulator (see 'reset()')
+    def __init__(self, id, prog=None, freq=-1, **kwargs):
+        self.id = id
+        self.emu = current
+        self.emu.sm[id] = self
+        self.block = id >> 2
+        self.index = id & 3
+        self.running = False
+        self.handler = None
+        self.tx = deque()
+        self.rx = deque()
+        self.prog = None
+        if prog is not None:
+            self.init(prog, freq, **kwargs)
+
+    def init(self, prog, freq=-1, in_base=None, out_base=None, set_base=None,
+             jmp_pin=None, sideset_base=None, in_shiftdir=None, out_shiftdir=None,
+             push_thresh=None, pull_thresh=None):
+        self.prog = prog
+        self.code = [(w >> 13, (w >> 5) & 7, w & 0x1F, (w >> 8) & 0x1F) for w in prog[_PROG_DATA]]
+
+        execctrl = prog[_PROG_EXECCTRL]
+        self.wrap_top = (execctrl >> 12) & 0x1F
+        self.wrap_bottom = (execctrl >> 7) & 0x1F
+        self.side_opt = (execctrl >> 30) & 1
+        self.after = [self.wrap_bottom if pc == self.wrap_top else (pc + 1) & 0x1F \
+                      for pc in range(len(self.code))]
+
+        # where a loop of only JMPs might start, see 'emulator.spin()'
+        self.loops = [self.jmp_loop(pc) for pc in range(len(self.code))]
+
+        shiftctrl = prog[_PROG_SHIFTCTRL]
+        if in_shiftdir is not None:
+            shiftctrl = (shiftctrl & ~(1 << 18)) | (in_shiftdir << 18)
+        if out_shiftdir is not None:
+            shiftctrl = (shiftctrl & ~(1 << 19)) | (out_shiftdir << 19)
+        if push_thresh is not None:
+            shiftctrl = (shiftctrl & ~(0x1F << 20)) | ((push_thresh & 0x1F) << 20)
+        if pull_thresh is not None:
+            shiftctrl = (shiftctrl & ~(0x1F << 25)) | ((pull_thresh & 0x1F) << 25)
+        self.autopush = (shiftctrl >> 16) & 1
+        self.autopull = (shiftctrl >> 17) & 1
+        self.in_right = (shiftctrl >> 18) & 1
+        self.out_right = (shiftctrl >> 19) & 1
+        self.push_thresh = ((shiftctrl >> 20) & 0x1F) or 32
+        self.pull_thresh = ((shiftctrl >> 25) & 0x1F) or 32
+        join = (shiftctrl >> 30) & 3
+        self.tx_depth = 8 if join == PIO.JOIN_TX else (0 if join == PIO.JOIN_RX else 4)
+        self.rx_depth = 8 if join == PIO.JOIN_RX else (0 if join == PIO.JOIN_TX else 4)
+
+        self.in_base = _pin_id(in_base) or 0
+        self.jmp_pin = _pin_id(jmp_pin) or 0
+        self.out_base = _pin_id(out_base) or 0
+        self.set_base = _pin_id(set_base) or 0
+        self.side_base = _pin_id(sideset_base) or 0
+
+        # pin counts and initial state, from the program
+        self.out_count = 0
+        self.set_count = 0
+        self.side_count = 0
+        for field, base, attr in [(_PROG_OUT_PINS, self.out_base, "out_count"),
+                                  (_PROG_SET_PINS, self.set_base, "set_count"),
+                                  (_PROG_SIDESET_PINS, self.side_base, "side_count")]:
+            init = prog[field]
+            if init is None:
+                continue
+            if isinstance(init, int):
+                init = (init,)
+            setattr(self, attr, len(init))
+            for i, mode in enumerate(init):
+                if mode >= PIO.OUT_LOW:
+                    self.emu.set_pin(base + i, mode & 1, True)
+        self.side_bits = self.side_count + self.side_opt
+
+        self.running = False
+        self.restart()
+        self.set_freq(freq)
+
+    def jmp_loop(self, start):
+        # is there a path of only JMPs from 'start' back to itself
+        seen = set()
+        todo = [start]
+        while todo:
+            pc = todo.pop()
+            op, a, b, delay = self.code[pc]
+            if op != 0 or a in (5, 7):
+                continue
+            for n in ([b] if a == 0 else [b, self.after[pc]]):
+                if n == start:
+                    return True
+                if n not in seen:
+                    seen.add(n)
+                    todo.append(n)
+        return False
+
+    def set_freq(self, freq):
+        # divider from frequency, or full speed
+        if freq <= 0:
+            self.write_clkdiv(1 << 16)
+        else:
+            div = (self.emu.sys_freq * 256) // freq
+            self.write_clkdiv(div << 8)
+
+    def write_clkdiv(self, value):
+        # as CLKDIV register, 16.8 fixed point in bits 8-31
+        self.div256 = (value >> 8) or 0x10000
+        if self.div256 < 256:
+            self.div256 = 256
+
+    def read_clkdiv(self):
+        return self.div256 << 8
+
+    def restart(self):
+        self.pc = 0
+        self.x = 0
+        self.y = 0
+        self.isr = 0
+        self.isr_count = 0
+        self.osr = 0
+        self.osr_count = 32
+        self.stall = 0
+        self.stall_pin = -1
+        self.spinning = None
+        self.irq_waiting = -1
+        self.exec_word = None
+        self.acc = 0
+        self.cycles = 0             # StateMachine cycles run
+
+    def active(self, value=None):
+        if value is None:
+            return int(self.running)
+        if value and not self.running:
+            self.running = True
+            self.acc = 0
+            self.emu.schedule(self, self.emu.now)
+        elif not value and self.running:
+            self.running = False
+            self.emu.unschedule(self)
+        return int(self.running)
+
+    def exec(self, instr):
+        # execute an instruction word (or assembled one) immediately
+        if isinstance(instr, list):
+            instr = instr[_PROG_DATA][0]
+        self.exec_word = instr
+        if self.running:
+            self.emu.unschedule(self)
+            self.stall = 0
+            self.emu.schedule(self, self.emu.now)
+
+    def put(self, value, shift=0):
+        if isinstance(value, int):
+            value = [value]
+        for w in value:
+            # blocks as 'rp2', by running the emulator until there is space
+            while len(self.tx) >= self.tx_depth:
+                if self.emu.busy or not self.running:
+                    raise OverflowError("TX FIFO full, SM %d" % self.id)
+                self.emu.run_for(max(1, self.div256 >> 8))
+            self.tx.append((w << shift) & 0xFFFFFFFF)
+            self.emu.wake(self, STALL_TX)
+
+    def get(self, buf=None, shift=0):
+        if not self.rx:
+            raise RuntimeError("RX FIFO empty, SM %d" % self.id)
+        if buf is None:
+            value = self.rx.popleft() >> shift
+        else:
+            for i in range(len(buf)):
+                buf[i] = self.rx.popleft() >> shift
+            value = None
+        self.emu.wake(self, STALL_RX)
+        return value
+
+    def tx_fifo(self):
+        return len(self.tx)
+
+    def rx_fifo(self):
+        return len(self.rx)
+
+    def irq(self, handler=None, trigger=None, hard=False):
+        self.handler = handler
+
+    # ticks of this machine's clock, relative to system time 't'
+    def ticks_after(self, t, k):
+        # time of k-th tick after one at 't', and fraction carried
+        n = self.acc + (k * self.div256)
+        return t + (n >> 8), n & 0xFF
+
+    def ticks_to(self, t, target):
+        # number of ticks after one at 't', to first at or after 'target'
+        need = ((target - t) << 8) - self.acc
+        if need <= 0:
+            return 1
+        return max(1, -(-need // self.div256))
+
+
+class emulator(object):
+    def __init__(self, sys_freq=SYS_FREQ):
+        self.sys_freq = sys_freq
+        self.now = 0
+        self.sm = {}
+        self.flags = [0, 0]         # IRQ flags, per PIO block
+        self.pending = []           # IRQ flag changes, applied after cycle
+        self.queue = []             # (time, seq, StateMachine)
+        self.seq = 0
+        self.stalled = set()
+
+        self.level = 0              # GPIO levels, bit per pin
+        self.prev = 0               # before last change
+        self.changed = -SYNC_CYCLES
+        self.outputs = 0            # pins driven by PIO
+        self.inputs = []            # (time, pin, value) external changes
+
+        self.busy = False           # within run(), ie. IRQ handler
+        self.halt = False           # set by handler, run() returns after cycle
+        self.trace = None           # pins to record, None for all
+        self.waves = {}
+        self.instructions = 0
+
+    # -- GPIO
+
+    def set_pin(self, pin, value, output=None):
+        if output is not None:
+            if output:
+                self.outputs |= 1 << pin
+            else:
+                self.outputs &= ~(1 << pin)
+        bit = 1 << pin
+        if ((self.level >> pin) & 1) == value:
+            return
+        if self.changed != self.now:
+            self.prev = self.level
+            self.changed = self.now
+        self.level ^= bit
+        if self.trace is None or pin in self.trace:
+            self.waves.setdefault(pin, []).append((self.now, value))
+        if self.stalled:
+            self.wake_pin(pin, self.now + SYNC_CYCLES)
+
+    def write_pins(self, base, count, value):
+        for i in range(count):
+            self.set_pin((base + i) & 31, (value >> i) & 1)
+
+    def write_pindirs(self, base, count, value):
+        for i in range(count):
+            pin = (base + i) & 31
+            if (value >> i) & 1:
+                self.outputs |= 1 << pin
+            else:
+                self.outputs &= ~(1 << pin)
+
+    def read_pins(self):
+        # as seen through input synchroniser
+        if self.now - self.changed < SYNC_CYCLES:
+            return self.prev
+        return self.level
+
+    def pin(self, pin):
+        return (self.level >> pin) & 1
+
+    def drive(self, pin, value, at=None):
+        # external signal on input pin, now or at a later time
+        if at is None or at <= self.now:
+            self.set_pin(pin, value)
+        else:
+            self.inputs.append((at, pin, value))
+            self.inputs.sort()
+
+    def wave(self, pin):
+        # list of (time, level) changes of pin
+        return self.waves.get(pin, [])
+
+    def edges(self, pin, level=None):
+        # times of changes of pin, optionally only to 'level'
+        return [t for t, v in self.wave(pin) if level is None or v == level]
+
+    def write_vcd(self, filepath, names):
+        # export waveforms, 'names' is dict of pin to signal name
+        ids = dict([(pin, chr(33 + i)) for i, pin in enumerate(names)])
+        changes = []
+        for pin in names:
+            changes += [(t, v, ids[pin]) for t, v in self.wave(pin)]
+        changes.sort()
+
+        with open(filepath, "w") as f:
+            f.write("$timescale 1ps $end\n")
+            f.write("$scope module pio $end\n")
+            for pin, name in names.items():
+                f.write("$var wire 1 %s %s $end\n" % (ids[pin], name))
+            f.write("$upscope $end\n$enddefinitions $end\n")
+            f.write("#0\n")
+            for pin in names:
+                f.write("0%s\n" % ids[pin])
+            last = 0
+            for t, v, i in changes:
+                if t != last:
+                    f.write("#%d\n" % ((t * 1000000000000) // self.sys_freq))
+                    last = t
+                f.write("%d%s\n" % (v, i))
+
+    # -- IRQ flags
+
+    def irq_flag(self, block, index):
+        return (self.flags[block] >> index) & 1
+
+    def irq_set(self, block, index):
+        self.pending.append((block, index, 1))
+
+    def irq_clear(self, block, index):
+        self.pending.append((block, index, 0))
+
+    def apply_irqs(self):
+        pending = self.pending
+        self.pending = []
+        changed = False
+        for block, index, value in pending:
+            if value:
+                self.flags[block] |= 1 << index
+            else:
+                self.flags[block] &= ~(1 << index)
+            changed = True
+        if changed and self.stalled:
+            self.wake_all(STALL_IRQ, self.now + 1)
+
+        # flags 0-3 interrupt the CPU, handler clears them
+        for block, index, value in pending:
+            if value and index < 4 and (self.flags[block] >> index) & 1:
+                sm = self.sm.get((block << 2) + index)
+                if sm and sm.handler:
+                    self.flags[block] &= ~(1 << index)
+                    if self.stalled:
+                        self.wake_all(STALL_IRQ, self.now + 1)
+                    sm.handler(sm)
+
+    # -- scheduling
+
+    def schedule(self, sm, t):
+        self.seq += 1
+        sm.when = t
+        heapq.heappush(self.queue, (t, self.seq, sm))
+
+    def unschedule(self, sm):
+        if sm.spinning:
+            self.unspin(sm, self.now)
+        # in place, as run() holds it
+        self.queue[:] = [e for e in self.queue if e[2] is not sm]
+        heapq.heapify(self.queue)
+        self.stalled.discard(sm)
+
+    def wake(self, sm, reason):
+        if sm in self.stalled and sm.stall == reason:
+            self.resume(sm, self.now)
+
+    def wake_all(self, reason, at):
+        for sm in [s for s in self.stalled if s.stall == reason]:
+            self.resume(sm, at)
+
+    def wake_pin(self, pin, at):
+        for sm in [s for s in self.stalled if s.stall == STALL_PIN and s.stall_pin == pin]:
+            if sm.spinning:
+                self.unspin(sm, at)
+            else:
+                self.resume(sm, at)
+
+    def resume(self, sm, at):
+        # retry stalled instruction at machine's first tick from 'at'
+        self.stalled.discard(sm)
+        k = sm.ticks_to(sm.when, at)
+        t, sm.acc = sm.ticks_after(sm.when, k)
+        sm.cycles += k - 1
+        self.schedule(sm, t)
+
+    def run(self, until):
+        # run all machines up to (not including) system time 'until'
+        self.busy = True
+        queue = self.queue
+        while True:
+            t = queue[0][0] if queue else until
+            if self.inputs and self.inputs[0][0] <= t and self.inputs[0][0] < until:
+                at, pin, value = self.inputs.pop(0)
+                self.now = at
+                self.set_pin(pin, value)
+                continue
+            if t >= until:
+                break
+
+            self.now = t
+            while queue and queue[0][0] == t:
+                sm = heapq.heappop(queue)[2]
+                if sm.exec_word is not None or not sm.loops[sm.pc] or \
+                        not self.spin(sm):
+                    self.step(sm)
+            if self.pending:
+                self.apply_irqs()
+            if self.halt:
+                self.halt = False
+                until = t + 1
+        self.now = until
+        self.busy = False
+
+    def run_for(self, cycles):
+        self.run(self.now + cycles)
+
+    # -- execution
+
+    def step(self, sm):
+        # execute one instruction, then schedule next after its delay
+        if sm.exec_word is not None:
+            w = sm.exec_word
+            sm.exec_word = None
+            op, a, b, delay = w >> 13, (w >> 5) & 7, w & 0x1F, (w >> 8) & 0x1F
+            pc = -1
+        else:
+            pc = sm.pc
+            op, a, b, delay = sm.code[pc]
+
+        # side-set happens as instruction issues, even if stalled
+        if sm.side_bits:
+            side = delay >> (5 - sm.side_bits)
+            delay &= (1 << (5 - sm.side_bits)) - 1
+            if not sm.side_opt or side >> sm.side_count:
+                self.write_pins(sm.side_base, sm.side_count, side & ((1 << sm.side_count) - 1))
+
+        jump = -1
+        stall = 0
+        self.instructions += 1
+
+        if op == 0:
+            # JMP
+            if a == 0:
+                cond = True
+            elif a == 1:
+                cond = sm.x == 0
+            elif a == 2:
+                cond = sm.x != 0
+                sm.x = (sm.x - 1) & 0xFFFFFFFF
+            elif a == 3:
+                cond = sm.y == 0
+            elif a == 4:
+                cond = sm.y != 0
+                sm.y = (sm.y - 1) & 0xFFFFFFFF
+            elif a == 5:
+                cond = sm.x != sm.y
+            elif a == 6:
+                cond = (self.read_pins() >> sm.jmp_pin) & 1
+            else:
+                cond = sm.osr_count < sm.pull_thresh
+            if cond:
+                jump = b
+
+        elif op == 1:
+            # WAIT
+            pol = a >> 2
+            src = a & 3
+            if src < 2:
+                pin = b if src == 0 else (sm.in_base + b) & 31
+                if ((self.read_pins() >> pin) & 1) != pol:
+                    stall = STALL_PIN
+                    sm.stall_pin = pin
+            else:
+                index = self.irq_index(sm, b)
+                if self.irq_flag(sm.block, index) != pol:
+                    stall = STALL_IRQ
+                elif pol:
+                    self.irq_clear(sm.block, index)
+
+        elif op == 2:
+            # IN
+            n = b or 32
+            if sm.autopush and sm.isr_count >= sm.push_thresh and len(sm.rx) >= sm.rx_depth:
+                stall = STALL_RX
+            else:
+                if sm.autopush and sm.isr_count >= sm.push_thresh:
+                    self.push_isr(sm)
+                data = self.source(sm, a) & (0xFFFFFFFF >> (32 - n))
+                if sm.in_right:
+                    sm.isr = ((sm.isr >> n) | (data << (32 - n))) & 0xFFFFFFFF if n < 32 else data
+                else:
+                    sm.isr = ((sm.isr << n) | data) & 0xFFFFFFFF if n < 32 else data
+                sm.isr_count = min(32, sm.isr_count + n)
+                if sm.autopush and sm.isr_count >= sm.push_thresh:
+                    if len(sm.rx) < sm.rx_depth:
+                        self.push_isr(sm)
+
+        elif op == 3:
+            # OUT
+            n = b or 32
+            if sm.autopull and sm.osr_count >= sm.pull_thresh:
+                if sm.tx:
+                    self.pull_osr(sm)
+                else:
+                    stall = STALL_TX
+            if not stall:
+                if sm.out_right:
+                    data = sm.osr & (0xFFFFFFFF >> (32 - n))
+                    sm.osr = sm.osr >> n if n < 32 else 0
+                else:
+                    data = sm.osr >> (32 - n)
+                    sm.osr = (sm.osr << n) & 0xFFFFFFFF if n < 32 else 0
+                sm.osr_count = min(32, sm.osr_count + n)
+
+                if a == 0:
+                    self.write_pins(sm.out_base, sm.out_count, data)
+                elif a == 1:
+                    sm.x = data
+                elif a == 2:
+                    sm.y = data
+                elif a == 4:
+                    self.write_pindirs(sm.out_base, sm.out_count, data)
+                elif a == 5:
+                    jump = data & 0x1F
+                elif a == 6:
+                    sm.isr = data
+                    sm.isr_count = n
+                elif a == 7:
+                    sm.exec_word = data & 0xFFFF
+
+                # refill in background
+                if sm.autopull and sm.osr_count >= sm.pull_thresh and sm.tx:
+                    self.pull_osr(sm)
+
+        elif op == 4:
+            # PUSH/PULL
+            full = (a >> 1) & 1         # iffull/ifempty
+            block = a & 1
+            if a >> 2:
+                # PULL
+                if not full or sm.osr_count >= sm.pull_thresh:
+                    if sm.tx:
+                        self.pull_osr(sm)
+                    elif block:
+                        stall = STALL_TX
+                    else:
+                        sm.osr = sm.x
+                        sm.osr_count = 0
+            else:
+                # PUSH
+                if not full or sm.isr_count >= sm.push_thresh:
+                    if len(sm.rx) < sm.rx_depth:
+                        self.push_isr(sm)
+                    elif block:
+                        stall = STALL_RX
+                    else:
+                        sm.isr = 0
+                        sm.isr_count = 0
+
+        elif op == 5:
+            # MOV
+            src = b & 7
+            data = self.source(sm, src)
+            opr = (b >> 3) & 3
+            if opr == 1:
+                data ^= 0xFFFFFFFF
+            elif opr == 2:
+                data = int("{:032b}".format(data)[::-1], 2)
+            if a == 0:
+                self.write_pins(sm.out_base, sm.out_count, data)
+            elif a == 1:
+                sm.x = data
+            elif a == 2:
+                sm.y = data
+            elif a == 4:
+                sm.exec_word = data & 0xFFFF
+            elif a == 5:
+                jump = data & 0x1F
+            elif a == 6:
+                sm.isr = data
+                sm.isr_count = 0
+            elif a == 7:
+                sm.osr = data
+                sm.osr_count = 0
+
+        elif op == 6:
+            # IRQ
+            index = self.irq_index(sm, b)
+            if a & 2:
+                self.irq_clear(sm.block, index)
+            elif sm.irq_waiting >= 0:
+                # set already, wait for it to clear
+                if self.irq_flag(sm.block, index):
+                    stall = STALL_IRQ
+                else:
+                    sm.irq_waiting = -1
+            else:
+                self.irq_set(sm.block, index)
+                if a & 1:
+                    sm.irq_waiting = index
+                    stall = STALL_IRQ
+
+        else:
+            # SET
+            if a == 0:
+                self.write_pins(sm.set_base, sm.set_count, b)
+            elif a == 1:
+                sm.x = b
+            elif a == 2:
+                sm.y = b
+            elif a == 4:
+                self.write_pindirs(sm.set_base, sm.set_count, b)
+
+        if stall:
+            # retry on a later tick, when woken
+            if pc < 0:
+                sm.exec_word = w
+            sm.stall = stall
+            sm.cycles += 1
+            self.stalled.add(sm)
+            return
+
+        sm.stall = 0
+        if jump >= 0:
+            sm.pc = jump
+        elif pc >= 0:
+            sm.pc = sm.after[pc]
+        if sm.exec_word is not None:
+            delay = 0
+
+        # as 'schedule(sm, ticks_after())'
+        delay += 1
+        sm.cycles += delay
+        n = sm.acc + (delay * sm.div256)
+        sm.acc = n & 0xFF
+        sm.when += n >> 8
+        self.seq += 1
+        heapq.heappush(self.queue, (sm.when, self.seq, sm))
+
+    def spin(self, sm):
+        # A loop of only JMPs (ie. counting whilst polling a pin) sleeps as
+        # if stalled on the pin, then 'unspin()' works out where it would
+        # be when the change is seen. Returns True if the machine sleeps.
+        if sm.side_bits or self.now - self.changed < SYNC_CYCLES:
+            return False
+        pins = self.read_pins()
+        x = sm.x
+        y = sm.y
+        pc = sm.pc
+        path = []               # (pc, cycle offset, X, Y) of each instruction
+        tested = 0              # X/Y which change the path, bit 0/1
+        cycles = 0
+        while True:
+            op, a, b, delay = sm.code[pc]
+            if op != 0 or a == 5 or a == 7 or len(path) > 32:
+                return False
+            path.append((pc, cycles, x, y))
+            after = sm.wrap_bottom if pc == sm.wrap_top else (pc + 1) & 0x1F
+            if a == 0:
+                cond = True
+            elif a == 6:
+                cond = (pins >> sm.jmp_pin) & 1
+            elif a < 3:
+                cond = (x == 0) if a == 1 else (x != 0)
+                if a == 2:
+                    x = (x - 1) & 0xFFFFFFFF
+                if b != after:
+                    tested |= 1
+            else:
+                cond = (y == 0) if a == 3 else (y != 0)
+                if a == 4:
+                    y = (y - 1) & 0xFFFFFFFF
+                if b != after:
+                    tested |= 2
+            cycles += 1 + delay
+            pc = b if cond else after
+            if pc == sm.pc:
+                break
+
+        # path must not change as X/Y count down, and must read the pin
+        dx = (sm.x - x) & 0xFFFFFFFF
+        dy = (sm.y - y) & 0xFFFFFFFF
+        if (tested & 1 and dx) or (tested & 2 and dy):
+            return False
+        reads = [i for i in range(len(path)) if sm.code[path[i][0]][1] == 6]
+        if not reads:
+            return False
+
+        sm.spinning = (sm.when, sm.acc, cycles, path, dx, dy, reads)
+        sm.stall = STALL_PIN
+        sm.stall_pin = sm.jmp_pin
+        self.stalled.add(sm)
+        return True
+
+    def unspin(self, sm, at):
+        # machine has been in a JMP loop since 't0', continue it from the
+        # first pin read at or after 'at'
+        t0, acc0, cycles, path, dx, dy, reads = sm.spinning
+        sm.spinning = None
+        self.stalled.discard(sm)
+
+        sm.acc = acc0
+        m = 0 if at <= t0 else sm.ticks_to(t0, at)
+        best = None
+        for j in reads:
+            offset = path[j][1]
+            i = max(0, -(-(m - offset) // cycles))
+            n = (i * cycles) + offset
+            if best is None or n < best[0]:
+                best = (n, i, j)
+        n, i, j = best
+
+        pc, offset, x, y = path[j]
+        sm.pc = pc
+        sm.x = (x - (i * dx)) & 0xFFFFFFFF
+        sm.y = (y - (i * dy)) & 0xFFFFFFFF
+        sm.cycles += n
+        self.instructions += (i * len(path)) + j
+        t = t0
+        if n:
+            t, sm.acc = sm.ticks_after(t0, n)
+        sm.stall = 0
+        self.schedule(sm, t)
+
+    def irq_index(self, sm, index):
+        if index & 0x10:
+            return (index & 4) | ((index + sm.index) & 3)
+        return index & 7
+
+    def source(self, sm, src):
+        if src == 0:
+            pins = self.read_pins()
+            return ((pins >> sm.in_base) | (pins << (32 - sm.in_base))) & 0xFFFFFFFF
+        elif src == 1:
+            return sm.x
+        elif src == 2:
+            return sm.y
+        elif src == 6:
+            return sm.isr
+        elif src == 7:
+            return sm.osr
+        return 0
+
+    def push_isr(self, sm):
+        sm.rx.append(sm.isr)
+        sm.isr = 0
+        sm.isr_count = 0
+
+    def pull_osr(self, sm):
+        sm.osr = sm.tx.popleft()
+        sm.osr_count = 0
+
+current = emulator()
+
+def reset(sys_freq=SYS_FREQ):
+    # start again with a new emulator, for subsequent StateMachines
+    global current
+    current = emulator(sys_freq)
+    return current
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+#
+# Contention benchmark for the shared timecode, using CPython threads.
+#
+# A 'feeder' thread loops as core 1 does, each pass encoding a frame and
+# advancing the timecode, whilst 'display' threads read it and a 'menu'
+# thread writes userbits (as the UI does). The menu's write is held up
+# with the lock held, as core 0 would be by an IRQ or a slow display.
+#
+# Compares, as originally, readers which take the lock and a feeder which
+# waits on it; then lock-free readers; then also a feeder which advances
+# with 'advance()', so never waits on the writers - a pass which could not
+# advance renders the frame again, on the next pass.
+#
+# Worst case is the longest single pass, ie. how long the FIFOs could go
+# without being refilled, and 'held' counts the passes longer than half
+# the menu's hold - those which waited on the writer.
+
+from argparse import ArgumentParser
+from array import array
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.timecode import timecode, halfwords
+
+class waiting(timecode):
+    # lock-free readers, but the feeder waits out writers to render and
+    # waits on the lock to advance
+    def to_ltc_halves(self, h, i=0, send_sync=False, seq=None):
+        return super().to_ltc_halves(h, i, send_sync)
+
+    def advance(self, seq, repeats=1):
+        self.next_frame(repeats)
+        return True
+
+class locked(waiting):
+    # readers hold the lock, as the original implementation did
+    def to_raw(self):
+        self.lock.acquire()
+        raw = super().to_raw()
+        self.lock.release()
+        return raw
+
+    def to_ascii(self, sep=True):
+        self.lock.acquire()
+        asc = super().to_ascii(sep)
+        self.lock.release()
+        return asc
+
+    def user_to_ascii(self):
+        self.lock.acquire()
+        asc = super().user_to_ascii()
+        self.lock.release()
+        return asc
+
+    def to_ltc_halves(self, h, i=0, send_sync=False, seq=None):
+        self.lock.acquire()
+        n = super().to_ltc_halves(h, i, send_sync)
+        self.lock.release()
+        return n
+
+class held(object):
+    # userbits write, which is held up for 'hold' seconds with the lock held
+    def __init__(self, tc, hold):
+        self.tc = tc
+        self.hold = hold
+
+    def write(self, ub):
+        tc = self.tc
+        tc.acquire()
+        tc.bgf0 = False
+        tc.bgf2 = False
+        tc.ub = ub
+        time.sleep(self.hold)
+        tc.release()
+
+def feeder(tc, stop, result, limit):
+    w = array("I", [0, 0, 0])
+    h = halfwords(w)
+    send_sync = True
+    count = 0
+    passes = 0
+    worst = 0
+    late = 0
+    total = 0
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        seq = tc.seq
+        tc.to_raw()
+        tc.to_ltc_halves(h, 0, send_sync, seq)
+        if tc.advance(seq):
+            send_sync = not send_sync
+            count += 1
+        t = time.perf_counter() - start
+
+        passes += 1
+        total += t
+        if t > worst:
+            worst = t
+        if t > limit:
+            late += 1
+
+    result["count"] = count
+    result["worst"] = worst
+    result["mean"] = total / max(passes, 1)
+    result["late"] = late
+
+def display(tc, stop, result, index):
+    count = 0
+    while not stop.is_set():
+        tc.to_ascii()
+        tc.user_to_ascii()
+        count += 1
+        time.sleep(0.001)
+
+    result[index] = count
+
+def menu(tc, stop, result, hold, period):
+    count = 0
+    writer = held(tc, hold)
+    while not stop.is_set():
+        writer.write(count & 0xFFFF)
+        count += 1
+        time.sleep(period)
+
+    result["count"] = count
+
+def run(name, cls, readers, hold, period, duration):
+    tc = cls()
+    tc.set_fps_df(29.97, True)
+
+    stop = threading.Event()
+    fed = {}
+    shown = {}
+    written = {"count": 0}
+
+    threads = [threading.Thread(target=feeder, args=(tc, stop, fed, hold / 2))]
+    for i in range(readers):
+        threads.append(threading.Thread(target=display, args=(tc, stop, shown, i)))
+    if period > 0:
+        threads.append(threading.Thread(target=menu, args=(tc, stop, written, hold, period)))
+
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    print("%-8s: feeder %8.0f frames/s, mean %6.2f us, worst %8.2f us, held %4d : readers %6.0f reads/s, writer %4.0f writes/s" % \
+            (name, fed["count"] / duration, fed["mean"] * 1e6, fed["worst"] * 1e6,
+             fed["late"], sum(shown.values()) / duration, written["count"] / duration))
+    return fed["worst"]
+
+def main():
+    parser = ArgumentParser(prog="bench_contention")
+
+    parser.add_argument("-r", "--readers",
+        type=int, default=2, dest="readers",
+        help="number of display threads")
+
+    parser.add_argument("-H", "--hold",
+        type=float, default=5.0, dest="hold",
+        help="ms the menu's write is held up for, with the lock held")
+
+    parser.add_argument("-p", "--period",
+        type=float, default=20.0, dest="period",
+        help="ms between the menu's writes, 0 for none")
+
+    parser.add_argument("-t", "--time",
+        type=float, default=2.0, dest="duration",
+        help="seconds to run each test")
+
+    options = parser.parse_args()
+
+    # short switch interval, so that threads contend frequently
+    sys.setswitchinterval(0.0005)
+
+    worst = {}
+    for name, cls in [("locked", locked), ("seqlock", waiting), ("advance", timecode)]:
+        worst[name] = run(name, cls, options.readers, options.hold / 1000,
+                          options.period / 1000, options.duration)
+
+    print("worst pass: %.1fx shorter than locked, %.1fx shorter than seqlock" % \
+            (worst["locked"] / worst["advance"], worst["seqlock"] / worst["advance"]))
+
+if __name__ == "__main__":
+    main()
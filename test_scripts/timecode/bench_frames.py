@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+#
+# Compare 'timecode.next_frame()/prev_frame()' against the original
+# frame-at-a-time loop, for offsets up to 24 hours.
+
+from argparse import ArgumentParser
+import _thread
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.timecode import timecode
+
+class legacy(object):
+    # original implementation, stepping one frame at a time
+    def __init__(self, fps=30.0, df=False):
+        self.fps = fps
+        self.df = df
+        self.hh = 0
+        self.mm = 0
+        self.ss = 0
+        self.ff = 0
+        self.lock = _thread.allocate_lock()
+
+    def acquire(self):
+        self.lock.acquire()
+
+    def release(self):
+        self.lock.release()
+
+    def validate_for_drop_frame(self, reverse=False):
+        self.acquire()
+        if not reverse and self.df and self.ss == 0 and \
+                (self.ff == 0 or self.ff == 1):
+            if self.mm % 10 != 0:
+                self.ff += (2 - self.ff)
+        if reverse and self.df and self.ss == 0 and \
+                (self.ff == 0 or self.ff == 1):
+            if self.mm % 10 != 0:
+                if self.hh == 0:
+                    self.hh = 23
+                else:
+                    self.hh -= 1
+                self.mm = 59
+                self.ss = 59
+                self.ff = int(self.fps + 0.1) - 1
+        self.release()
+
+    def to_raw(self):
+        return (self.df << 7) + (self.hh << 24) + (self.mm << 16) + (self.ss << 8) + self.ff
+
+    def next_frame(self, repeats=1):
+        while repeats:
+            repeats -= 1
+
+            self.acquire()
+            self.ff += 1
+            if self.ff >= int(self.fps + 0.1):
+                self.ff = 0
+                self.ss += 1
+                if self.ss >= 60:
+                    self.ss = 0
+                    self.mm += 1
+                    if self.mm >= 60:
+                        self.mm = 0
+                        self.hh += 1
+                        if self.hh >= 24:
+                            self.hh = 0
+            self.release()
+
+            if self.df:
+                self.validate_for_drop_frame()
+
+    def prev_frame(self, repeats=1):
+        while repeats:
+            repeats -= 1
+
+            self.acquire()
+            self.ff -= 1
+            if self.ff < 0:
+                self.ff = int(self.fps + 0.1) - 1
+                self.ss -= 1
+                if self.ss < 0:
+                    self.ss = 59
+                    self.mm -= 1
+                    if self.mm < 0:
+                        self.mm = 59
+                        self.hh -= 1
+                        if self.hh < 0:
+                            self.hh = 23
+            self.release()
+
+            if self.df:
+                self.validate_for_drop_frame(True)
+
+
+def run(fps, df, check):
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+    old = legacy(fps, df)
+
+    n = int(fps + 0.1)
+    for label, repeats in [("1 frame", 1), ("1 second", n), ("1 minute", 60 * n),
+                           ("10 minutes", 600 * n), ("1 hour", 3600 * n),
+                           ("24 hours", tc.total)]:
+        if not check and repeats > 3600 * n:
+            continue
+
+        start = time.perf_counter()
+        old.next_frame(repeats)
+        t_old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tc.next_frame(repeats)
+        t_new = time.perf_counter() - start
+
+        if old.to_raw() != tc.to_raw():
+            print("MISMATCH at %s: 0x%8.8x != 0x%8.8x" % (label, old.to_raw(), tc.to_raw()))
+            return False
+
+        print("%5.2f%s next %-10s : loop %10.3f ms, counter %8.4f ms (x%d)" % \
+                (fps, "-DF" if df else "   ", label, t_old * 1000, t_new * 1000,
+                 t_old / max(t_new, 1e-9)))
+
+        start = time.perf_counter()
+        old.prev_frame(repeats)
+        t_old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tc.prev_frame(repeats)
+        t_new = time.perf_counter() - start
+
+        # the loop's DF reverse path mislabels the hour, so for DF
+        # only check that the counter returns to where it started
+        if df:
+            if tc.to_raw() != 0x00000080:
+                print("MISMATCH at -%s: 0x%8.8x != 0x00000080" % (label, tc.to_raw()))
+                return False
+            old.hh = old.mm = old.ss = old.ff = 0
+        elif old.to_raw() != tc.to_raw():
+            print("MISMATCH at -%s: 0x%8.8x != 0x%8.8x" % (label, old.to_raw(), tc.to_raw()))
+            return False
+
+        print("%5.2f%s prev %-10s : loop %10.3f ms, counter %8.4f ms (x%d)" % \
+                (fps, "-DF" if df else "   ", label, t_old * 1000, t_new * 1000,
+                 t_old / max(t_new, 1e-9)))
+
+    return True
+
+
+def main():
+    parser = ArgumentParser(prog="bench_frames")
+
+    parser.add_argument("-q", "--quick",
+        action="store_true", dest="quick",
+        help="skip the 24 hour offsets")
+
+    options = parser.parse_args()
+
+    ok = True
+    for fps, df in [(30.0, False), (29.97, True), (29.97, False),
+                    (25.0, False), (24.98, False), (24.0, False), (23.98, False)]:
+        ok &= run(fps, df, not options.quick)
+        print()
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+#
+# Check the table driven LTC encoder 'timecode.to_ltc_words()' produces
+# the same words as the original encoder, for every frame of every
+# fps/df combination, and report words per second for both.
+
+from argparse import ArgumentParser
+from array import array
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.timecode import timecode
+
+# original implementation, with 32 iteration parity count
+def lp(b):
+    c = 0
+    for i in range(32):
+        c += (b >> i) & 1
+
+    return(c)
+
+def legacy_packet(tc, send_sync=False):
+    f27 = False
+    f43 = False
+    f59 = False
+
+    uf1, uf2, uf3, uf4, uf5, uf6, uf7, uf8 = [(tc.ub >> (4 * i)) & 0xF for i in range(8)]
+
+    if tc.fps == 25.0:
+        f27 = tc.bgf0
+        f43 = tc.bgf2
+    else:
+        f43 = tc.bgf0
+        f59 = tc.bgf2
+
+    p = []
+    p.append((uf2 << 12) + (tc.cf  << 11) + (tc.df << 10) +
+            ((int(tc.ff/10) & 0x3) << 8) +
+            (uf1 << 4) + (tc.ff % 10) +
+            (uf4 << 28) + (f27 << 27) +
+            ((int(tc.ss/10) & 0x7) << 24) +
+            (uf3 << 20) + ((tc.ss % 10) << 16))
+
+    p.append((uf6 << 12) + (f43 << 11) +
+            ((int(tc.mm/10) & 0x7) << 8) +
+            (uf5 << 4) + (tc.mm % 10) +
+            (uf8 << 28) + (f59 << 27) + (tc.bgf1 << 26) +
+            ((int(tc.hh/10) & 0x3) << 24) +
+            (uf7 << 20) + ((tc.hh % 10) << 16))
+
+    # polarity correction
+    count = 13
+    for i in p:
+        count += lp(i)
+
+    if count & 1:
+        if tc.fps == 25.0:
+            p[1] += (True << 27)    # f59
+        else:
+            p[0] += (True << 27)    # f27
+
+    if send_sync:
+        s = []
+        s.append(((p[0] & 0x0000FFFF) << 16) + 0xBFFC)
+        s.append(((p[1] & 0x0000FFFF) << 16) + ((p[0] & 0xFFFF0000) >> 16))
+        s.append((0xBFFC << 16)              + ((p[1] & 0xFFFF0000) >> 16))
+
+        return s
+    else:
+        return p
+
+def set_userbits(tc, n):
+    # vary userbits and flags from frame to frame
+    tc.ub = ((n * 0x9E3779B1) >> 3) & 0xFFFFFFFF
+    tc.cf = bool(n & 0x10)
+    tc.bgf0 = bool(n & 0x20)
+    tc.bgf1 = bool(n & 0x40)
+    tc.bgf2 = bool(n & 0x80)
+
+def check(fps, df, frames):
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+
+    w = array("I", [0, 0, 0])
+    for n in range(frames):
+        set_userbits(tc, n)
+        send_sync = bool(n & 1)
+
+        count = tc.to_ltc_words(w, send_sync)
+        if list(w[:count]) != legacy_packet(tc, send_sync):
+            print("MISMATCH at %s (%5.2f%s)" % (tc.to_ascii(), fps, "-DF" if df else ""))
+            return False
+
+        tc.next_frame()
+
+    return True
+
+def bench(fps, df, frames):
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+    set_userbits(tc, 0x5A5A5)
+
+    start = time.perf_counter()
+    for n in range(frames):
+        legacy_packet(tc, n & 1)
+    t_old = time.perf_counter() - start
+
+    w = array("I", [0, 0, 0])
+    start = time.perf_counter()
+    for n in range(frames):
+        tc.to_ltc_words(w, n & 1)
+    t_new = time.perf_counter() - start
+
+    # 2.5 words per frame, on average
+    print("%5.2f%s : original %9.0f words/s, table %9.0f words/s (x%.1f)" % \
+            (fps, "-DF" if df else "   ", 2.5 * frames / t_old, 2.5 * frames / t_new,
+             t_old / t_new))
+
+def main():
+    parser = ArgumentParser(prog="bench_ltc")
+
+    parser.add_argument("-q", "--quick",
+        action="store_true", dest="quick",
+        help="only check the first hour of frames")
+
+    parser.add_argument("-n", "--frames",
+        type=int, default=100000, dest="frames",
+        help="number of frames to time")
+
+    options = parser.parse_args()
+
+    ok = True
+    for fps, df in [(30.0, False), (29.97, True), (29.97, False),
+                    (25.0, False), (24.98, False), (24.0, False), (23.98, False)]:
+        tc = timecode()
+        tc.set_fps_df(fps, df)
+
+        frames = tc.total
+        if options.quick:
+            frames = tc.total // 24
+
+        if check(fps, df, frames):
+            print("%5.2f%s : %d frames match" % (fps, "-DF" if df else "   ", frames))
+        else:
+            ok = False
+
+        bench(fps, df, options.frames)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
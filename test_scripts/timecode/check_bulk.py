@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+#
+# Check the bulk 'encode_range()' and 'decode_many()' against the per-frame
+# 'to_ltc_words()' and 'from_ltc_packet()', and time them both. Also that
+# 'encode_range()' rejects an output which is not array('I'), or too short.
+
+from argparse import ArgumentParser
+from array import array
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.timecode import timecode, halfwords
+
+def setup(fps, df):
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+    tc.from_ascii("23:59:58:00", False)
+    tc.user_from_bcd_hex("12345678")
+    tc.bgf1 = True
+    return tc
+
+def per_frame(tc, frames, send_sync):
+    out = array("I", [0] * ((3 * frames) + 3))
+    w = array("I", [0, 0, 0])
+    i = 0
+    sync = send_sync
+    for f in range(frames):
+        n = tc.to_ltc_words(w, sync)
+        for j in range(n):
+            out[i + j] = w[j]
+        i += n
+        if send_sync:
+            sync = not sync
+        tc.next_frame()
+    return out, i
+
+def check(fps, df, frames):
+    ok = True
+    for send_sync in [False, True]:
+        tc = setup(fps, df)
+        raw = tc.to_raw()
+
+        bulk = array("I", [0] * ((3 * frames) + 3))
+        start = time.perf_counter()
+        n = tc.encode_range(None, frames, bulk, send_sync)
+        t_bulk = time.perf_counter() - start
+
+        if tc.to_raw() != raw:
+            print("encode_range() changed the timecode")
+            ok = False
+
+        start = time.perf_counter()
+        ref, m = per_frame(tc, frames, send_sync)
+        t_ref = time.perf_counter() - start
+
+        if n != m or bulk[:n] != ref[:m]:
+            print("encode_range() mismatch, sync", send_sync)
+            ok = False
+
+        # as above, with the alias made by the caller
+        again = array("I", [0] * len(bulk))
+        tc.encode_range(tc.to_frames() - frames, frames, again, send_sync, halfwords(again))
+        if again != bulk:
+            print("encode_range() with 'out_h' mismatch, sync", send_sync)
+            ok = False
+
+    # decode, the stream without Sync
+    tc = setup(fps, df)
+    ub = tc.ub
+    words = array("I", [0] * (2 * frames))
+    tc.encode_range(None, frames, words)
+
+    # a corrupt label, ff = 39
+    words[2] = (words[2] & ~0x0000030F) | 0x00000309
+
+    labels = array("I", [0] * frames)
+    ubs = array("I", [0] * frames)
+    start = time.perf_counter()
+    tc.decode_many(words, labels, ubs)
+    t_decode = time.perf_counter() - start
+
+    rc = setup(fps, df)
+    for f in range(frames):
+        valid = rc.from_ltc_packet([words[2 * f], words[(2 * f) + 1]])
+        expect = rc.to_raw() if valid else 0xFFFFFFFF
+        if labels[f] != expect or ubs[f] != ub:
+            print("decode_many() mismatch at frame", f, hex(labels[f]), hex(expect))
+            ok = False
+            break
+
+    if labels[1] != 0xFFFFFFFF:
+        print("decode_many() accepted corrupt label")
+        ok = False
+
+    print("%5.2f%s : %d frames, encode bulk %.1fus/frame (per frame %.1fus), decode %.1fus/frame" % \
+            (fps, "-DF" if df else "   ", frames, 1e6 * t_bulk / frames,
+             1e6 * t_ref / frames, 1e6 * t_decode / frames))
+    return ok
+
+def check_args():
+    ok = True
+    tc = setup(30.0, False)
+    for out, sync, error in [(halfwords(array("I", [0] * 8)), False, TypeError),
+                             (array("H", [0] * 8), False, TypeError),
+                             ([0] * 8, False, TypeError),
+                             (array("I", [0] * 7), False, ValueError),
+                             (array("I", [0] * 12), True, ValueError)]:
+        try:
+            tc.encode_range(None, 4 if not sync else 5, out, sync)
+            print("encode_range() accepted %r" % (out,))
+            ok = False
+        except error:
+            pass
+
+    # exactly the words needed
+    for frames, sync, words in [(4, False, 8), (4, True, 10), (5, True, 13)]:
+        if tc.encode_range(None, frames, array("I", [0] * words), sync) != words:
+            print("encode_range() of %d frames, sync %s, not %d words" % (frames, sync, words))
+            ok = False
+    return ok
+
+def main():
+    parser = ArgumentParser(prog="check_bulk")
+
+    parser.add_argument("-n", "--frames",
+        type=int, default=5000, dest="frames",
+        help="number of frames to encode/decode")
+
+    options = parser.parse_args()
+
+    ok = check_args()
+    for fps, df in [(30.0, False), (29.97, True), (25.0, False), (24.0, False), (23.98, False)]:
+        ok &= check(fps, df, options.frames)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+#
+# Exhaustive 24 hour round trip of the closed form Drop-Frame conversions,
+# against a label counter which steps one frame at a time and skips the
+# dropped labels (as the original 'validate_for_drop_frame()' patching).
+
+from argparse import ArgumentParser
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from libs.dropframe import drop_frames, frames_per_day, label_to_frames, \
+        frames_to_raw, frames_to_label
+from libs.timecode import timecode
+
+def check(nominal, df):
+    drop = drop_frames(nominal) if df else 0
+    total = frames_per_day(nominal, drop)
+
+    hh = mm = ss = ff = 0
+    for fc in range(total):
+        raw = (hh << 24) + (mm << 16) + (ss << 8) + ff
+        if frames_to_raw(fc, nominal, drop) != raw:
+            print("frames_to_raw(%d) = 0x%8.8x, expected 0x%8.8x" % \
+                    (fc, frames_to_raw(fc, nominal, drop), raw))
+            return False
+        if label_to_frames(hh, mm, ss, ff, nominal, drop) != fc:
+            print("label_to_frames(%2.2d:%2.2d:%2.2d:%2.2d) = %d, expected %d" % \
+                    (hh, mm, ss, ff, label_to_frames(hh, mm, ss, ff, nominal, drop), fc))
+            return False
+
+        # step reference label
+        ff += 1
+        if ff == nominal:
+            ff = 0
+            ss += 1
+            if ss == 60:
+                ss = 0
+                mm += 1
+                if mm == 60:
+                    mm = 0
+                    hh += 1
+                if drop and mm % 10:
+                    ff = drop       # skip dropped labels
+
+    if (hh, mm, ss, ff) != (24, 0, 0, 0):
+        print("did not count 24 hours, ended at", (hh, mm, ss, ff))
+        return False
+
+    # dropped labels snap forward, to the 1st label of the minute
+    if drop and frames_to_label(label_to_frames(0, 1, 0, 0, nominal, drop),
+                                nominal, drop) != (0, 1, 0, drop):
+        print("dropped label did not snap forward")
+        return False
+    return total
+
+def check_offsets(fps, df):
+    # random seeks through the timecode class, O(1) each way
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+    ref = timecode()
+    ref.set_fps_df(fps, df)
+
+    for start in [0, 1799, 17981, 107891, tc.total - 1]:
+        for n in [1, 2, 1799, 17982, tc.total // 3]:
+            tc.from_frames(start)
+            tc.next_frame(n)
+            ref.from_raw(tc.to_raw())
+            if ref.to_frames() != (start + n) % tc.total:
+                print("%s +%d from %d" % (tc.to_ascii(), n, start))
+                return False
+            tc.prev_frame(n)
+            if tc.to_frames() != start:
+                print("%s -%d from %d" % (tc.to_ascii(), n, start))
+                return False
+    return True
+
+def main():
+    parser = ArgumentParser(prog="check_dropframe")
+
+    parser.add_argument("-q", "--quick",
+        action="store_true", dest="quick",
+        help="only check the Drop-Frame rates")
+
+    options = parser.parse_args()
+
+    rates = [(30, True, 29.97), (60, True, 59.94)]
+    if not options.quick:
+        rates += [(30, False, 30.0), (25, False, 25.0), (24, False, 24.0), (60, False, 60.0)]
+
+    ok = True
+    for nominal, df, fps in rates:
+        start = time.perf_counter()
+        total = check(nominal, df)
+        t = time.perf_counter() - start
+
+        if total:
+            print("%5.2f%s : %7d frames round trip in %5.2fs" % \
+                    (fps, "-DF" if df else "   ", total, t))
+        ok &= bool(total) and check_offsets(fps, df)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
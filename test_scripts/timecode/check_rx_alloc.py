@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+#
+# Check that the engine's RX decode path does not allocate, per frame: the
+# real 'pico_timecode_thread()' is run on the host stand-ins for MicroPython
+# (see '../host/shim.py' and '../host/soak.py'), Jamming to an external LTC
+# generator. It is restarted to Jam again, as 'soak.py --rejam' does, so
+# the validation runs several times; the generator skips a frame now and
+# then, so that validation also fails.
+#
+# CPython's GC counts are net and lists/tuples come from free lists, so
+# they miss short lived garbage. Instead the engine's code (pico_timecode.py
+# and libs/) on core 1 is traced by opcode, counting:
+#   - bytecodes which allocate on MicroPython's heap (building lists,
+#     tuples, dicts, strings, slices, closures or iterators)
+#   - new boxed values held in locals or attributes of 'self' - floats and
+#     ints beyond MicroPython's small int (31bit signed), ie. the userbits
+#     word if it were rebuilt from its halves for every packet
+# From once the engine's thread has set up, which must be zero.
+#
+# Also checks 'from_ltc_bytes()' matches 'from_ltc_packet()'.
+
+from argparse import ArgumentParser
+from array import array
+import threading
+import dis
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "host"))
+import soak
+from soak import clock
+
+import pico_timecode as pt
+import utime
+from libs.timecode import timecode
+
+ALLOCATING = set([dis.opmap[n] for n in [
+    "BUILD_LIST", "BUILD_TUPLE", "BUILD_MAP", "BUILD_SET", "BUILD_STRING",
+    "BUILD_SLICE", "BUILD_CONST_KEY_MAP", "LIST_APPEND", "LIST_EXTEND",
+    "SET_ADD", "MAP_ADD", "MAKE_FUNCTION", "FORMAT_VALUE", "LIST_TO_TUPLE",
+    "GET_ITER"] if n in dis.opmap])
+
+SMALL_INT = 1 << 30
+
+def engine_code(filename):
+    return filename.endswith("pico_timecode.py") or \
+            os.path.basename(os.path.dirname(filename)) == "libs"
+
+def boxed(v):
+    # allocated on MicroPython's heap, rather than held in the object word
+    return type(v) is float or (type(v) is int and not -SMALL_INT <= v < SMALL_INT)
+
+class tracer(object):
+    # installed for core 1's thread, counts whilst 'counting'
+    def __init__(self):
+        self.counting = False
+        self.allocations = 0
+        self.sites = {}
+        self.values = {}            # boxed values seen, kept so ids are not reused
+
+    def call(self, frame, event, arg):
+        if not engine_code(frame.f_code.co_filename):
+            return None
+        frame.f_trace_opcodes = True
+        return self.opcode
+
+    def count(self, frame, what):
+        self.allocations += 1
+        site = "%s:%d %s" % (os.path.basename(frame.f_code.co_filename), frame.f_lineno, what)
+        self.sites[site] = self.sites.get(site, 0) + 1
+
+    def opcode(self, frame, event, arg):
+        # not the generator, or IRQ handlers - core 0's on the Pico
+        if event != "opcode" or clock.emu.busy:
+            return self.opcode
+
+        op = frame.f_code.co_code[frame.f_lasti]
+        if op in ALLOCATING and self.counting:
+            self.count(frame, dis.opname[op])
+
+        local = frame.f_locals
+        found = [v for v in local.values() if boxed(v)]
+        obj = local.get("self")
+        if obj is not None and hasattr(obj, "__dict__"):
+            found += [v for v in vars(obj).values() if boxed(v)]
+        for v in found:
+            if id(v) not in self.values:
+                # those from before counting, ie. set up, are not counted
+                self.values[id(v)] = v
+                if self.counting:
+                    self.count(frame, type(v).__name__)
+        return self.opcode
+
+class skipping(soak.generator):
+    # external LTC, skipping a frame every 'every', until stopped
+    def __init__(self, emu, fps, df, start, every):
+        super().__init__(emu, fps, df, start)
+        self.tc.ub = 0x4F434950         # 'PICO', a large int
+        self.every = every
+        self.sent = 0
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        self.emu.source = None
+
+    def frame(self):
+        if self.stopped:
+            return
+        self.sent += 1
+        if self.sent % self.every == 0:
+            self.tc.next_frame()
+        super().frame()
+
+def run(fps, df, seconds, every, jams):
+    gen = skipping(clock.emu, fps, df, "00:09:59:00", every)
+    gen.start()
+
+    rx = [0]
+    def rx_frame(sm):
+        rx[0] += 1
+
+    trace = tracer()
+    sets = 0
+    for j in range(jams):
+        threading.settrace(trace.call)
+        eng = soak.start(fps, df, "00:09:59:00", 0, True)
+        threading.settrace(None)
+
+        # set up, then Jam and run on
+        utime.sleep(0.5)
+        pt.irq_callbacks[pt.SM_SYNC] = rx_frame
+        trace.counting = True
+        sets -= eng.tc.sets
+        utime.sleep(seconds)
+        sets += eng.tc.sets
+        trace.counting = False
+
+        pt.irq_callbacks[pt.SM_SYNC] = None
+        if eng.mode == pt.HALTED or clock.threads() < 2:
+            print("engine stopped: mode %d, %d underrun" % (eng.mode, eng.fifo.underruns))
+            trace.allocations += 1
+        soak.stop(eng)
+
+    gen.stop()
+    return trace, rx[0], sets
+
+def check_decode(fps, df, frames):
+    # from_ltc_bytes() must match from_ltc_packet()
+    tc = timecode()
+    tc.set_fps_df(fps, df)
+    tc.from_ascii("00:09:59:00", False)
+    tc.bgf1 = True
+
+    a = timecode()
+    a.set_fps_df(fps, df)
+    b = timecode()
+    b.set_fps_df(fps, df)
+    rx_words = array("I", [0, 0])
+    rx_bytes = memoryview(rx_words).cast("B")
+
+    for f in range(frames):
+        if f % 300 == 0:
+            tc.user_from_bcd_hex("%8.8d" % f)
+        tc.to_ltc_words(rx_words, False)
+        tc.next_frame()
+
+        va = a.from_ltc_packet([rx_words[0], rx_words[1]])
+        vb = b.from_ltc_bytes(rx_bytes)
+        if (va, a.raw, a.fc, a.ub, a.bgf0, a.bgf1, a.bgf2) != \
+                (vb, b.raw, b.fc, b.ub, b.bgf0, b.bgf1, b.bgf2):
+            print("MISMATCH at frame", f, a.to_ascii(), b.to_ascii())
+            return False
+    return True
+
+def main():
+    parser = ArgumentParser(prog="check_rx_alloc")
+
+    parser.add_argument("-s", "--seconds",
+        type=float, default=4, dest="seconds",
+        help="seconds of RX traced, per Jam")
+
+    parser.add_argument("-k", "--skip",
+        type=int, default=100, dest="every",
+        help="generator skips a frame every n frames")
+
+    parser.add_argument("-j", "--jams",
+        type=int, default=3, dest="jams",
+        help="times the engine is started to Jam, per frame rate")
+
+    options = parser.parse_args()
+    ok = True
+
+    for fps, df in [(30.0, False), (29.97, True), (25.0, False), (24.0, False)]:
+        label = "%5.2f%s" % (fps, "-DF" if df else "   ")
+        if not check_decode(fps, df, 2000):
+            ok = False
+
+        trace, frames, jams = run(fps, df, options.seconds, options.every, options.jams)
+        print("%s : %d frames, %d jams, allocations per frame %.2f" % \
+                (label, frames, jams, trace.allocations / max(frames, 1)))
+        for site in sorted(trace.sites, key=trace.sites.get, reverse=True)[:5]:
+            print("        %5d %s" % (trace.sites[site], site))
+        ok &= frames > 0 and jams >= options.jams and trace.allocations == 0
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()